@@ -0,0 +1,44 @@
+from django.contrib import admin
+from .mail import requeue
+from .models import IdentifierSequence, OutboxEvent, QueuedEmail
+
+
+@admin.register(IdentifierSequence)
+class IdentifierSequenceAdmin(admin.ModelAdmin):
+    """
+    Admin for IdentifierSequence model.
+    """
+    list_display = ['name', 'next_value', 'updated_at']
+    search_fields = ['name']
+    readonly_fields = ['name', 'next_value', 'updated_at']
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    """
+    Admin for OutboxEvent model.
+    """
+    list_display = ['id', 'event_type', 'aggregate_type', 'aggregate_id', 'created_at', 'dispatched_at']
+    list_filter = ['aggregate_type', 'event_type']
+    search_fields = ['aggregate_id']
+    readonly_fields = [
+        'aggregate_type', 'aggregate_id', 'event_type', 'payload', 'created_at', 'dispatched_at'
+    ]
+
+
+@admin.register(QueuedEmail)
+class QueuedEmailAdmin(admin.ModelAdmin):
+    """
+    Admin for QueuedEmail model.
+    """
+    list_display = ['id', 'kind', 'recipient', 'send_after', 'attempts', 'parked_at', 'created_at']
+    list_filter = ['kind', ('parked_at', admin.EmptyFieldListFilter)]
+    search_fields = ['recipient']
+    readonly_fields = [
+        'kind', 'recipient', 'context', 'send_after', 'attempts', 'last_error', 'parked_at', 'created_at'
+    ]
+    actions = ['send_again']
+    
+    @admin.action(description='Send selected emails again')
+    def send_again(self, request, queryset):
+        requeue(queryset)
@@ -0,0 +1,105 @@
+"""
+Native async read endpoints for ASGI deployments.
+
+DRF views are synchronous, so these are plain async Django views that
+fetch with the async ORM (``aget``, ``acount``, ``async for``) and reuse
+the DRF pieces that do not touch the database: the viewset's filter
+backends and serializers over already-fetched rows. Responses match the
+sync endpoints, including ``PageNumberPagination``'s envelope.
+
+Anything a serializer reads must be fetched up front (values rows,
+``select_related``/``prefetch_related``); lazy loading raises
+``SynchronousOnlyOperation`` in async code.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.http import JsonResponse
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from apps.users.authentication import get_request_user
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False)
+
+
+def async_api_view(view):
+    """
+    Run ``view(request, ...)`` for authenticated ``GET`` requests, with
+    ``request`` wrapped in a DRF ``Request`` and API errors rendered
+    like DRF does.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return json_response({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+        try:
+            user = await sync_to_async(get_request_user)(request)
+            if not user.is_authenticated:
+                raise exceptions.NotAuthenticated()
+            return json_response(await view(Request(request), *args, **kwargs))
+        except exceptions.APIException as e:
+            detail = e.detail if isinstance(e.detail, (list, dict)) else {'detail': e.detail}
+            return json_response(detail, status=e.status_code)
+    return wrapper
+
+
+def filter_queryset(request, queryset, viewset_class):
+    """
+    Apply the filter, search and ordering backends of ``viewset_class``.
+    """
+    view = viewset_class(request=request, action='list', format_kwarg=None, args=(), kwargs={})
+    for backend in view.filter_backends:
+        queryset = backend().filter_queryset(request, queryset, view)
+    return queryset
+
+
+async def paginate(request, queryset, serializer_class):
+    """
+    Async equivalent of ``PageNumberPagination`` over ``queryset``.
+    """
+    page_size = api_settings.PAGE_SIZE
+    try:
+        page_number = int(request.query_params.get('page', 1))
+        if page_number < 1:
+            raise ValueError
+    except ValueError:
+        raise exceptions.NotFound('Invalid page.')
+    
+    count = await queryset.acount()
+    offset = (page_number - 1) * page_size
+    if offset and offset >= count:
+        raise exceptions.NotFound('Invalid page.')
+    rows = [row async for row in queryset[offset:offset + page_size]]
+    
+    url = request.build_absolute_uri()
+    next_url = replace_query_param(url, 'page', page_number + 1) if offset + page_size < count else None
+    previous_url = None
+    if page_number == 2:
+        previous_url = remove_query_param(url, 'page')
+    elif page_number > 2:
+        previous_url = replace_query_param(url, 'page', page_number - 1)
+    
+    return {
+        'count': count,
+        'next': next_url,
+        'previous': previous_url,
+        'results': serializer_class(rows, many=True, context={'request': request}).data,
+    }
+
+
+async def retrieve(request, queryset, serializer_class, pk):
+    """
+    Serialize the object ``pk`` of ``queryset`` or raise ``NotFound``.
+    """
+    try:
+        instance = await queryset.aget(pk=pk)
+    except (ObjectDoesNotExist, ValidationError, ValueError):
+        raise exceptions.NotFound()
+    return serializer_class(instance, context={'request': request}).data
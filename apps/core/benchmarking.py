@@ -0,0 +1,147 @@
+"""
+Helpers shared by the ``benchmark_*`` management commands.
+"""
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+User = get_user_model()
+
+
+class Rollback(Exception):
+    """
+    Raised to discard everything a benchmark wrote.
+    """
+
+
+@contextmanager
+def rolled_back():
+    """
+    Run the block in a transaction that is always rolled back.
+    """
+    try:
+        with transaction.atomic():
+            yield
+            raise Rollback
+    except Rollback:
+        pass
+
+
+def measure(func, repeat=1):
+    """
+    Call ``func`` ``repeat`` times and return timing and memory figures.
+    
+    Times are the best of all runs; ``peak_kib`` is the tracemalloc peak of
+    the last run.
+    """
+    wall = cpu = float('inf')
+    result = None
+    for _ in range(repeat):
+        tracemalloc.start()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        result = func()
+        wall = min(wall, time.perf_counter() - wall_start)
+        cpu = min(cpu, time.process_time() - cpu_start)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {
+        'wall_ms': round(wall * 1000, 2),
+        'cpu_ms': round(cpu * 1000, 2),
+        'peak_kib': round(peak / 1024, 1),
+        'result': result,
+    }
+
+
+def format_row(label, stats):
+    return (
+        f"{label:<32} wall {stats['wall_ms']:>10.2f} ms   "
+        f"cpu {stats['cpu_ms']:>10.2f} ms   peak {stats['peak_kib']:>10.1f} KiB"
+    )
+
+
+def seed_users(count, prefix='bench', **fields):
+    users = [
+        User(
+            username=f'{prefix}-{i}',
+            email=f'{prefix}-{i}@example.com',
+            first_name=f'First{i}',
+            last_name=f'Last{i}',
+            **fields
+        )
+        for i in range(count)
+    ]
+    return User.objects.bulk_create(users, batch_size=1000)
+
+
+def seed_catalog(products, vendors=10, categories=5, prefix='bench'):
+    """
+    Create ``products`` products spread over some vendors and categories.
+    """
+    from apps.products.models import Category, Product
+    
+    vendor_rows = seed_users(vendors, prefix=f'{prefix}-vendor', is_vendor=True)
+    category_rows = Category.objects.bulk_create([
+        Category(name=f'{prefix} category {i}', slug=f'{prefix}-category-{i}')
+        for i in range(categories)
+    ])
+    return Product.objects.bulk_create([
+        Product(
+            name=f'{prefix} product {i}',
+            description='Lorem ipsum dolor sit amet. ' * 20,
+            price=Decimal(i % 500) + Decimal('0.99'),
+            category=category_rows[i % categories],
+            vendor=vendor_rows[i % vendors],
+            stock_quantity=i % 50,
+            sku=f'{prefix.upper()}-{i:08d}',
+        )
+        for i in range(products)
+    ], batch_size=1000)
+
+
+def seed_orders(count, products, items_per_order=3, customers=50, prefix='bench'):
+    """
+    Create ``count`` orders, each with ``items_per_order`` lines.
+    """
+    from apps.orders.counters import apply_customer_deltas, order_value
+    from apps.orders.models import Order, OrderItem
+    from apps.orders.rollups import change_items, item_row
+    
+    customer_rows = seed_users(customers, prefix=f'{prefix}-customer')
+    statuses = [choice for choice, _ in Order.STATUS_CHOICES]
+    orders = Order.objects.bulk_create([
+        Order(
+            order_number=f'{prefix.upper()}-{i:010d}',
+            customer=customer_rows[i % customers],
+            status=statuses[i % len(statuses)],
+            shipping_address='1 Bench Street',
+            billing_address='1 Bench Street',
+            subtotal=Decimal('30.00'),
+            total_amount=Decimal('33.00'),
+            items_count=items_per_order,
+        )
+        for i in range(count)
+    ], batch_size=1000)
+    items = OrderItem.objects.bulk_create([
+        OrderItem(
+            order=order,
+            product=products[(i + n) % len(products)],
+            quantity=1 + n,
+            unit_price=Decimal('10.00'),
+            total_price=Decimal('10.00') * (1 + n),
+        )
+        for i, order in enumerate(orders)
+        for n in range(items_per_order)
+    ], batch_size=1000)
+    
+    orders_deltas, value_deltas = Counter(), Counter()
+    for order in orders:
+        orders_deltas[order.customer_id] += 1
+        value_deltas[order.customer_id] += order_value(order.status, order.total_amount)
+    apply_customer_deltas(orders_deltas, value_deltas)
+    change_items(added=[item_row(item) for item in items])
+    return orders
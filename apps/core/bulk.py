@@ -0,0 +1,318 @@
+"""
+Batch validation and writes for list payloads.
+
+A batch is validated in one pass: foreign keys are resolved with one
+``in_bulk`` query per relation and unique fields are checked with one query
+per field, instead of a query per row and field. Valid rows are written
+with ``bulk_create`` / ``bulk_update`` in chunks.
+"""
+from itertools import islice
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+from rest_framework.validators import UniqueValidator
+
+from .models import OutboxModel
+from .outbox import record_bulk_events
+
+BULK_BATCH_SIZE = 500
+
+
+def chunked(items, size):
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _row_error(message):
+    return {api_settings.NON_FIELD_ERRORS_KEY: [str(message)]}
+
+
+class PreloadedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField that resolves pks from ``preloaded`` when a
+    bulk operation has fetched them up front.
+    """
+    def __init__(self, **kwargs):
+        self.preloaded = None
+        super().__init__(**kwargs)
+    
+    def to_pk(self, data):
+        if self.pk_field is not None:
+            data = self.pk_field.to_internal_value(data)
+        if isinstance(data, bool):
+            raise TypeError
+        return self.get_queryset().model._meta.pk.to_python(data)
+    
+    def to_internal_value(self, data):
+        if self.preloaded is None:
+            return super().to_internal_value(data)
+        try:
+            pk = self.to_pk(data)
+        except (TypeError, ValueError, DjangoValidationError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if pk not in self.preloaded:
+            self.fail('does_not_exist', pk_value=data)
+        return self.preloaded[pk]
+
+
+class BulkSerializerMixin:
+    """
+    Make a model serializer usable with ``BulkWriter``.
+    
+    ``Meta.bulk_computed_fields`` lists model fields that
+    ``build_bulk_instance`` derives and that must be written on update.
+    """
+    serializer_related_field = PreloadedPrimaryKeyRelatedField
+    
+    def build_bulk_instance(self, validated_data, instance=None):
+        """
+        Return an unsaved instance for a create row, or ``instance`` with
+        the row applied for an update row.
+        """
+        if instance is None:
+            return self.Meta.model(**validated_data)
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        return instance
+    
+    def before_bulk_create(self, objects):
+        """
+        Called once with every instance about to be created, before any
+        chunk is written; for work that is cheaper done in one go.
+        """
+    
+    def after_bulk_create(self, objects):
+        """
+        Called with each created chunk, inside its savepoint.
+        """
+    
+    def after_bulk_update(self, objects):
+        """
+        Called with each updated chunk, inside its savepoint.
+        """
+
+
+class BulkWriter:
+    """
+    Validate and save a list of rows with a ``BulkSerializerMixin`` serializer.
+    
+    With ``partial_success`` every valid row is written and invalid rows are
+    reported; otherwise nothing is written unless every row is valid.
+    ``create`` and ``update`` return a report of the form::
+    
+        {'results': [{'index': 0, 'id': 12}, ...],
+         'errors': [{'index': 3, 'errors': {...}}, ...]}
+    """
+    def __init__(self, serializer_class, queryset, context=None, save_kwargs=None,
+                 partial_success=False, batch_size=BULK_BATCH_SIZE):
+        self.serializer_class = serializer_class
+        self.queryset = queryset
+        self.model = queryset.model
+        self.context = context or {}
+        self.save_kwargs = save_kwargs or {}
+        self.partial_success = partial_success
+        self.batch_size = batch_size
+    
+    def create(self, rows):
+        child, validated, errors = self.validate(rows)
+        objects = {
+            index: child.build_bulk_instance({**data, **self.save_kwargs})
+            for index, data in validated.items()
+        }
+        child.before_bulk_create(list(objects.values()))
+        
+        def write_chunk(chunk):
+            self.model._default_manager.bulk_create(chunk)
+            self.record_outbox_events(chunk, 'created')
+            child.after_bulk_create(chunk)
+        
+        written = self.write(objects, errors, write_chunk)
+        return self.report(written, errors)
+    
+    def update(self, rows):
+        instances, errors = self.load_instances(rows)
+        child, validated, errors = self.validate(rows, instances, errors)
+        
+        fields = set(getattr(child.Meta, 'bulk_computed_fields', []))
+        objects = {}
+        for index, data in validated.items():
+            fields.update(data)
+            objects[index] = child.build_bulk_instance(data, instances[index])
+        
+        now = timezone.now()
+        for field in self.model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False):
+                fields.add(field.name)
+                for obj in objects.values():
+                    setattr(obj, field.attname, now)
+        
+        def write_chunk(chunk):
+            self.model._default_manager.bulk_update(chunk, sorted(fields))
+            self.record_outbox_events(chunk, 'updated')
+            child.after_bulk_update(chunk)
+        
+        written = self.write(objects, errors, write_chunk) if fields else {}
+        return self.report(written, errors)
+    
+    def record_outbox_events(self, objects, action):
+        if issubclass(self.model, OutboxModel):
+            record_bulk_events(objects, action, using=self.queryset.db)
+    
+    def load_instances(self, rows):
+        """
+        Fetch the instances named by each row's ``id`` with one query per chunk.
+        """
+        pk_field = self.model._meta.pk
+        pks, errors = {}, {}
+        for index, row in enumerate(rows):
+            try:
+                pks[index] = pk_field.to_python(row['id'])
+            except (KeyError, TypeError, DjangoValidationError):
+                errors[index] = {'id': ['A valid id is required.']}
+        
+        found = {}
+        for chunk in chunked(set(pks.values()), self.batch_size):
+            found.update(self.queryset.in_bulk(chunk))
+        
+        instances, seen = {}, set()
+        for index, pk in pks.items():
+            if pk not in found:
+                errors[index] = {'id': [f'Object with id={pk} does not exist.']}
+            elif pk in seen:
+                errors[index] = {'id': [f'Object with id={pk} appears more than once.']}
+            else:
+                instances[index] = found[pk]
+                seen.add(pk)
+        return instances, errors
+    
+    def validate(self, rows, instances=None, errors=None):
+        child = self.serializer_class(context=self.context, partial=instances is not None)
+        errors = dict(errors or {})
+        self.preload_relations(child, rows)
+        unique_fields = self.detach_unique_validators(child)
+        
+        validated = {}
+        for index, row in enumerate(rows):
+            if index in errors:
+                continue
+            if not isinstance(row, dict):
+                errors[index] = _row_error('Expected an object.')
+                continue
+            child.instance = instances[index] if instances is not None else None
+            child.initial_data = row
+            try:
+                validated[index] = child.run_validation(row)
+            except ValidationError as exc:
+                errors[index] = exc.detail
+        
+        self.check_unique(unique_fields, validated, errors, instances)
+        return child, validated, errors
+    
+    def preload_relations(self, child, rows):
+        for name, field in child.fields.items():
+            if not isinstance(field, PreloadedPrimaryKeyRelatedField) or field.read_only:
+                continue
+            pks = set()
+            for row in rows:
+                if not isinstance(row, dict) or row.get(name) is None:
+                    continue
+                try:
+                    pks.add(field.to_pk(row[name]))
+                except (TypeError, ValueError, DjangoValidationError):
+                    pass
+            field.preloaded = {}
+            for chunk in chunked(pks, self.batch_size):
+                field.preloaded.update(field.get_queryset().in_bulk(chunk))
+    
+    def detach_unique_validators(self, child):
+        """
+        Remove per-row ``UniqueValidator``s so ``check_unique`` can run them
+        as one query per field.
+        """
+        unique_fields = []
+        for field in child.fields.values():
+            validators = [v for v in field.validators if isinstance(v, UniqueValidator)]
+            if validators:
+                field.validators = [v for v in field.validators if not isinstance(v, UniqueValidator)]
+                unique_fields.append((field.source, validators[0].message))
+        return unique_fields
+    
+    def check_unique(self, unique_fields, validated, errors, instances):
+        instances = instances or {}
+        for source, message in unique_fields:
+            seen = {}
+            for index, data in list(validated.items()):
+                value = data.get(source)
+                if value in (None, ''):
+                    continue
+                if value in seen:
+                    errors[index] = {source: [str(message)]}
+                    del validated[index]
+                else:
+                    seen[value] = index
+            
+            owners = {}
+            for chunk in chunked(seen, self.batch_size):
+                owners.update(
+                    self.model._default_manager.filter(**{f'{source}__in': chunk})
+                    .values_list(source, 'pk')
+                )
+            for value, owner in owners.items():
+                index = seen[value]
+                instance = instances.get(index)
+                if instance is None or instance.pk != owner:
+                    errors[index] = {source: [str(message)]}
+                    validated.pop(index, None)
+    
+    def write(self, objects, errors, write_chunk):
+        """
+        Write ``objects`` in chunks, each in its own savepoint.
+        
+        In partial mode a chunk that fails is retried row by row so only
+        the offending rows are reported.
+        """
+        if errors and not self.partial_success:
+            return {}
+        
+        written = {}
+        try:
+            with transaction.atomic():
+                for chunk in chunked(objects.items(), self.batch_size):
+                    try:
+                        with transaction.atomic():
+                            write_chunk([obj for _, obj in chunk])
+                        written.update(chunk)
+                    except DatabaseError as exc:
+                        if not self.partial_success:
+                            for index, _ in chunk:
+                                errors[index] = _row_error(exc)
+                            raise
+                        written.update(self.write_rows(chunk, errors, write_chunk))
+        except DatabaseError:
+            return {}
+        return written
+    
+    def write_rows(self, chunk, errors, write_chunk):
+        written = {}
+        for index, obj in chunk:
+            try:
+                with transaction.atomic():
+                    write_chunk([obj])
+                written[index] = obj
+            except DatabaseError as exc:
+                errors[index] = _row_error(exc)
+        return written
+    
+    def report(self, written, errors):
+        return {
+            'results': [{'index': index, 'id': written[index].pk} for index in sorted(written)],
+            'errors': [{'index': index, 'errors': errors[index]} for index in sorted(errors)],
+        }
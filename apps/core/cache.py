@@ -0,0 +1,99 @@
+"""
+Small in-process caches with an optional shared Django cache tier.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+
+_MISSING = object()
+
+
+class LocalTTLCache:
+    """
+    Thread-safe LRU cache whose entries expire ``ttl`` seconds after being set.
+    """
+    def __init__(self, max_entries=10000, ttl=30):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+    
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self):
+        return len(self._entries)
+
+
+class TieredCache:
+    """
+    ``LocalTTLCache`` in front of an optional shared Django cache.
+    
+    Reads try the local tier first and fill it from the shared tier.
+    Deletes reach both tiers, but only the local tier of the current
+    process: other processes see the change once their short local TTL
+    runs out.
+    """
+    def __init__(self, prefix, max_entries=10000, local_ttl=30, shared_alias=None, shared_ttl=300):
+        self.prefix = prefix
+        self.local = LocalTTLCache(max_entries=max_entries, ttl=local_ttl)
+        self.shared_alias = shared_alias
+        self.shared_ttl = shared_ttl
+    
+    @property
+    def shared(self):
+        return caches[self.shared_alias] if self.shared_alias else None
+    
+    def make_key(self, key):
+        return f'{self.prefix}:{key}'
+    
+    def get(self, key):
+        key = self.make_key(key)
+        value = self.local.get(key)
+        if value is None and self.shared is not None:
+            value = self.shared.get(key)
+            if value is not None:
+                self.local.set(key, value)
+        return value
+    
+    def set(self, key, value):
+        key = self.make_key(key)
+        self.local.set(key, value)
+        if self.shared is not None:
+            self.shared.set(key, value, self.shared_ttl)
+    
+    def delete(self, *keys):
+        keys = [self.make_key(key) for key in keys]
+        for key in keys:
+            self.local.delete(key)
+        if self.shared is not None:
+            self.shared.delete_many(keys)
+    
+    def clear_local(self):
+        self.local.clear()
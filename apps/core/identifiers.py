@@ -0,0 +1,132 @@
+"""
+Collision-free identifiers (order numbers, SKUs) from a DB-backed sequence.
+
+Each process reserves a block of ``block_size`` values with a single
+``UPDATE`` and then hands them out from memory, so allocating an identifier
+normally costs no query and works for objects passed to ``bulk_create``.
+
+Blocks are reserved on a private connection in their own transaction, like
+a database sequence: a rolled back caller never gives a block back. That
+connection is opened for one reservation only, as Django connections must
+not be shared between threads. SQLite only has one writer, so there the
+caller's connection is used and blocks reserved inside an atomic block are
+not kept. Blocks left unused when a
+process exits are skipped, so identifiers are unique but not gapless.
+"""
+import os
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, transaction
+
+from .models import IdentifierSequence
+
+IDENTIFIER_BLOCK_SIZE = getattr(settings, 'IDENTIFIER_BLOCK_SIZE', 100)
+
+
+class IdentifierAllocator:
+    """
+    Hand out ``template.format(n)`` for increasing, never reused ``n``.
+    """
+    def __init__(self, name, template, block_size=None, using=DEFAULT_DB_ALIAS):
+        self.name = name
+        self.template = template
+        self.block_size = block_size or IDENTIFIER_BLOCK_SIZE
+        self.using = using
+        self._lock = threading.Lock()
+        self._reset()
+    
+    def _reset(self):
+        self._pid = os.getpid()
+        self._next = self._end = 0
+    
+    def _new_connection(self):
+        connection = connections[self.using]
+        return connection.__class__(connection.settings_dict.copy(), alias=self.using)
+    
+    def _reserve_on(self, connection, size):
+        table = connection.ops.quote_name(IdentifierSequence._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {table} SET next_value = next_value + %s, updated_at = CURRENT_TIMESTAMP '
+                f'WHERE name = %s',
+                [size, self.name]
+            )
+            if cursor.rowcount:
+                cursor.execute(f'SELECT next_value FROM {table} WHERE name = %s', [self.name])
+                return cursor.fetchone()[0] - size
+            cursor.execute(
+                f'INSERT INTO {table} (name, next_value, updated_at) VALUES (%s, %s, CURRENT_TIMESTAMP)',
+                [self.name, 1 + size]
+            )
+            return 1
+    
+    def _shares_connection(self):
+        # SQLite allows a single writer, so a private connection would wait
+        # on the caller's own open transaction.
+        return connections[self.using].vendor == 'sqlite'
+    
+    def _can_keep_block(self):
+        """
+        A block reserved inside the caller's transaction is undone if that
+        transaction rolls back, so it must not outlive the current call.
+        """
+        return not (self._shares_connection() and connections[self.using].in_atomic_block)
+    
+    def _reserve(self, size, retry=True):
+        """
+        Reserve ``size`` values and return the first one.
+        """
+        if self._shares_connection():
+            with transaction.atomic(using=self.using):
+                return self._reserve_on(connections[self.using], size)
+        
+        connection = self._new_connection()
+        try:
+            connection.set_autocommit(False)
+            start = self._reserve_on(connection, size)
+            connection.commit()
+            return start
+        except IntegrityError:
+            # Another process created the sequence row first.
+            if not retry:
+                raise
+        finally:
+            # Also discards whatever a failed reservation left uncommitted.
+            connection.close()
+        return self._reserve(size, retry=False)
+    
+    def allocate_values(self, count):
+        """
+        Return ``count`` unused integers.
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                # Never share a block with the parent of a forked worker.
+                self._reset()
+            
+            values = []
+            while len(values) < count:
+                if self._next >= self._end:
+                    size = count - len(values)
+                    if self._can_keep_block():
+                        size = max(self.block_size, size)
+                    self._next = self._reserve(size)
+                    self._end = self._next + size
+                take = min(count - len(values), self._end - self._next)
+                values.extend(range(self._next, self._next + take))
+                self._next += take
+            return values
+    
+    def allocate(self, count):
+        """
+        Return ``count`` formatted identifiers.
+        """
+        return [self.template.format(value) for value in self.allocate_values(count)]
+    
+    def next(self):
+        return self.allocate(1)[0]
+
+
+order_numbers = IdentifierAllocator('order_number', 'ORD-{:010d}')
+skus = IdentifierAllocator('sku', 'SKU-{:08d}')
@@ -0,0 +1,246 @@
+"""
+Resized and recompressed variants of uploaded images.
+
+New uploads to the fields registered with ``watch_image_field``
+(``Product.image``, ``ProductImage.image``, ``User.profile_picture``) are
+queued once the saving transaction commits, as a Celery task named by
+``IMAGE_PROCESSING_TASK``. ``process`` renders every size of
+``IMAGE_SIZES`` (longest side, never upscaled) in every format of
+``IMAGE_FORMATS`` with Pillow and stores the variants under the SHA-256
+of the original, so identical uploads are rendered and stored once.
+Batches are rendered in a process pool; Celery tasks render in the
+worker itself, as prefork workers cannot start child processes.
+
+Serializers link to ``/images/<size>.<format>/<source>``
+(``ImageVariantsField``), which redirects to the stored variant. Images
+uploaded before the pipeline, or whose task has not run yet, are
+processed on that first request; files Pillow cannot read redirect to
+the original.
+"""
+import hashlib
+import io
+import logging
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models.signals import post_save, pre_save
+from PIL import Image, ImageOps
+
+from .cache import LocalTTLCache
+from .models import ImageVariants
+
+logger = logging.getLogger(__name__)
+
+IMAGE_SIZES = getattr(settings, 'IMAGE_SIZES', {'thumbnail': 200, 'medium': 600, 'large': 1200})
+IMAGE_FORMATS = getattr(settings, 'IMAGE_FORMATS', ['webp', 'jpeg'])
+IMAGE_QUALITY = getattr(settings, 'IMAGE_QUALITY', 80)
+# 0 (fast) to 6 (small); Pillow's default of 4 takes several times longer than 2.
+IMAGE_WEBP_METHOD = getattr(settings, 'IMAGE_WEBP_METHOD', 2)
+IMAGE_VARIANTS_DIR = getattr(settings, 'IMAGE_VARIANTS_DIR', 'variants')
+IMAGE_PROCESS_WORKERS = getattr(settings, 'IMAGE_PROCESS_WORKERS', os.cpu_count() or 1)
+IMAGE_PROCESSING_TASK = getattr(settings, 'IMAGE_PROCESSING_TASK', 'celery_tasks.process_images')
+
+PIL_FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+EXIF_ORIENTATION = 0x0112
+
+# (model, field name) of every watched image field.
+WATCHED_FIELDS = []
+
+_ready = LocalTTLCache(max_entries=10000, ttl=300)
+
+
+def variant_names():
+    return [f'{size}.{image_format}' for size in IMAGE_SIZES for image_format in IMAGE_FORMATS]
+
+
+def variant_path(content_hash, name):
+    return f'{IMAGE_VARIANTS_DIR}/{content_hash[:2]}/{content_hash}/{name}'
+
+
+def _flatten(image):
+    """
+    ``image`` on a white background, for formats without transparency.
+    """
+    if image.mode != 'RGBA':
+        return image
+    background = Image.new('RGB', image.size, (255, 255, 255))
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def render(data):
+    """
+    ``(width, height, {variant name: bytes})`` of the image in ``data``,
+    or None if Pillow cannot read it.
+    
+    Runs in pool workers, so it only uses its argument and the settings.
+    """
+    try:
+        image = Image.open(io.BytesIO(data))
+        width, height = image.size
+        if image.getexif().get(EXIF_ORIENTATION) in (5, 6, 7, 8):
+            width, height = height, width
+        # Lets JPEG decode straight at a reduced scale, no smaller than
+        # the largest variant.
+        scale = max(IMAGE_SIZES.values()) / max(image.size)
+        image.draft('RGB', (math.ceil(image.width * scale), math.ceil(image.height * scale)))
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+        
+        variants = {}
+        # Largest first, each size resized from the previous one.
+        for size, longest in sorted(IMAGE_SIZES.items(), key=lambda item: -item[1]):
+            image = image.copy()
+            image.thumbnail((longest, longest), Image.LANCZOS)
+            for image_format in IMAGE_FORMATS:
+                buffer = io.BytesIO()
+                if image_format == 'jpeg':
+                    _flatten(image).save(buffer, 'JPEG', quality=IMAGE_QUALITY, optimize=True, progressive=True)
+                else:
+                    image.save(buffer, PIL_FORMATS[image_format], quality=IMAGE_QUALITY, method=IMAGE_WEBP_METHOD)
+                variants[f'{size}.{image_format}'] = buffer.getvalue()
+        return width, height, variants
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+
+def _render_all(datas, workers):
+    workers = min(workers or IMAGE_PROCESS_WORKERS, len(datas))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(render, datas))
+    return [render(data) for data in datas]
+
+
+def _read(source):
+    try:
+        with default_storage.open(source, 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def process(sources, workers=None):
+    """
+    Generate the missing variants of the given stored images. Returns how
+    many images were processed.
+    """
+    names = set(variant_names())
+    existing = {
+        row['source']: row['variants']
+        for row in ImageVariants.objects.filter(source__in=sources).values('source', 'variants')
+    }
+    originals = {}
+    for source in dict.fromkeys(sources):
+        # An empty list marks a file that failed before.
+        if source in existing and (not existing[source] or names <= set(existing[source])):
+            continue
+        data = _read(source)
+        if data is not None:
+            originals[source] = (hashlib.sha256(data).hexdigest(), data)
+    if not originals:
+        return 0
+    
+    done = {
+        row.content_hash: (row.width, row.height, row.variants)
+        for row in ImageVariants.objects.filter(content_hash__in={h for h, _ in originals.values()})
+        if names <= set(row.variants)
+    }
+    pending = {h: data for h, data in originals.values() if h not in done}
+    for content_hash, result in zip(pending, _render_all(list(pending.values()), workers)):
+        if result is None:
+            done[content_hash] = (0, 0, [])
+            continue
+        width, height, variants = result
+        for name, content in variants.items():
+            path = variant_path(content_hash, name)
+            if not default_storage.exists(path):
+                default_storage.save(path, ContentFile(content))
+        done[content_hash] = (width, height, list(variants))
+    
+    ImageVariants.objects.bulk_create(
+        [
+            ImageVariants(source=source, content_hash=h, width=done[h][0], height=done[h][1], variants=done[h][2])
+            for source, (h, _) in originals.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['source'],
+        update_fields=['content_hash', 'width', 'height', 'variants'],
+    )
+    for source in originals:
+        _ready.delete(source)
+    return len(originals)
+
+
+def queue_processing(sources):
+    """
+    Send ``sources`` to the processing task once the current transaction
+    commits.
+    """
+    def send():
+        from celery import current_app
+        
+        try:
+            current_app.send_task(IMAGE_PROCESSING_TASK, args=[sources])
+        except Exception:
+            logger.exception('Could not queue image processing; variants are made on first request instead.')
+    
+    transaction.on_commit(send)
+
+
+def watch_image_field(model, field_name):
+    """
+    Queue new uploads to ``model.field_name`` for processing.
+    """
+    WATCHED_FIELDS.append((model, field_name))
+    uid = f'{model._meta.label}.{field_name}'
+    
+    def mark_upload(sender, instance, **kwargs):
+        # Until the field's pre_save stores it, a new upload is uncommitted.
+        file = getattr(instance, field_name)
+        if file and not file._committed:
+            instance.__dict__.setdefault('_uploaded_images', set()).add(field_name)
+    
+    def queue_upload(sender, instance, **kwargs):
+        uploaded = instance.__dict__.get('_uploaded_images', set())
+        if field_name in uploaded:
+            uploaded.discard(field_name)
+            queue_processing([getattr(instance, field_name).name])
+    
+    pre_save.connect(mark_upload, sender=model, weak=False, dispatch_uid=f'images_mark_{uid}')
+    post_save.connect(queue_upload, sender=model, weak=False, dispatch_uid=f'images_queue_{uid}')
+
+
+def is_source(source):
+    """
+    Whether ``source`` may be an upload to a watched field.
+    """
+    directories = tuple(model._meta.get_field(field_name).upload_to for model, field_name in WATCHED_FIELDS)
+    return '..' not in source.split('/') and source.startswith(directories)
+
+
+def stored_variant_url(source, name):
+    """
+    Storage URL of variant ``name`` of ``source``, processing the image
+    first if needed. None if there is no such image.
+    """
+    if name not in variant_names() or not is_source(source):
+        return None
+    row = _ready.get(source)
+    if row is None:
+        row = ImageVariants.objects.filter(source=source).values('content_hash', 'variants').first()
+        if row is None or (row['variants'] and name not in row['variants']):
+            process([source], workers=1)
+            row = ImageVariants.objects.filter(source=source).values('content_hash', 'variants').first()
+            if row is None:
+                return None
+        _ready.set(source, row)
+    if not row['variants']:
+        return default_storage.url(source)
+    return default_storage.url(variant_path(row['content_hash'], name))
@@ -0,0 +1,223 @@
+"""
+Buffered, batched email delivery.
+
+``queue_email`` stores a message as a ``QueuedEmail`` row, in the caller's
+transaction, instead of sending it. ``flush`` sends the due messages one
+by one over a single connection and deletes the rows of those sent in the
+same transaction, so delivery is at least once. A message the server
+rejects does not hold back the rest of the batch: it is retried after
+``EMAIL_RETRY_DELAY_SECONDS``, doubled per attempt, and parked after
+``EMAIL_MAX_ATTEMPTS`` (the admin can send parked messages again).
+
+Queueing a message schedules a flush ``EMAIL_FLUSH_DELAY_SECONDS`` later
+through ``EMAIL_FLUSH_TASK``, unless one is already scheduled, so
+messages queued close together share a connection. The task may also
+run periodically, which sends anything a lost flush left behind.
+
+Kinds in ``EMAIL_DIGEST_WINDOWS`` are held for that many seconds; when
+the first is due, everything queued for the same recipient goes out as
+one digest, with one entry per ``digest_key`` (the latest wins). Queueing
+the first message of a digest schedules the flush that sends it.
+
+Bodies are Django templates under ``templates/emails/``, loaded once per
+process, and a digest is rendered once for all its entries.
+"""
+import logging
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection as db_connection, transaction
+from django.template.loader import get_template
+from django.utils import timezone
+
+from .models import QueuedEmail
+
+logger = logging.getLogger(__name__)
+
+EMAIL_BATCH_SIZE = getattr(settings, 'EMAIL_BATCH_SIZE', 100)
+EMAIL_FLUSH_DELAY_SECONDS = getattr(settings, 'EMAIL_FLUSH_DELAY_SECONDS', 5)
+EMAIL_DIGEST_WINDOWS = getattr(settings, 'EMAIL_DIGEST_WINDOWS', {'low_stock': 15 * 60})
+EMAIL_FLUSH_TASK = getattr(settings, 'EMAIL_FLUSH_TASK', 'celery_tasks.flush_email_queue')
+EMAIL_MAX_ATTEMPTS = getattr(settings, 'EMAIL_MAX_ATTEMPTS', 5)
+EMAIL_RETRY_DELAY_SECONDS = getattr(settings, 'EMAIL_RETRY_DELAY_SECONDS', 60)
+
+FLUSH_SCHEDULED_KEY = 'mail:flush-scheduled'
+
+EMAILS = {
+    'order_confirmation': {
+        'subject': 'Order Confirmation - {order_number}',
+        'template': 'emails/order_confirmation.txt',
+    },
+    'low_stock': {
+        'subject': 'Low Stock Alert - {product_name}',
+        'digest_subject': 'Low Stock Alert - {count} products',
+        'template': 'emails/low_stock.txt',
+        'digest_key': 'product_id',
+    },
+}
+
+
+@lru_cache(maxsize=None)
+def email_template(name):
+    # Compiled once, whatever loaders are configured.
+    return get_template(name)
+
+
+def schedule_flush(delay=EMAIL_FLUSH_DELAY_SECONDS, key=FLUSH_SCHEDULED_KEY):
+    """
+    Run ``EMAIL_FLUSH_TASK`` after ``delay`` seconds unless a flush
+    scheduled under ``key`` is already due by then.
+    """
+    if not cache.add(key, True, delay):
+        return
+    from celery import current_app
+    
+    try:
+        current_app.send_task(EMAIL_FLUSH_TASK, countdown=delay)
+    except Exception:
+        cache.delete(key)
+        logger.exception('Could not schedule an email flush; the queue waits for the next one.')
+
+
+def queue_email(kind, recipient, context):
+    """
+    Queue email ``kind`` to ``recipient``; ``context`` must be JSON
+    serializable.
+    """
+    window = EMAIL_DIGEST_WINDOWS.get(kind, 0)
+    email = QueuedEmail.objects.create(
+        kind=kind,
+        recipient=recipient,
+        context=context,
+        send_after=timezone.now() + timedelta(seconds=window),
+    )
+    if window:
+        # Later messages within the window join this digest.
+        transaction.on_commit(lambda: schedule_flush(window, f'{FLUSH_SCHEDULED_KEY}:{kind}:{recipient}'))
+    else:
+        transaction.on_commit(schedule_flush)
+    return email
+
+
+def render(kind, recipient, contexts):
+    """
+    The message of ``kind`` to ``recipient`` for the queued ``contexts``.
+    """
+    spec = EMAILS[kind]
+    if 'digest_key' in spec:
+        contexts = list({context[spec['digest_key']]: context for context in contexts}.values())
+    context = {**contexts[-1], 'entries': contexts, 'count': len(contexts)}
+    subject = spec['digest_subject'] if len(contexts) > 1 else spec['subject']
+    return EmailMessage(
+        subject=subject.format(**context),
+        body=email_template(spec['template']).render(context),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[recipient],
+    )
+
+
+def _record_failure(emails, error, now):
+    """
+    Count a failed send of ``emails``, pushing them back or parking them.
+    """
+    for email in emails:
+        email.attempts += 1
+        email.last_error = f'{type(error).__name__}: {error}'
+        if email.attempts >= EMAIL_MAX_ATTEMPTS:
+            email.parked_at = now
+        else:
+            email.send_after = now + timedelta(seconds=EMAIL_RETRY_DELAY_SECONDS * 2 ** (email.attempts - 1))
+    QueuedEmail.objects.bulk_update(emails, ['attempts', 'last_error', 'send_after', 'parked_at'])
+    retry = [email for email in emails if email.parked_at is None]
+    if retry:
+        delay = (retry[0].send_after - now).total_seconds()
+        transaction.on_commit(lambda: schedule_flush(delay, f'{FLUSH_SCHEDULED_KEY}:retry:{retry[0].pk}'))
+
+
+def flush(batch_size=EMAIL_BATCH_SIZE, connection=None):
+    """
+    Send one batch of due messages. Returns how many queued messages were
+    sent and how many failed, counting every message a digest folded in.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        due = QueuedEmail.objects.filter(send_after__lte=now, parked_at__isnull=True).order_by('id')
+        if db_connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        queued = list(due[:batch_size])
+        if not queued:
+            return 0, 0
+        
+        # A due digest takes all of the recipient's messages of that kind,
+        # including those beyond the batch or still in their window.
+        digests = {(email.kind, email.recipient) for email in queued if email.kind in EMAIL_DIGEST_WINDOWS}
+        if digests:
+            pending = QueuedEmail.objects.filter(
+                kind__in={kind for kind, _ in digests},
+                recipient__in={recipient for _, recipient in digests},
+                parked_at__isnull=True,
+            ).exclude(pk__in=[email.pk for email in queued]).order_by('id')
+            if db_connection.features.has_select_for_update_skip_locked:
+                pending = pending.select_for_update(skip_locked=True)
+            queued.extend(email for email in pending if (email.kind, email.recipient) in digests)
+        
+        groups = {}
+        for email in sorted(queued, key=lambda email: email.pk):
+            key = (email.kind, email.recipient) if email.kind in EMAIL_DIGEST_WINDOWS else email.pk
+            groups.setdefault(key, []).append(email)
+        
+        sent, failed = [], 0
+        connection = connection or get_connection()
+        # Opened here, send_messages() keeps the connection for every message.
+        opened = connection.open()
+        try:
+            for emails in groups.values():
+                try:
+                    connection.send_messages([
+                        render(emails[0].kind, emails[0].recipient, [email.context for email in emails])
+                    ])
+                except Exception as e:
+                    logger.warning('Could not send %s email to %s: %r', emails[0].kind, emails[0].recipient, e)
+                    _record_failure(emails, e, now)
+                    failed += len(emails)
+                    # The failure may have broken the session.
+                    connection.close()
+                    try:
+                        connection.open()
+                    except Exception:
+                        logger.exception('Lost the mail server; the rest of the batch stays queued.')
+                        break
+                else:
+                    sent.extend(emails)
+        finally:
+            if opened:
+                connection.close()
+        QueuedEmail.objects.filter(pk__in=[email.pk for email in sent]).delete()
+    return len(sent), failed
+
+
+def flush_all(batch_size=EMAIL_BATCH_SIZE, max_batches=100):
+    """
+    Send everything due over one connection. Returns how many queued
+    messages were sent.
+    """
+    total = 0
+    with get_connection() as connection:
+        for _ in range(max_batches):
+            sent, failed = flush(batch_size, connection)
+            total += sent
+            if sent + failed < batch_size:
+                break
+    return total
+
+
+def requeue(queryset):
+    """
+    Send the given queued messages, parked ones included, at the next
+    flush.
+    """
+    queryset.update(attempts=0, last_error='', parked_at=None, send_after=timezone.now())
+    transaction.on_commit(schedule_flush)
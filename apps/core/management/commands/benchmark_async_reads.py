@@ -0,0 +1,127 @@
+import asyncio
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client
+from rest_framework.authtoken.models import Token
+
+from apps.core.benchmarking import seed_catalog
+from apps.products.models import Category
+
+User = get_user_model()
+
+PREFIX = 'bench-async'
+
+
+class ThreadSampler:
+    """
+    Record the peak number of live threads while the block runs.
+    """
+    def __enter__(self):
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+    
+    def _sample(self):
+        while not self._stop.wait(0.005):
+            self.peak = max(self.peak, threading.active_count())
+    
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the sync (WSGI, one thread per in-flight request) and async (ASGI) '
+        'read endpoints under concurrent load.'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=100)
+        parser.add_argument('--products', type=int, default=500)
+        parser.add_argument(
+            '--db-latency-ms', type=float, default=5,
+            help='Sleep added to every query to model a database across the network.'
+        )
+    
+    def handle(self, *args, **options):
+        concurrency = options['concurrency']
+        latency = options['db_latency_ms'] / 1000
+        
+        # ASGI requests query from executor threads with their own
+        # connections, so the data has to be committed.
+        products = seed_catalog(options['products'], prefix=PREFIX)
+        user = User.objects.create(username=f'{PREFIX}-client', email=f'{PREFIX}-client@example.com')
+        token = Token.objects.create(user=user)
+        
+        def slow_query(execute, sql, params, many, context):
+            time.sleep(latency)
+            return execute(sql, params, many, context)
+        
+        def add_latency(connection, **kwargs):
+            connection.execute_wrappers.append(slow_query)
+        
+        connection_created.connect(add_latency)
+        try:
+            cases = [
+                ('product list', '/api/v1/products/', '/api/v1/async/products/'),
+                ('product detail', f'/api/v1/products/{products[0].pk}/',
+                 f'/api/v1/async/products/{products[0].pk}/'),
+                ('category list', '/api/v1/categories/', '/api/v1/async/categories/'),
+            ]
+            for label, sync_path, async_path in cases:
+                self.run_case(label, 'sync', self.run_sync, sync_path, token.key, concurrency)
+                self.run_case(label, 'async', self.run_async, async_path, token.key, concurrency)
+        finally:
+            connection_created.disconnect(add_latency)
+            for connection in connections.all():
+                connection.close()
+            User.objects.filter(username__startswith=PREFIX).delete()
+            Category.objects.filter(name__startswith=PREFIX).delete()
+    
+    def run_sync(self, path, token, concurrency):
+        def request(_):
+            response = Client().get(path, HTTP_AUTHORIZATION=f'Token {token}')
+            connections.close_all()
+            return response.status_code
+        
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            return list(pool.map(request, range(concurrency)))
+    
+    def run_async(self, path, token, concurrency):
+        async def requests():
+            client = AsyncClient()
+            responses = await asyncio.gather(*[
+                client.get(path, headers={'Authorization': f'Token {token}'})
+                for _ in range(concurrency)
+            ])
+            return [response.status_code for response in responses]
+        
+        return asyncio.run(requests())
+    
+    def run_case(self, label, mode, runner, path, token, concurrency):
+        tracemalloc.start()
+        with ThreadSampler() as threads:
+            start = time.perf_counter()
+            statuses = runner(path, token, concurrency)
+            wall = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        
+        if set(statuses) != {200}:
+            raise CommandError(f'{label} ({mode}): unexpected statuses {sorted(set(statuses))}')
+        
+        self.stdout.write(
+            f'{label:<16} {mode:<6} {concurrency:>5} in flight   wall {wall * 1000:>9.1f} ms   '
+            f'{concurrency / wall:>8.1f} req/s   peak threads {threads.peak:>4}   '
+            f'{peak / 1024 / concurrency:>8.1f} KiB/request'
+        )
@@ -0,0 +1,44 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from apps.core.benchmarking import rolled_back
+from apps.users.authentication import auth_cache
+
+User = get_user_model()
+
+AUTH_TABLES = ['authtoken_token', 'django_session', User._meta.db_table]
+
+
+class Command(BaseCommand):
+    help = 'Count the authentication queries of a cold and a warm API request.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/v1/categories/')
+    
+    def handle(self, *args, **options):
+        path = options['path']
+        with rolled_back():
+            user = User.objects.create(username='bench-auth', email='bench-auth@example.com')
+            token = Token.objects.create(user=user)
+            
+            token_client = Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+            session_client = Client()
+            session_client.force_login(user)
+            
+            for label, client in [('token', token_client), ('session', session_client)]:
+                auth_cache.clear_local()
+                for state in ['cold', 'warm']:
+                    with CaptureQueriesContext(connection) as queries:
+                        response = client.get(path)
+                    auth_queries = [
+                        query for query in queries.captured_queries
+                        if any(f'"{table}"' in query['sql'] for table in AUTH_TABLES)
+                    ]
+                    self.stdout.write(
+                        f'{label:<8} {state:<5} status {response.status_code}  '
+                        f'queries {len(queries):>3}  auth queries {len(auth_queries):>3}'
+                    )
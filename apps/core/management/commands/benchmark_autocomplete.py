@@ -0,0 +1,68 @@
+import os
+import random
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.products.autocomplete import AutocompleteIndex
+
+WORDS = [
+    'wireless', 'organic', 'cotton', 'leather', 'smart', 'steel', 'classic', 'portable', 'mini', 'pro',
+    'ultra', 'vintage', 'bamboo', 'ceramic', 'digital', 'compact', 'deluxe', 'eco', 'premium', 'travel',
+]
+NOUNS = [
+    'headphones', 'shirt', 'wallet', 'watch', 'bottle', 'lamp', 'backpack', 'speaker', 'mug', 'charger',
+    'keyboard', 'blender', 'jacket', 'sneakers', 'notebook', 'camera', 'kettle', 'pillow', 'router', 'tent',
+]
+
+
+class Command(BaseCommand):
+    help = 'Time building, loading and querying the typeahead index over synthetic products.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--entries', type=int, default=1000000, help='Approximate number of terms.')
+        parser.add_argument('--queries', type=int, default=20000)
+    
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        # Three-word names and a SKU give four terms per product.
+        products = options['entries'] // 4
+        objects = [
+            (
+                'product', i + 1,
+                f'{rng.choice(WORDS)} {rng.choice(WORDS)} {rng.choice(NOUNS)} {i}',
+                f'SKU-{i:08d}',
+                int(rng.paretovariate(1.2)),
+            )
+            for i in range(products)
+        ]
+        
+        start = time.perf_counter()
+        index = AutocompleteIndex.from_objects(objects)
+        self.stdout.write(
+            f'built {len(index.keys)} terms, {len(index.heavy)} heavy prefixes '
+            f'in {time.perf_counter() - start:.1f} s'
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'autocomplete.npz')
+            index.save(path)
+            start = time.perf_counter()
+            index = AutocompleteIndex.load(path)
+            self.stdout.write(
+                f'loaded {os.path.getsize(path) / 2 ** 20:.1f} MiB in {(time.perf_counter() - start) * 1000:.0f} ms'
+            )
+        
+        queries = []
+        for _ in range(options['queries']):
+            term = rng.choice(index.keys)
+            queries.append(term[:rng.randint(1, min(len(term), 10))])
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            [index.result(object_index) for object_index in index.candidates(query)[:10]]
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        for label, quantile in [('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('max', 1.0)]:
+            value = timings[min(int(quantile * len(timings)), len(timings) - 1)]
+            self.stdout.write(f'{label:<4} {value * 1e6:>9.1f} us')
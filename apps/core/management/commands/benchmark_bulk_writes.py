@@ -0,0 +1,52 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIClient
+
+from apps.core.benchmarking import format_row, measure, rolled_back, seed_catalog
+from apps.core.bulk import chunked
+from apps.core.mixins import BulkModelMixin
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Compare creating products through single POSTs and through the bulk endpoint.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+    
+    def handle(self, *args, **options):
+        rows = options['rows']
+        with rolled_back():
+            seed = seed_catalog(1)[0]
+            client = APIClient()
+            client.force_authenticate(User.objects.create(username='bench-admin', email='bench-admin@example.com'))
+            
+            def payload(prefix):
+                return [
+                    {
+                        'name': f'{prefix} product {i}',
+                        'description': 'Benchmark product',
+                        'price': '9.99',
+                        'category': seed.category_id,
+                        'vendor': seed.vendor_id,
+                        'stock_quantity': 10,
+                        'sku': f'{prefix.upper()}-{i:08d}',
+                    }
+                    for i in range(rows)
+                ]
+            
+            def single():
+                for row in payload('single'):
+                    response = client.post('/api/v1/products/', row, format='json')
+                    if response.status_code != 201:
+                        raise CommandError(f'Single create failed: {response.data}')
+            
+            def bulk():
+                for chunk in chunked(payload('bulk'), BulkModelMixin.bulk_max_rows):
+                    response = client.post('/api/v1/products/bulk/', chunk, format='json')
+                    if response.status_code != 201:
+                        raise CommandError(f'Bulk create failed: {response.data}')
+            
+            self.stdout.write(format_row(f'{rows} single POSTs', measure(single)))
+            self.stdout.write(format_row(f'{rows} rows via bulk/', measure(bulk)))
@@ -0,0 +1,90 @@
+import time
+from datetime import timedelta
+
+from django.core.mail import send_mail
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from apps.core.benchmarking import rolled_back
+from apps.core.mail import flush_all, queue_email
+from apps.core.models import QueuedEmail
+from apps.core.smtp_stub import SMTPStub
+
+
+def order_confirmations(count):
+    return [
+        ('order_confirmation', f'customer-{i}@example.com', {
+            'customer_name': f'Customer {i}',
+            'order_number': f'ORD-{i:08d}',
+            'total_amount': '33.00',
+            'status': 'pending',
+        })
+        for i in range(count)
+    ]
+
+
+def low_stock_alerts(count, vendors):
+    return [
+        ('low_stock', f'vendor-{i % vendors}@example.com', {
+            'vendor_name': f'Vendor {i % vendors}',
+            'product_id': i,
+            'product_name': f'Product {i}',
+            'stock_quantity': i % 5,
+        })
+        for i in range(count)
+    ]
+
+
+def send_each(emails):
+    """
+    One ``send_mail`` per message, as the tasks used to.
+    """
+    start = time.perf_counter()
+    for kind, recipient, context in emails:
+        send_mail(f'{kind} {recipient}', repr(context), None, [recipient])
+    return 0, time.perf_counter() - start
+
+
+def queue_and_flush(emails):
+    start = time.perf_counter()
+    for email in emails:
+        queue_email(*email)
+    queued = time.perf_counter()
+    # As if the digest windows had passed.
+    QueuedEmail.objects.update(send_after=timezone.now() - timedelta(seconds=1))
+    flushed = time.perf_counter()
+    flush_all()
+    return queued - start, time.perf_counter() - flushed
+
+
+class Command(BaseCommand):
+    help = 'Compare per-message send_mail with queued, batched delivery against a local SMTP stub.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=2000)
+        parser.add_argument('--vendors', type=int, default=20)
+    
+    def handle(self, *args, **options):
+        count = options['messages']
+        cases = [
+            ('order confirmations', order_confirmations(count)),
+            ('low stock alerts', low_stock_alerts(count, options['vendors'])),
+        ]
+        for label, emails in cases:
+            for method, func in [('send_mail each', send_each), ('queued, batched', queue_and_flush)]:
+                with SMTPStub() as stub, override_settings(
+                    EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                    EMAIL_HOST='127.0.0.1',
+                    EMAIL_PORT=stub.port,
+                    EMAIL_USE_TLS=False,
+                    EMAIL_USE_SSL=False,
+                ), rolled_back():
+                    queueing, sending = func(emails)
+                    if QueuedEmail.objects.exists():
+                        raise CommandError(f'{label}: queued emails were left behind.')
+                self.stdout.write(
+                    f"{label + ': ' + method:<38} queue {queueing * 1000:>8.1f} ms  "
+                    f"send {sending * 1000:>8.1f} ms  {len(emails) / sending:>7.0f} messages/s  "
+                    f"{stub.stats['messages']:>5} emails  {stub.stats['connections']:>5} connections"
+                )
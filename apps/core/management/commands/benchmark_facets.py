@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+
+from apps.core.benchmarking import format_row, measure, rolled_back, seed_catalog
+from apps.products.facets import cached_facet_counts, facet_counts, price_buckets
+from apps.products.models import Category, Product
+from apps.products.views import ProductFilter
+
+
+def separate_counts(queryset):
+    """
+    The facet counts as one filtered ``COUNT`` per facet value.
+    """
+    categories = {pk: queryset.filter(category_id=pk).count() for pk in Category.objects.values_list('pk', flat=True)}
+    prices = []
+    for _, low, high in price_buckets():
+        bucket = queryset.filter(price__gte=low)
+        prices.append((bucket.filter(price__lt=high) if high is not None else bucket).count())
+    prices.append(queryset.filter(price__isnull=True).count())
+    return {
+        'category': {pk: count for pk, count in categories.items() if count},
+        'price': prices,
+        'in_stock': queryset.filter(stock_quantity__gt=0).count(),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Compare per-value COUNT queries with the single-pass facet aggregate.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000000)
+        parser.add_argument('--categories', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=3)
+    
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        with rolled_back():
+            products = seed_catalog(options['products'], vendors=100, categories=options['categories'])
+            category = products[0].category_id
+            
+            cases = [
+                ('all products', ''),
+                ('one category', f'category={category}'),
+                ('price range', 'min_price=100&max_price=300'),
+                ('in stock, category', f'in_stock=true&category={category}'),
+            ]
+            for label, query in cases:
+                params = QueryDict(query)
+                queryset = ProductFilter(params, Product.objects.all()).qs
+                separate = measure(lambda: separate_counts(queryset), repeat)
+                single = measure(lambda: facet_counts(queryset), repeat)
+                cached_facet_counts(queryset, params)
+                cached = measure(lambda: cached_facet_counts(queryset, params), repeat)
+                
+                counts = single['result']
+                if separate['result'] != {
+                    'category': {row['id']: row['count'] for row in counts['category']},
+                    'price': [row['count'] for row in counts['price']],
+                    'in_stock': counts['in_stock']['true'],
+                }:
+                    raise CommandError(f'{label}: facet counts differ from the separate counts')
+                
+                self.stdout.write(format_row(f'{label}: separate counts', separate))
+                self.stdout.write(format_row(f'{label}: one aggregate', single))
+                self.stdout.write(format_row(f'{label}: cached', cached))
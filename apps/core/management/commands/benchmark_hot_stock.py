@@ -0,0 +1,106 @@
+import statistics
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connections, transaction
+
+from apps.core.benchmarking import seed_catalog
+from apps.products.inventory import disable_sharding, enable_sharding, rebalance, reserve
+from apps.products.models import Category, Product
+
+User = get_user_model()
+
+PREFIX = 'bench-hot'
+
+
+class Command(BaseCommand):
+    help = (
+        'Reserve stock of one hot product from a growing number of threads, '
+        'with a single stock row and with sharded stock counters.'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+        parser.add_argument('--reservations', type=int, default=200, help='Reservations per thread.')
+        parser.add_argument('--shards', type=int, default=8)
+        parser.add_argument(
+            '--hold-ms', type=float, default=2,
+            help='Time each checkout keeps its transaction open after reserving.'
+        )
+    
+    def handle(self, *args, **options):
+        # Worker threads use their own connections, so the product has to
+        # be committed.
+        product = seed_catalog(1, prefix=PREFIX)[0]
+        try:
+            for mode in ('single row', 'sharded'):
+                for threads in options['threads']:
+                    stock = threads * options['reservations']
+                    Product.objects.filter(pk=product.pk).update(stock_quantity=stock)
+                    if mode == 'sharded':
+                        enable_sharding(product, options['shards'])
+                    
+                    self.run_case(mode, product.pk, threads, options['reservations'], options['hold_ms'] / 1000)
+                    
+                    if mode == 'sharded':
+                        rebalance(product.pk)
+                        product = disable_sharding(product)
+                    product.refresh_from_db()
+        finally:
+            for connection in connections.all():
+                connection.close()
+            User.objects.filter(username__startswith=PREFIX).delete()
+            Category.objects.filter(name__startswith=PREFIX).delete()
+    
+    def run_case(self, mode, product_id, threads, reservations, hold):
+        latencies = []
+        counts = {'reserved': 0, 'sold out': 0, 'errors': 0}
+        lock = threading.Lock()
+        
+        def checkout():
+            own = []
+            own_counts = dict.fromkeys(counts, 0)
+            try:
+                for _ in range(reservations):
+                    start = time.perf_counter()
+                    try:
+                        with transaction.atomic():
+                            reserved = reserve(product_id, 1)
+                            time.sleep(hold)
+                    except DatabaseError:
+                        own_counts['errors'] += 1
+                        continue
+                    own.append(time.perf_counter() - start)
+                    own_counts['reserved' if reserved else 'sold out'] += 1
+            finally:
+                connections.close_all()
+            with lock:
+                latencies.extend(own)
+                for key, value in own_counts.items():
+                    counts[key] += value
+        
+        workers = [threading.Thread(target=checkout) for _ in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        wall = time.perf_counter() - start
+        
+        stock = threads * reservations
+        left = Product.objects.get(pk=product_id).stock_quantity
+        if mode == 'sharded':
+            left = sum(Product.objects.get(pk=product_id).stock_shards.values_list('quantity', flat=True))
+        if left != stock - counts['reserved']:
+            raise CommandError(f'{mode}, {threads} threads: {left} left after {counts["reserved"]} of {stock} reserved')
+        
+        latencies.sort()
+        p50 = statistics.median(latencies) if latencies else 0
+        p99 = latencies[int(len(latencies) * 0.99) - 1] if latencies else 0
+        self.stdout.write(
+            f'{mode:<10} {threads:>3} threads   {counts["reserved"] / wall:>8.1f} reservations/s   '
+            f'p50 {p50 * 1000:>7.1f} ms   p99 {p99 * 1000:>7.1f} ms   '
+            f'sold out {counts["sold out"]:>4}   errors {counts["errors"]:>4}'
+        )
@@ -0,0 +1,67 @@
+import os
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image, ImageDraw
+
+from apps.core.images import IMAGE_PROCESS_WORKERS, _render_all
+
+
+def sample_images(count, size=(2400, 1800)):
+    """
+    JPEG photos-like samples: gradients with random shapes.
+    """
+    rng = random.Random(0)
+    samples = []
+    for _ in range(count):
+        image = Image.linear_gradient('L').resize(size).convert('RGB')
+        draw = ImageDraw.Draw(image)
+        for _ in range(40):
+            x, y = rng.randrange(size[0]), rng.randrange(size[1])
+            colour = tuple(rng.randrange(256) for _ in range(3))
+            draw.ellipse((x, y, x + rng.randrange(50, 600), y + rng.randrange(50, 600)), fill=colour)
+        path = f'/tmp/benchmark-image-{len(samples)}.jpg'
+        image.save(path, 'JPEG', quality=92)
+        samples.append(path)
+    return samples
+
+
+class Command(BaseCommand):
+    help = 'Measure image variant throughput on a folder of sample images.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('folder', nargs='?', help='Folder of images (default: generated samples).')
+        parser.add_argument('--count', type=int, default=50, help='Samples to generate without a folder.')
+        parser.add_argument('--workers', type=int, default=IMAGE_PROCESS_WORKERS)
+    
+    def handle(self, *args, **options):
+        if options['folder']:
+            if not os.path.isdir(options['folder']):
+                raise CommandError(f"{options['folder']} is not a directory.")
+            paths = sorted(
+                os.path.join(options['folder'], name) for name in os.listdir(options['folder'])
+                if os.path.isfile(os.path.join(options['folder'], name))
+            )
+        else:
+            paths = sample_images(options['count'])
+        datas = []
+        for path in paths:
+            with open(path, 'rb') as f:
+                datas.append(f.read())
+        
+        for workers in sorted({1, options['workers']}):
+            start = time.perf_counter()
+            results = _render_all(datas, workers)
+            elapsed = time.perf_counter() - start
+            rendered = [result for result in results if result is not None]
+            size_in = sum(len(data) for data, result in zip(datas, results) if result is not None)
+            size_out = sum(len(content) for _, _, variants in rendered for content in variants.values())
+            self.stdout.write(
+                f'{workers:>2} workers  {len(rendered):>5} images  {elapsed:>7.2f} s  '
+                f'{len(rendered) / elapsed:>7.1f} images/s  '
+                f'{size_in / 2 ** 20:>7.1f} MiB in  {size_out / 2 ** 20:>7.1f} MiB out'
+            )
+        if not options['folder']:
+            for path in paths:
+                os.remove(path)
@@ -0,0 +1,51 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from apps.core.benchmarking import (
+    format_row, measure, rolled_back, seed_catalog, seed_orders, seed_users
+)
+from apps.orders.models import Order
+from apps.orders.serializers import OrderListSerializer, OrderListValuesSerializer
+from apps.products.models import Product
+from apps.products.serializers import ProductListSerializer, ProductListValuesSerializer
+from apps.users.serializers import UserListSerializer, UserListValuesSerializer
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Compare CPU and memory of model-based and values-based list serializers.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=3)
+    
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        with rolled_back():
+            products = seed_catalog(rows)
+            seed_orders(rows, products)
+            seed_users(rows, prefix='bench-user')
+            
+            cases = [
+                ('products', Product.objects.all(), ProductListSerializer, ProductListValuesSerializer),
+                ('orders', Order.objects.all(), OrderListSerializer, OrderListValuesSerializer),
+                ('users', User.objects.all(), UserListSerializer, UserListValuesSerializer),
+            ]
+            for label, queryset, model_serializer, values_serializer in cases:
+                model_stats = measure(
+                    lambda: JSONRenderer().render(model_serializer(queryset.all(), many=True).data),
+                    repeat
+                )
+                values_stats = measure(
+                    lambda: JSONRenderer().render(
+                        values_serializer(values_serializer.get_values_queryset(queryset.all()), many=True).data
+                    ),
+                    repeat
+                )
+                if model_stats['result'] != values_stats['result']:
+                    raise CommandError(f'{label}: values serializer output differs from model serializer')
+                
+                self.stdout.write(format_row(f'{label} model serializer', model_stats))
+                self.stdout.write(format_row(f'{label} values serializer', values_stats))
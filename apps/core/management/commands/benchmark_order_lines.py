@@ -0,0 +1,71 @@
+import tempfile
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.orders.columnar import CATEGORICALS, OrderLineSnapshot, day_number
+
+
+class Command(BaseCommand):
+    help = 'Time group-by scans over a synthetic columnar order line snapshot.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50000000)
+        parser.add_argument('--days', type=int, default=730)
+        parser.add_argument('--categories', type=int, default=50)
+        parser.add_argument('--vendors', type=int, default=2000)
+    
+    def handle(self, *args, **options):
+        rows = options['rows']
+        rng = np.random.default_rng(0)
+        with tempfile.TemporaryDirectory() as path:
+            snapshot = OrderLineSnapshot(path)
+            snapshot.manifest['dictionaries'] = {
+                'category': [f'category {i}' for i in range(options['categories'])],
+                'vendor': [f'vendor {i}' for i in range(options['vendors'])],
+                'status': ['pending', 'confirmed', 'processing', 'shipped', 'delivered', 'cancelled'],
+            }
+            first_day = day_number(timezone.localdate() - timedelta(days=options['days']))
+            
+            start = time.perf_counter()
+            chunk = 10000000
+            for offset in range(0, rows, chunk):
+                size = min(chunk, rows - offset)
+                days = first_day + (np.arange(offset, offset + size, dtype=np.int64) * options['days'] // rows)
+                snapshot.append({
+                    'item_id': np.arange(offset, offset + size),
+                    'order_id': np.arange(offset, offset + size) // 3,
+                    'product_id': rng.integers(1, 100000, size),
+                    'created_at': days * 86400,
+                    'day': days,
+                    'quantity': rng.integers(1, 5, size),
+                    'revenue': rng.integers(100, 50000, size),
+                    **{
+                        name: rng.integers(0, len(snapshot.manifest['dictionaries'][name]), size)
+                        for name in CATEGORICALS
+                    },
+                })
+            snapshot.manifest['last_day'] = timezone.localdate().isoformat()
+            snapshot.write_manifest()
+            self.stdout.write(f'wrote {rows} rows in {time.perf_counter() - start:.1f} s')
+            
+            cases = [
+                ('revenue by category by week', {'group_by': ['category'], 'bucket': 'week'}),
+                ('revenue by vendor', {'group_by': ['vendor']}),
+                ('revenue by status', {'group_by': ['status']}),
+                ('delivered by month', {'bucket': 'month', 'where': {'status': ['delivered', 'shipped']}}),
+                ('last 90 days by category', {
+                    'group_by': ['category'], 'start': timezone.localdate() - timedelta(days=90),
+                }),
+            ]
+            for label, query in cases:
+                start = time.perf_counter()
+                groups = snapshot.aggregate(**query)
+                elapsed = time.perf_counter() - start
+                self.stdout.write(
+                    f'{label:<28} {len(groups):>7} groups   {elapsed * 1000:>9.1f} ms   '
+                    f'{rows / elapsed / 1e6:>8.1f} M rows/s'
+                )
@@ -0,0 +1,92 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from apps.core.benchmarking import format_row, measure, seed_catalog, seed_orders
+from apps.core.bulk import chunked
+from apps.orders.models import Order
+from apps.orders.reports import generate, read_report
+from apps.products.models import Category
+from apps.users.models import User
+
+PREFIX = 'reportbench'
+
+
+def python_totals(start, end):
+    """
+    The previous report: orders and revenue summed in Python, a day at a
+    time.
+    """
+    totals = {}
+    day = start
+    while day <= end:
+        orders = Order.objects.filter(created_at__date=day)
+        totals[day] = (orders.count(), sum(order.total_amount for order in orders))
+        day += timedelta(days=1)
+    return totals
+
+
+class Command(BaseCommand):
+    help = (
+        'Time daily report generation over seeded order history: sequential per-day, '
+        'parallel ranges, and incremental reruns. Seeds committed rows and deletes them afterwards.'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=100000)
+        parser.add_argument('--days', type=int, default=90)
+        parser.add_argument('--workers', type=int, default=4)
+    
+    def handle(self, *args, **options):
+        days = options['days']
+        directory = tempfile.mkdtemp()
+        end = timezone.localdate() - timedelta(days=1)
+        start = end - timedelta(days=days - 1)
+        try:
+            with transaction.atomic():
+                products = seed_catalog(500, vendors=20, categories=10, prefix=PREFIX)
+                orders = seed_orders(options['orders'], products, customers=200, prefix=PREFIX)
+                by_day = [orders[offset::days] for offset in range(days)]
+                for offset, group in enumerate(by_day):
+                    at = timezone.now() - timedelta(days=offset + 1)
+                    for chunk in chunked([order.pk for order in group], 500):
+                        Order.objects.filter(pk__in=chunk).update(created_at=at, updated_at=at)
+            
+            cases = [
+                ('python sums, per day', lambda: python_totals(start, end)),
+                ('sql, per day, 1 thread', lambda: generate(start, end, 1, 1, True, directory)),
+                ('sql, 7-day ranges, 1 thread', lambda: generate(start, end, 1, 7, True, directory)),
+                (
+                    f"sql, 7-day ranges, {options['workers']} threads",
+                    lambda: generate(start, end, options['workers'], 7, True, directory),
+                ),
+                ('rerun, nothing changed', lambda: generate(start, end, options['workers'], 7, False, directory)),
+            ]
+            for label, func in cases:
+                stats = measure(func)
+                written = stats['result'] if isinstance(stats['result'], int) else len(stats['result'])
+                self.stdout.write(f'{format_row(label, stats)}   {written:>4} days')
+            
+            order = Order.objects.filter(pk=orders[0].pk).first()
+            order.status = 'cancelled' if order.status != 'cancelled' else 'pending'
+            order.save()
+            stats = measure(lambda: generate(start, end, options['workers'], 7, False, directory))
+            self.stdout.write(f"{format_row('rerun, one order changed', stats)}   {stats['result']:>4} days")
+            
+            expected = python_totals(start, end)
+            for day, (count, revenue) in expected.items():
+                report = read_report(day, directory)
+                by_status = report['by_status'].values()
+                if (sum(row['orders'] for row in by_status), sum(Decimal(row['revenue']) for row in by_status)) != (
+                    count, revenue
+                ):
+                    raise CommandError(f'{day}: report totals differ from the orders')
+        finally:
+            User.objects.filter(username__startswith=PREFIX).delete()
+            Category.objects.filter(slug__startswith=PREFIX).delete()
+            shutil.rmtree(directory)
@@ -0,0 +1,83 @@
+import statistics
+import threading
+import time
+from contextlib import ExitStack
+
+from celery import Celery
+from celery.contrib.testing.worker import start_worker
+from django.core.management.base import BaseCommand
+
+from apps.core import task_metrics
+from apps.core.task_routing import celery_config
+
+CONFIRMATION = 'celery_tasks.send_order_confirmation_email'
+SYNC = 'celery_tasks.sync_external_inventory'
+
+
+def make_app(routed):
+    """
+    An app on the in-memory broker with stand-ins for the real tasks:
+    syncs sleep, confirmations record how long they waited.
+    """
+    app = Celery('benchmark', broker='memory://', backend='cache+memory://', set_as_current=False)
+    if routed:
+        app.conf.update(celery_config(app.conf.broker_url))
+    else:
+        app.conf.task_default_queue = 'default'
+    app.conf.broker_transport_options = {**app.conf.broker_transport_options, 'polling_interval': 0.005}
+    app.conf.worker_hijack_root_logger = False
+    app.latencies = []
+    app.done = threading.Semaphore(0)
+    
+    @app.task(name=SYNC, shared=False)
+    def sync(seconds):
+        time.sleep(seconds)
+    
+    @app.task(name=CONFIRMATION, shared=False)
+    def confirm(sent_at):
+        app.latencies.append(time.perf_counter() - sent_at)
+        app.done.release()
+    
+    return app, sync, confirm
+
+
+class Command(BaseCommand):
+    help = 'Measure order confirmation latency while a bulk inventory sync is running.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--syncs', type=int, default=40)
+        parser.add_argument('--sync-seconds', type=float, default=0.5)
+        parser.add_argument('--confirmations', type=int, default=20)
+        parser.add_argument('--interval', type=float, default=0.05)
+        parser.add_argument('--concurrency', type=int, default=4, help='Worker threads in total.')
+    
+    def handle(self, *args, **options):
+        concurrency = options['concurrency']
+        scenarios = [
+            ('one shared queue', False, [('default', concurrency)]),
+            ('critical / bulk queues', True, [('critical', concurrency // 2), ('bulk', concurrency - concurrency // 2)]),
+        ]
+        # The stand-ins would record telemetry under the real task names.
+        with task_metrics.paused():
+            for label, routed, workers in scenarios:
+                app, sync, confirm = make_app(routed)
+                for _ in range(options['syncs']):
+                    sync.delay(options['sync_seconds'])
+                
+                with ExitStack() as stack:
+                    for queue, threads in workers:
+                        stack.enter_context(start_worker(
+                            app, concurrency=threads, pool='threads', perform_ping_check=False, queues=[queue]
+                        ))
+                    for _ in range(options['confirmations']):
+                        time.sleep(options['interval'])
+                        confirm.delay(time.perf_counter())
+                    for _ in range(options['confirmations']):
+                        app.done.acquire()
+                
+                latencies = sorted(app.latencies)
+                self.stdout.write(
+                    f'{label:<24} confirmation latency  p50 {statistics.median(latencies) * 1000:>8.1f} ms  '
+                    f'p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:>8.1f} ms  '
+                    f'max {latencies[-1] * 1000:>8.1f} ms'
+                )
@@ -0,0 +1,75 @@
+import multiprocessing
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from apps.core.bulk import chunked
+from apps.core.identifiers import order_numbers
+from apps.orders.counters import apply_customer_deltas
+from apps.orders.models import Order
+
+User = get_user_model()
+
+
+def create_orders(customer_id, count, batch_size):
+    """
+    Worker: bulk_create ``count`` orders numbered by the allocator.
+    """
+    created = []
+    for chunk in chunked(range(count), batch_size):
+        numbers = order_numbers.allocate(len(chunk))
+        Order.objects.bulk_create([
+            Order(
+                order_number=number,
+                customer_id=customer_id,
+                shipping_address='-',
+                billing_address='-',
+                total_amount=Decimal('0.00'),
+            )
+            for number in numbers
+        ])
+        apply_customer_deltas({customer_id: len(numbers)})
+        created.extend(numbers)
+    connections.close_all()
+    return created
+
+
+class Command(BaseCommand):
+    help = 'Create orders from several processes at once and check that no order number repeats.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=100000)
+        parser.add_argument('--processes', type=int, default=8)
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--keep', action='store_true', help='Keep the created orders.')
+    
+    def handle(self, *args, **options):
+        total, processes = options['orders'], options['processes']
+        customer = User.objects.create(
+            username='allocator-check', email='allocator-check@example.com', is_active=False
+        )
+        shares = [total // processes + (1 if i < total % processes else 0) for i in range(processes)]
+        
+        # Children must open their own connections.
+        connections.close_all()
+        try:
+            with multiprocessing.get_context('fork').Pool(processes) as pool:
+                results = pool.starmap(
+                    create_orders,
+                    [(customer.pk, share, options['batch_size']) for share in shares]
+                )
+            
+            numbers = [number for result in results for number in result]
+            stored = Order.objects.filter(customer=customer).values('order_number').distinct().count()
+            self.stdout.write(
+                f'{len(numbers)} orders from {processes} processes, '
+                f'{len(set(numbers))} distinct allocated, {stored} distinct stored'
+            )
+            if len(set(numbers)) != total or stored != total:
+                raise CommandError('Order number collision detected.')
+            self.stdout.write(self.style.SUCCESS('No collisions.'))
+        finally:
+            if not options['keep']:
+                customer.delete()
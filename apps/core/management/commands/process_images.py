@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.bulk import chunked
+from apps.core.images import IMAGE_PROCESS_WORKERS, WATCHED_FIELDS, process
+
+
+class Command(BaseCommand):
+    help = 'Generate the resized variants of every uploaded image that lacks some.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=IMAGE_PROCESS_WORKERS)
+        parser.add_argument('--batch-size', type=int, default=100)
+    
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--workers and --batch-size must be at least 1.')
+        
+        total = 0
+        for model, field_name in WATCHED_FIELDS:
+            sources = model.objects.exclude(**{field_name: ''}).values_list(field_name, flat=True).distinct()
+            processed = 0
+            for batch in chunked(sources.iterator(chunk_size=2000), options['batch_size']):
+                processed += process(batch, workers=options['workers'])
+            self.stdout.write(f'{model._meta.label}.{field_name}: {processed} images')
+            total += processed
+        self.stdout.write(self.style.SUCCESS(f'Processed {total} images.'))
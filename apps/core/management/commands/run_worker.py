@@ -0,0 +1,24 @@
+import shlex
+
+from django.core.management.base import BaseCommand
+
+from apps.core.task_routing import TASK_QUEUE_PROFILES, worker_arguments
+
+
+class Command(BaseCommand):
+    help = "Start a Celery worker for one queue with that queue's profile."
+    
+    def add_arguments(self, parser):
+        parser.add_argument('queue', choices=sorted(TASK_QUEUE_PROFILES))
+        parser.add_argument('--loglevel', default='info')
+        parser.add_argument('--print', action='store_true', help='Print the worker arguments instead of starting it.')
+    
+    def handle(self, *args, **options):
+        argv = [*worker_arguments(options['queue']), f"--loglevel={options['loglevel']}"]
+        if options['print']:
+            self.stdout.write(shlex.join(argv))
+            return
+        # Imported here, once Django is set up.
+        from celery_tasks import app
+        
+        app.worker_main(argv)
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.core.smtp_stub import SMTPStub
+
+
+class Command(BaseCommand):
+    help = 'Run a local SMTP server that accepts and discards all mail.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=1025)
+    
+    def handle(self, *args, **options):
+        with SMTPStub(options['host'], options['port'], verbose=True) as stub:
+            self.stdout.write(f"SMTP stub listening on {options['host']}:{stub.port}; Ctrl-C to stop.")
+            try:
+                while True:
+                    time.sleep(3600)
+            except KeyboardInterrupt:
+                pass
+        self.stdout.write(f'{stub.stats}')
@@ -0,0 +1,89 @@
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from .bulk import BulkWriter
+
+
+class ValuesListMixin:
+    """
+    Serve the ``list`` action from ``QuerySet.values()`` rows.
+    
+    ``get_serializer_class()`` must return a ``ValuesSerializer`` subclass
+    for the ``list`` action. Filtering, searching, ordering and pagination
+    run on the model queryset as usual; only the final fetch is switched
+    to plain dictionaries.
+    """
+    def list(self, request, *args, **kwargs):
+        serializer_class = self.get_serializer_class()
+        queryset = self.filter_queryset(self.get_queryset())
+        queryset = serializer_class.get_values_queryset(queryset)
+        
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+
+class BulkModelMixin:
+    """
+    Add a ``bulk/`` endpoint taking a list of objects: ``POST`` creates
+    them, ``PATCH`` updates them by ``id``.
+    
+    The default ``?mode=atomic`` writes nothing unless every row is valid;
+    ``?mode=partial`` writes the valid rows. Either way the response lists
+    the written ids and the errors by row index.
+    """
+    bulk_serializer_class = None
+    bulk_max_rows = 10000
+    
+    def get_bulk_save_kwargs(self):
+        """
+        Extra attributes set on every created object, like ``perform_create``
+        would pass to ``serializer.save()``.
+        """
+        return {}
+    
+    @action(detail=False, methods=['post', 'patch'], url_path='bulk')
+    def bulk(self, request, *args, **kwargs):
+        """
+        Create or update many objects in one request.
+        """
+        rows = request.data
+        if not isinstance(rows, list) or not rows:
+            return Response(
+                {'error': 'Expected a non-empty list of objects.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(rows) > self.bulk_max_rows:
+            return Response(
+                {'error': f'At most {self.bulk_max_rows} objects can be sent per request.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        mode = request.query_params.get('mode', 'atomic')
+        if mode not in ('atomic', 'partial'):
+            return Response(
+                {'error': "mode must be 'atomic' or 'partial'."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        writer = BulkWriter(
+            self.bulk_serializer_class or self.get_serializer_class(),
+            self.get_queryset(),
+            context=self.get_serializer_context(),
+            save_kwargs=self.get_bulk_save_kwargs() if request.method == 'POST' else None,
+            partial_success=mode == 'partial',
+        )
+        report = writer.create(rows) if request.method == 'POST' else writer.update(rows)
+        
+        if not report['errors']:
+            response_status = status.HTTP_201_CREATED if request.method == 'POST' else status.HTTP_200_OK
+        elif report['results']:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response(report, status=response_status)
@@ -0,0 +1,182 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, router, transaction
+
+
+class IdentifierSequence(models.Model):
+    """
+    Named counter backing ``apps.core.identifiers.IdentifierAllocator``.
+    
+    ``next_value`` is the first value not yet handed out to any process.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    next_value = models.BigIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Identifier sequence'
+        verbose_name_plural = 'Identifier sequences'
+        ordering = ['name']
+    
+    def __str__(self):
+        return self.name
+
+
+class OutboxEvent(models.Model):
+    """
+    A change to an aggregate, written in the same transaction as the change.
+    
+    See ``apps.core.outbox``.
+    """
+    aggregate_type = models.CharField(max_length=50)
+    aggregate_id = models.CharField(max_length=64)
+    event_type = models.CharField(max_length=100)
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    dispatched_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = 'Outbox event'
+        verbose_name_plural = 'Outbox events'
+        ordering = ['id']
+        indexes = [
+            models.Index(
+                fields=['id'],
+                name='outbox_pending_idx',
+                condition=models.Q(dispatched_at__isnull=True),
+            ),
+            models.Index(fields=['aggregate_type', 'id'], name='outbox_aggregate_type_idx'),
+        ]
+    
+    def __str__(self):
+        return f'{self.event_type} {self.aggregate_type}:{self.aggregate_id}'
+    
+    def as_message(self):
+        return {
+            'id': self.pk,
+            'aggregate_type': self.aggregate_type,
+            'aggregate_id': self.aggregate_id,
+            'event_type': self.event_type,
+            'payload': self.payload,
+            'created_at': self.created_at,
+        }
+
+
+class ImageVariants(models.Model):
+    """
+    The resized copies generated for an uploaded image.
+    
+    See ``apps.core.images``. Variants are stored by ``content_hash``, so
+    identical uploads share them; an empty ``variants`` list marks a file
+    that could not be processed.
+    """
+    source = models.CharField(max_length=255, unique=True)
+    content_hash = models.CharField(max_length=64, db_index=True)
+    width = models.PositiveIntegerField(default=0)
+    height = models.PositiveIntegerField(default=0)
+    variants = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Image variants'
+        verbose_name_plural = 'Image variants'
+    
+    def __str__(self):
+        return self.source
+
+
+class QueuedEmail(models.Model):
+    """
+    An email waiting to be sent by ``apps.core.mail.flush``.
+    
+    ``context`` fills the templates of ``kind``; messages of a digest kind
+    for the same ``recipient`` go out as one email. Failed sends count in
+    ``attempts``; after ``EMAIL_MAX_ATTEMPTS`` the message is parked and no
+    longer sent.
+    """
+    kind = models.CharField(max_length=50)
+    recipient = models.EmailField()
+    context = models.JSONField(encoder=DjangoJSONEncoder)
+    send_after = models.DateTimeField(db_index=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    parked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Queued email'
+        verbose_name_plural = 'Queued emails'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['recipient', 'kind'], name='queued_email_recipient_idx'),
+        ]
+    
+    def __str__(self):
+        return f'{self.kind} to {self.recipient}'
+
+
+class OutboxModel(models.Model):
+    """
+    Abstract base for models whose saves and deletes go to the outbox.
+    
+    ``save()`` runs in a transaction that also records the events from
+    ``outbox_events()``; deletes, including cascades, are recorded by a
+    ``post_delete`` receiver inside the deleting transaction.
+    """
+    outbox_aggregate_type = None
+    outbox_event_prefix = None
+    outbox_fields = []
+    
+    class Meta:
+        abstract = True
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets save() and the signal handlers see what a save changes
+        # without a query.
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+    
+    def outbox_aggregate_id(self):
+        return self.pk
+    
+    def outbox_payload(self):
+        return {field: getattr(self, field) for field in self.outbox_fields}
+    
+    def outbox_events(self, action, previous):
+        """
+        Return ``(event_type, payload)`` pairs for ``action`` ('created',
+        'updated' or 'deleted'). ``previous`` holds the stored values before
+        an update, as far as they were loaded.
+        """
+        return [(f'{self.outbox_event_prefix}.{action}', self.outbox_payload())]
+    
+    def save(self, *args, **kwargs):
+        from .outbox import record_instance_events
+        
+        action = 'created' if self._state.adding else 'updated'
+        previous = dict(getattr(self, '_loaded_values', {}))
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+            record_instance_events(self, action, previous, using=using)
+
+
+class CounterColumnsMixin:
+    """
+    For models whose ``counter_fields`` are only changed with ``F()``
+    updates: saving an existing row writes every other field, so an
+    instance loaded before an update cannot write back stale counts.
+    """
+    counter_fields = []
+    
+    def save(self, *args, **kwargs):
+        updating = not self._state.adding and not args and not kwargs.get('force_insert')
+        if updating and kwargs.get('update_fields') is None:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.counter_fields
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
@@ -0,0 +1,181 @@
+"""
+Transactional outbox for catalog and order changes.
+
+Every change to an ``OutboxModel`` (``Product``, ``Order``, ``OrderItem``)
+adds an ``OutboxEvent`` row in the same transaction, so an event exists
+if and only if the change committed. Writes that skip ``save()``
+(``bulk_create``/``bulk_update`` in ``BulkWriter``, bulk status
+transitions) call ``record_events`` themselves.
+
+``relay`` delivers pending events in id order to the sinks in
+``OUTBOX_SINKS`` and marks them dispatched; a failing sink leaves the
+batch pending, so delivery is at least once. Events of one aggregate
+(``aggregate_type``/``aggregate_id``; order items belong to their order)
+are always delivered in the order they were written, and consumers can
+use the event ``id`` to drop redeliveries.
+
+``change_feed`` serves the same events to pull consumers by cursor.
+"""
+import json
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, connection, transaction
+from django.db.models.signals import post_delete
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import OutboxEvent, OutboxModel
+
+OUTBOX_BATCH_SIZE = getattr(settings, 'OUTBOX_BATCH_SIZE', 500)
+OUTBOX_FEED_SETTLE_SECONDS = getattr(settings, 'OUTBOX_FEED_SETTLE_SECONDS', 2)
+
+
+def record_events(events, using=DEFAULT_DB_ALIAS):
+    """
+    Insert ``(aggregate_type, aggregate_id, event_type, payload)`` tuples.
+    
+    Must run inside the transaction making the change.
+    """
+    rows = [
+        OutboxEvent(
+            aggregate_type=aggregate_type,
+            aggregate_id=str(aggregate_id),
+            event_type=event_type,
+            payload=json.loads(json.dumps(payload, cls=DjangoJSONEncoder)),
+        )
+        for aggregate_type, aggregate_id, event_type, payload in events
+    ]
+    OutboxEvent.objects.using(using).bulk_create(rows, batch_size=OUTBOX_BATCH_SIZE)
+
+
+def instance_events(instance, action, previous):
+    aggregate_id = instance.outbox_aggregate_id()
+    return [
+        (instance.outbox_aggregate_type, aggregate_id, event_type, payload)
+        for event_type, payload in instance.outbox_events(action, previous)
+    ]
+
+
+def record_instance_events(instance, action, previous=None, using=DEFAULT_DB_ALIAS):
+    record_events(instance_events(instance, action, previous or {}), using=using)
+
+
+def record_bulk_events(objects, action, using=DEFAULT_DB_ALIAS):
+    """
+    Record the events of objects written with ``bulk_create``/``bulk_update``.
+    """
+    events = []
+    for obj in objects:
+        events.extend(instance_events(obj, action, getattr(obj, '_loaded_values', {})))
+    record_events(events, using=using)
+
+
+def record_deleted(sender, instance, using, **kwargs):
+    if isinstance(instance, OutboxModel):
+        record_instance_events(instance, 'deleted', using=using)
+
+
+post_delete.connect(record_deleted, dispatch_uid='outbox_record_deleted')
+
+
+class CelerySink:
+    """
+    Send each batch as one Celery task, ``OUTBOX_CELERY_TASK`` by default.
+    """
+    def __init__(self, task=None, queue=None):
+        self.task = task or getattr(settings, 'OUTBOX_CELERY_TASK', 'outbox.events')
+        self.queue = queue
+    
+    def send(self, messages):
+        from celery import current_app
+        
+        payload = json.loads(json.dumps(messages, cls=DjangoJSONEncoder))
+        current_app.send_task(self.task, args=[payload], queue=self.queue)
+
+
+class FileSink:
+    """
+    Append each event as a JSON line to ``path``.
+    """
+    def __init__(self, path):
+        self.path = path
+    
+    def send(self, messages):
+        with open(self.path, 'a') as f:
+            for message in messages:
+                f.write(json.dumps(message, cls=DjangoJSONEncoder) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def get_sinks():
+    return [
+        import_string(sink['BACKEND'])(**sink.get('OPTIONS', {}))
+        for sink in getattr(settings, 'OUTBOX_SINKS', [{'BACKEND': 'apps.core.outbox.CelerySink'}])
+    ]
+
+
+def relay(batch_size=OUTBOX_BATCH_SIZE, sinks=None):
+    """
+    Deliver one batch of pending events. Returns how many were delivered.
+    
+    The batch stays locked until it is marked dispatched, so concurrent
+    relays never deliver events out of order.
+    """
+    sinks = get_sinks() if sinks is None else sinks
+    with transaction.atomic():
+        pending = OutboxEvent.objects.filter(dispatched_at__isnull=True).order_by('id')
+        if connection.features.has_select_for_update:
+            pending = pending.select_for_update()
+        events = list(pending[:batch_size])
+        if not events:
+            return 0
+        
+        messages = [event.as_message() for event in events]
+        for sink in sinks:
+            sink.send(messages)
+        OutboxEvent.objects.filter(pk__in=[event.pk for event in events]).update(
+            dispatched_at=timezone.now()
+        )
+    return len(events)
+
+
+def relay_all(batch_size=OUTBOX_BATCH_SIZE, max_batches=100, sinks=None):
+    sinks = get_sinks() if sinks is None else sinks
+    delivered = 0
+    for _ in range(max_batches):
+        count = relay(batch_size, sinks)
+        delivered += count
+        if count < batch_size:
+            break
+    return delivered
+
+
+def prune(days=7):
+    """
+    Delete dispatched events older than ``days``.
+    """
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = OutboxEvent.objects.filter(dispatched_at__lt=cutoff).delete()
+    return deleted
+
+
+def change_feed(after=0, limit=100, aggregate_type=None):
+    """
+    Return up to ``limit`` events with an id above ``after``.
+    
+    Ids are allocated before commit, so a transaction still in flight can
+    commit an id below one already visible. Events younger than
+    ``OUTBOX_FEED_SETTLE_SECONDS`` are held back so a cursor does not skip
+    past them.
+    """
+    events = OutboxEvent.objects.filter(
+        pk__gt=after,
+        created_at__lte=timezone.now() - timedelta(seconds=OUTBOX_FEED_SETTLE_SECONDS),
+    )
+    if aggregate_type:
+        events = events.filter(aggregate_type=aggregate_type)
+    return list(events.order_by('id')[:limit])
@@ -0,0 +1,205 @@
+"""
+Publish/subscribe for pushing model changes to streaming clients.
+
+``broker`` fans messages out to the subscriptions of this process. Each
+subscription is a bounded queue read by one streaming response; when a
+slow client lets it fill up the oldest message is dropped and the
+subscription is flagged as lagged, so publishers never block and a
+client that fell behind is told to re-fetch instead.
+
+Messages reach the broker through the backend named by ``PUSH_BACKEND``:
+
+* ``LocalBackend`` delivers in-process only. It is the default and the
+  stand-in used for tests and single-process setups.
+* ``RedisBackend`` publishes through Redis and runs one listener thread
+  per process, so changes made by any web or Celery process reach the
+  clients connected to every worker.
+
+``publish`` sends once the current transaction commits, so subscribers
+never see changes that are rolled back.
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+from functools import partial
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+PUSH_MAX_PENDING = getattr(settings, 'PUSH_MAX_PENDING', 100)
+
+
+class Subscription:
+    """
+    Bounded queue of ``(channel, message)`` pairs for one client.
+    
+    Must be created and read on the event loop serving the client.
+    """
+    def __init__(self, broker, channels, max_pending=None):
+        self.broker = broker
+        self.channels = frozenset(channels)
+        self.lagged = False
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(max_pending or PUSH_MAX_PENDING)
+    
+    def _put(self, channel, message):
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.lagged = True
+        self._queue.put_nowait((channel, message))
+    
+    def deliver(self, channel, message):
+        """
+        Queue a message; safe to call from any thread.
+        """
+        try:
+            self._loop.call_soon_threadsafe(self._put, channel, message)
+        except RuntimeError:
+            # The client's event loop is gone.
+            self.close()
+    
+    async def get(self, timeout=None):
+        """
+        Return the next ``(channel, message)``, or None after ``timeout``.
+        """
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+    
+    def close(self):
+        self.broker.unsubscribe(self)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Broker:
+    """
+    In-process registry of subscriptions by channel.
+    """
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+    
+    def subscribe(self, channels, max_pending=None):
+        get_backend().start()
+        subscription = Subscription(self, channels, max_pending)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscriptions[channel].add(subscription)
+        return subscription
+    
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscriptions.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscriptions[channel]
+    
+    def dispatch(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscriptions.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(channel, message)
+    
+    def subscriber_count(self):
+        with self._lock:
+            return len({sub for subs in self._subscriptions.values() for sub in subs})
+
+
+broker = Broker()
+
+
+class LocalBackend:
+    """
+    Deliver messages to subscribers in this process only.
+    """
+    def __init__(self, **options):
+        pass
+    
+    def start(self):
+        pass
+    
+    def publish(self, channel, message):
+        broker.dispatch(channel, message)
+
+
+class RedisBackend:
+    """
+    Deliver messages to subscribers in every process through Redis pub/sub.
+    """
+    def __init__(self, url, prefix='push:', **options):
+        import redis
+        
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._thread = None
+        self._lock = threading.Lock()
+    
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._listen, name='push-listener', daemon=True)
+                self._thread.start()
+    
+    def _listen(self):
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.psubscribe(f'{self.prefix}*')
+        for item in pubsub.listen():
+            try:
+                channel = item['channel'].decode()[len(self.prefix):]
+                broker.dispatch(channel, json.loads(item['data']))
+            except Exception:
+                logger.exception('Could not dispatch push message')
+    
+    def publish(self, channel, message):
+        self.client.publish(f'{self.prefix}{channel}', json.dumps(message, cls=DjangoJSONEncoder))
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            backend_class = import_string(getattr(settings, 'PUSH_BACKEND', 'apps.core.pubsub.LocalBackend'))
+            _backend = backend_class(**getattr(settings, 'PUSH_BACKEND_OPTIONS', {}))
+        return _backend
+
+
+def set_backend(backend):
+    """
+    Replace the backend, e.g. with a ``LocalBackend`` in tests.
+    """
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+def _send(channel, message):
+    try:
+        get_backend().publish(channel, message)
+    except Exception:
+        # Pushing is best effort; clients can always re-fetch.
+        logger.exception('Could not publish to %s', channel)
+
+
+def publish(channel, message):
+    """
+    Send ``message`` to the subscribers of ``channel`` after commit.
+    """
+    transaction.on_commit(partial(_send, channel, json.loads(json.dumps(message, cls=DjangoJSONEncoder))))
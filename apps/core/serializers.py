@@ -0,0 +1,188 @@
+from django.urls import reverse
+from rest_framework import permissions, serializers
+
+from .images import IMAGE_FORMATS, IMAGE_SIZES
+from .models import OutboxEvent
+
+
+class ValuesSerializer(serializers.Serializer):
+    """
+    Read-only serializer that renders rows produced by ``QuerySet.values()``.
+    
+    Subclasses declare their output fields like any other serializer and
+    describe how the rows are built in ``Meta``:
+    
+    * ``values`` - model fields fetched as-is.
+    * ``get_annotations()`` - expressions computed by the database
+      (joins, ``Concat`` full names, counts) keyed by output name.
+    
+    Because no model instances are created, related objects are never
+    loaded and ``source='fk.method'`` lookups are not available.
+    """
+    class Meta:
+        values = []
+    
+    @classmethod
+    def get_annotations(cls):
+        return {}
+    
+    @classmethod
+    def get_values_queryset(cls, queryset):
+        annotations = cls.get_annotations()
+        if not queryset.query.order_by and queryset.query.default_ordering:
+            # Meta.ordering is ignored once an aggregate adds a GROUP BY.
+            queryset = queryset.order_by(*queryset.model._meta.ordering)
+        if annotations:
+            queryset = queryset.annotate(**annotations)
+        return queryset.values(*cls.Meta.values, *annotations)
+    
+    def create(self, validated_data):
+        raise NotImplementedError('ValuesSerializer is read-only.')
+    
+    def update(self, instance, validated_data):
+        raise NotImplementedError('ValuesSerializer is read-only.')
+
+
+class ChoiceDisplayField(serializers.ReadOnlyField):
+    """
+    Render the display label of a choices field, like ``get_FOO_display``.
+    """
+    def __init__(self, choices, **kwargs):
+        self.choice_labels = {str(key): label for key, label in choices}
+        super().__init__(**kwargs)
+    
+    def to_representation(self, value):
+        return str(self.choice_labels.get(str(value), value))
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """
+    Render an image field as the URLs of its resized variants,
+    ``{size: {format: url}}``, see ``apps.core.images``.
+    """
+    def to_representation(self, value):
+        if not value:
+            return None
+        request = self.context.get('request')
+        urls = {}
+        for size in IMAGE_SIZES:
+            urls[size] = {}
+            for image_format in IMAGE_FORMATS:
+                url = reverse('image-variant', kwargs={'variant': f'{size}.{image_format}', 'source': value.name})
+                urls[size][image_format] = request.build_absolute_uri(url) if request is not None else url
+        return urls
+
+
+class SparseFieldsetMixin:
+    """
+    Let clients trim a model serializer's output with ``?fields=`` and
+    ``?expand=`` on safe requests.
+    
+    ``Meta`` options:
+    
+    * ``expandable_fields`` - nested collections that are left out of a
+      sparse response unless named in ``fields`` or ``expand``.
+    * ``field_columns`` - extra columns a computed field reads, e.g.
+      ``{'category_name': ['category__name']}``. Lookups through a relation
+      are fetched with ``select_related``.
+    * ``prefetch_fields`` - ``prefetch_related`` lookups a field needs.
+    * ``heavy_fields`` - large text columns that, like the expandable
+      fields, are left out of a sparse response unless named.
+    
+    Without either parameter every field is rendered, as before. With
+    ``expand`` alone all other fields plus the named collections and heavy
+    fields are rendered, and the heavy columns left out are deferred. With
+    ``fields`` only the named fields are rendered and the queryset is
+    narrowed with ``only()``.
+    
+    Only views rendering this serializer honour the parameters; list
+    actions render a ``ValuesSerializer`` and ignore them.
+    """
+    @staticmethod
+    def _split(value):
+        if value is None:
+            return None
+        return [name.strip() for name in value.split(',') if name.strip()]
+    
+    @classmethod
+    def get_requested_fields(cls, request):
+        """
+        Return the ``(fields, expand)`` lists from the query string.
+        """
+        if request is None or request.method not in permissions.SAFE_METHODS:
+            return None, None
+        params = request.query_params
+        return cls._split(params.get('fields')), cls._split(params.get('expand'))
+    
+    @classmethod
+    def get_selected_field_names(cls, request):
+        names = list(cls.Meta.fields)
+        fields, expand = cls.get_requested_fields(request)
+        if fields is None and expand is None:
+            return names
+        
+        meta = cls.Meta
+        optional = set(getattr(meta, 'expandable_fields', [])) | set(getattr(meta, 'heavy_fields', []))
+        requested = set(fields or []) | set(expand or [])
+        return [
+            name for name in names
+            if name in requested or (fields is None and name not in optional)
+        ]
+    
+    @classmethod
+    def optimize_queryset(cls, queryset, request):
+        """
+        Fetch only what the selected fields need.
+        """
+        meta = cls.Meta
+        field_columns = getattr(meta, 'field_columns', {})
+        prefetch_fields = getattr(meta, 'prefetch_fields', {})
+        model_fields = {field.name for field in meta.model._meta.concrete_fields}
+        
+        columns, related, prefetch = {meta.model._meta.pk.name}, set(), set()
+        for name in cls.get_selected_field_names(request):
+            if name in model_fields:
+                columns.add(name)
+            for lookup in field_columns.get(name, []):
+                columns.add(lookup)
+                if '__' in lookup:
+                    relation = lookup.split('__', 1)[0]
+                    related.add(relation)
+                    columns.add(relation)
+            prefetch.update(prefetch_fields.get(name, []))
+        
+        if related:
+            queryset = queryset.select_related(*sorted(related))
+        if prefetch:
+            queryset = queryset.prefetch_related(*sorted(prefetch))
+        if cls.get_requested_fields(request)[0] is not None:
+            queryset = queryset.only(*columns)
+        else:
+            deferred = [name for name in getattr(meta, 'heavy_fields', []) if name not in columns]
+            if deferred:
+                queryset = queryset.defer(*deferred)
+        return queryset
+    
+    def get_fields(self):
+        fields = super().get_fields()
+        selected = set(self.get_selected_field_names(self.context.get('request')))
+        return {name: field for name, field in fields.items() if name in selected}
+
+
+class OutboxEventSerializer(serializers.ModelSerializer):
+    """
+    Serializer for OutboxEvent model.
+    """
+    class Meta:
+        model = OutboxEvent
+        fields = ['id', 'aggregate_type', 'aggregate_id', 'event_type', 'payload', 'created_at']
+        read_only_fields = fields
+
+
+class ChangeFeedQuerySerializer(serializers.Serializer):
+    """
+    Serializer for change feed query parameters.
+    """
+    after = serializers.IntegerField(min_value=0, default=0)
+    limit = serializers.IntegerField(min_value=1, max_value=1000, default=100)
+    aggregate_type = serializers.CharField(required=False)
@@ -0,0 +1,85 @@
+"""
+A local SMTP server that accepts and counts messages without delivering
+them, for developing and benchmarking email without a mail server.
+"""
+import logging
+import socketserver
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class SMTPStubHandler(socketserver.StreamRequestHandler):
+    def reply(self, *lines):
+        # One write per reply; split replies stall on delayed ACKs.
+        self.wfile.write(''.join(line + '\r\n' for line in lines).encode())
+    
+    def handle(self):
+        self.server.count('connections')
+        self.reply('220 localhost SMTP stub')
+        recipients = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line[:4].upper()
+            if command == b'EHLO':
+                self.reply('250-localhost', '250 8BITMIME')
+            elif command == b'RCPT':
+                recipients.append(line[8:].strip().decode())
+                self.reply('250 OK')
+            elif command == b'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                size = 0
+                for line in iter(self.rfile.readline, b''):
+                    if line.rstrip(b'\r\n') == b'.':
+                        break
+                    size += len(line)
+                self.server.received(recipients, size)
+                recipients = []
+                self.reply('250 OK')
+            elif command == b'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                # HELO, MAIL, RSET and NOOP
+                if command in (b'MAIL', b'RSET'):
+                    recipients = []
+                self.reply('250 OK')
+
+
+class SMTPStub(socketserver.ThreadingTCPServer):
+    """
+    ``with SMTPStub() as stub:`` serves on ``stub.port`` (a free port by
+    default) in a background thread; ``stub.stats`` counts connections,
+    messages, recipients and bytes.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+    
+    def __init__(self, host='127.0.0.1', port=0):
+        super().__init__((host, port), SMTPStubHandler)
+        self.lock = threading.Lock()
+        self.stats = {'connections': 0, 'messages': 0, 'recipients': 0, 'bytes': 0}
+    
+    @property
+    def port(self):
+        return self.server_address[1]
+    
+    def count(self, name, amount=1):
+        with self.lock:
+            self.stats[name] += amount
+    
+    def received(self, recipients, size):
+        self.count('messages')
+        self.count('recipients', len(recipients))
+        self.count('bytes', size)
+        logger.debug('Message to %s (%d bytes)', ', '.join(recipients), size)
+    
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
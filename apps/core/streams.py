@@ -0,0 +1,138 @@
+"""
+Server-Sent Events and WebSocket delivery of ``apps.core.pubsub`` messages.
+
+Both transports only run under ASGI. An idle client costs one suspended
+coroutine and one small queue, so a worker can hold thousands of them.
+
+Every stream sends a heartbeat after ``PUSH_HEARTBEAT_SECONDS`` without
+messages, which keeps proxies from timing it out, and SSE streams end
+after ``PUSH_MAX_STREAM_SECONDS``. Browsers reconnect automatically, and
+the limit bounds how long a subscription outlives a client whose
+disconnect the server never reported.
+
+A message carries its event name in ``type``. When a subscription has
+dropped messages for a slow client, a ``resync`` event is sent first so
+the client re-fetches what it is watching.
+"""
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+PUSH_HEARTBEAT_SECONDS = getattr(settings, 'PUSH_HEARTBEAT_SECONDS', 15)
+PUSH_MAX_STREAM_SECONDS = getattr(settings, 'PUSH_MAX_STREAM_SECONDS', 300)
+SSE_RETRY_MS = 3000
+
+
+def format_event(event, data):
+    return f'event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n'
+
+
+async def events(subscription, heartbeat=None, max_seconds=None):
+    """
+    Yield ``(event, data)`` from a subscription, ``(None, None)`` as a
+    heartbeat, until ``max_seconds`` have passed.
+    """
+    heartbeat = heartbeat or PUSH_HEARTBEAT_SECONDS
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_seconds if max_seconds else None
+    
+    with subscription:
+        while True:
+            timeout = heartbeat
+            if deadline is not None:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return
+                timeout = min(timeout, remaining)
+            
+            item = await subscription.get(timeout)
+            if subscription.lagged:
+                subscription.lagged = False
+                yield 'resync', {}
+            if item is None:
+                yield None, None
+                continue
+            
+            channel, message = item
+            yield message.get('type', 'message'), dict(message, channel=channel)
+
+
+async def sse_lines(subscription):
+    yield f'retry: {SSE_RETRY_MS}\n\n'
+    async for event, data in events(subscription, max_seconds=PUSH_MAX_STREAM_SECONDS):
+        yield ': keepalive\n\n' if event is None else format_event(event, data)
+
+
+def sse_response(subscription):
+    """
+    Stream a subscription as ``text/event-stream``.
+    """
+    response = StreamingHttpResponse(sse_lines(subscription), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def query_params(scope):
+    """
+    ``QueryDict``-like single values from an ASGI scope's query string.
+    """
+    params = parse_qs(scope.get('query_string', b'').decode())
+    return {key: values[-1] for key, values in params.items()}
+
+
+def header(scope, name):
+    name = name.lower().encode()
+    for key, value in scope.get('headers', []):
+        if key == name:
+            return value.decode()
+    return None
+
+
+async def websocket_stream(receive, send, subscription):
+    """
+    Send a subscription's messages as JSON text frames until the client
+    disconnects. The connection must already be accepted.
+    """
+    async def forward():
+        async for event, data in events(subscription):
+            if event is None:
+                data = {'type': 'heartbeat'}
+            elif event == 'resync':
+                data = {'type': 'resync'}
+            await send({'type': 'websocket.send', 'text': json.dumps(data, cls=DjangoJSONEncoder)})
+    
+    async def wait_for_disconnect():
+        while (await receive())['type'] != 'websocket.disconnect':
+            pass
+    
+    sender = asyncio.ensure_future(forward())
+    try:
+        await wait_for_disconnect()
+    finally:
+        sender.cancel()
+        await asyncio.gather(sender, return_exceptions=True)
+        subscription.close()
+
+
+def websocket_router(routes, application):
+    """
+    Wrap an ASGI application, serving WebSocket connections from
+    ``routes`` (``{path: handler(scope, receive, send)}``).
+    """
+    async def router(scope, receive, send):
+        if scope['type'] != 'websocket':
+            return await application(scope, receive, send)
+        
+        handler = routes.get(scope['path'])
+        if handler is None:
+            await receive()
+            await send({'type': 'websocket.close', 'code': 4404})
+            return
+        return await handler(scope, receive, send)
+    
+    return router
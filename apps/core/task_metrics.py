@@ -0,0 +1,260 @@
+"""
+Celery task telemetry and retry backoff.
+
+Receivers of Celery's task signals record, per task name:
+
+* ``queue_wait`` - seconds from publishing (or the ETA of a delayed
+  retry) to the start of the run, from the ``sent_at`` header that
+  ``before_task_publish`` adds;
+* ``runtime`` - seconds the run took, whatever its outcome;
+* ``states`` - runs that succeeded, were retried or failed;
+* ``retry_reasons`` and ``failure_reasons`` - exception class counts.
+
+Timings are histograms over ``TASK_METRICS_BUCKETS``. Each worker process
+keeps its figures in memory and writes them to its own JSON file in
+``TASK_METRICS_DIR`` at most every ``TASK_METRICS_FLUSH_SECONDS`` and when
+it exits; ``collect`` adds up all the files.
+
+``InstrumentedTask`` is the base class of the tasks in ``celery_tasks``.
+Its ``retry`` treats ``countdown`` as the base of an exponential backoff
+with jitter, so failing tasks do not retry in lockstep, and re-raises
+the original exception once retries run out.
+"""
+import json
+import os
+import random
+import socket
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from celery import Task
+from celery.signals import (
+    before_task_publish, task_failure, task_postrun, task_prerun, task_retry, worker_process_shutdown,
+)
+from django.conf import settings
+
+TASK_METRICS_DIR = getattr(settings, 'TASK_METRICS_DIR', os.path.join(settings.BASE_DIR, 'var', 'task_metrics'))
+TASK_METRICS_FLUSH_SECONDS = getattr(settings, 'TASK_METRICS_FLUSH_SECONDS', 10)
+TASK_METRICS_BUCKETS = getattr(
+    settings, 'TASK_METRICS_BUCKETS', [0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 1800]
+)
+TASK_RETRY_BACKOFF_MAX = getattr(settings, 'TASK_RETRY_BACKOFF_MAX', 3600)
+
+TIMINGS = ['queue_wait', 'runtime']
+STATES = {'SUCCESS': 'succeeded', 'RETRY': 'retried', 'FAILURE': 'failed'}
+
+
+def backoff(base, retries, cap=TASK_RETRY_BACKOFF_MAX):
+    """
+    Seconds to wait before retry number ``retries + 1``: ``base`` doubled
+    per earlier retry, capped at ``cap`` (or ``base`` if larger), of which
+    a random upper half is used.
+    """
+    delay = min(base * 2 ** retries, max(base, cap))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class InstrumentedTask(Task):
+    def retry(self, args=None, kwargs=None, exc=None, throw=True, eta=None, countdown=None,
+              max_retries=None, **options):
+        if exc is None:
+            # Lets the final failure report the exception instead of
+            # MaxRetriesExceededError.
+            exc = sys.exc_info()[1]
+        if countdown is not None and eta is None:
+            countdown = backoff(countdown, self.request.retries)
+        return super().retry(args, kwargs, exc, throw, eta, countdown, max_retries, **options)
+
+
+def empty_histogram():
+    return {'buckets': [0] * (len(TASK_METRICS_BUCKETS) + 1), 'sum': 0.0, 'count': 0}
+
+
+def empty_metrics():
+    return {
+        **{timing: empty_histogram() for timing in TIMINGS},
+        'states': {state: 0 for state in STATES.values()},
+        'retry_reasons': {},
+        'failure_reasons': {},
+    }
+
+
+class TaskMetrics:
+    """
+    The figures of one process, by task name.
+    """
+    def __init__(self, path=None):
+        self.path = path or os.path.join(TASK_METRICS_DIR, f'{socket.gethostname()}-{os.getpid()}.json')
+        self.tasks = {}
+        self.saved_at = time.monotonic()
+    
+    def task(self, name):
+        if name not in self.tasks:
+            self.tasks[name] = empty_metrics()
+        return self.tasks[name]
+    
+    def observe(self, name, timing, seconds):
+        histogram = self.task(name)[timing]
+        index = next(
+            (i for i, bound in enumerate(TASK_METRICS_BUCKETS) if seconds <= bound), len(TASK_METRICS_BUCKETS)
+        )
+        histogram['buckets'][index] += 1
+        histogram['sum'] += seconds
+        histogram['count'] += 1
+    
+    def count(self, name, group, key):
+        counts = self.task(name)[group]
+        counts[key] = counts.get(key, 0) + 1
+    
+    def save(self):
+        self.saved_at = time.monotonic()
+        if not self.tasks:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + '.tmp', 'w') as f:
+            json.dump({'buckets': TASK_METRICS_BUCKETS, 'tasks': self.tasks}, f)
+        os.replace(self.path + '.tmp', self.path)
+    
+    def save_if_due(self):
+        if time.monotonic() - self.saved_at >= TASK_METRICS_FLUSH_SECONDS:
+            self.save()
+
+
+_metrics = None
+_started = {}
+
+
+def metrics():
+    global _metrics
+    # Per process: prefork children must not inherit the parent's path.
+    if _metrics is None or not _metrics.path.endswith(f'-{os.getpid()}.json'):
+        _metrics = TaskMetrics()
+    return _metrics
+
+
+def _timestamp(value):
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.timestamp() if isinstance(value, datetime) else value
+
+
+def stamp_sent_at(headers=None, **kwargs):
+    if headers is not None:
+        headers['sent_at'] = time.time()
+
+
+def start_run(task_id=None, task=None, **kwargs):
+    now = time.time()
+    _started[task_id] = time.perf_counter()
+    sent_at = task.request.get('sent_at')
+    if sent_at is not None:
+        ready_at = max(sent_at, _timestamp(task.request.eta) or 0)
+        metrics().observe(task.name, 'queue_wait', max(now - ready_at, 0))
+
+
+def end_run(task_id=None, task=None, state=None, **kwargs):
+    started = _started.pop(task_id, None)
+    if started is not None:
+        metrics().observe(task.name, 'runtime', time.perf_counter() - started)
+    if state in STATES:
+        metrics().count(task.name, 'states', STATES[state])
+    metrics().save_if_due()
+
+
+def record_retry(sender=None, reason=None, **kwargs):
+    reason = getattr(reason, 'exc', None) or reason
+    metrics().count(sender.name, 'retry_reasons', type(reason).__name__)
+
+
+def record_failure(sender=None, exception=None, **kwargs):
+    metrics().count(sender.name, 'failure_reasons', type(exception).__name__)
+
+
+def save_on_exit(**kwargs):
+    if _metrics is not None:
+        _metrics.save()
+
+
+RECEIVERS = [
+    (before_task_publish, stamp_sent_at, 'task_metrics_sent_at'),
+    (task_prerun, start_run, 'task_metrics_start'),
+    (task_postrun, end_run, 'task_metrics_end'),
+    (task_retry, record_retry, 'task_metrics_retry'),
+    (task_failure, record_failure, 'task_metrics_failure'),
+    (worker_process_shutdown, save_on_exit, 'task_metrics_exit'),
+]
+
+
+def connect():
+    for signal, receiver, uid in RECEIVERS:
+        signal.connect(receiver, dispatch_uid=uid)
+
+
+@contextmanager
+def paused():
+    """
+    Record nothing inside the block, for benchmarks whose stand-in tasks
+    share the names of the real ones.
+    """
+    for signal, receiver, uid in RECEIVERS:
+        signal.disconnect(receiver, dispatch_uid=uid)
+    try:
+        yield
+    finally:
+        connect()
+
+
+connect()
+
+
+def quantile(histogram, q):
+    """
+    Upper bound of the bucket holding quantile ``q``; None beyond the
+    last bucket or without observations.
+    """
+    rank = q * histogram['count']
+    seen = 0
+    for bound, count in zip([*TASK_METRICS_BUCKETS, None], histogram['buckets']):
+        seen += count
+        if count and seen >= rank:
+            return bound
+    return None
+
+
+def collect(directory=None):
+    """
+    The figures of all worker processes added up, by task name, with
+    p50/p95/p99 estimates for each timing.
+    """
+    directory = directory or TASK_METRICS_DIR
+    tasks = {}
+    names = sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+    for file_name in names:
+        if not file_name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, file_name)) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if saved['buckets'] != TASK_METRICS_BUCKETS:
+            continue
+        for name, figures in saved['tasks'].items():
+            total = tasks.setdefault(name, empty_metrics())
+            for timing in TIMINGS:
+                total[timing]['buckets'] = [a + b for a, b in zip(total[timing]['buckets'], figures[timing]['buckets'])]
+                total[timing]['sum'] += figures[timing]['sum']
+                total[timing]['count'] += figures[timing]['count']
+            for group in ['states', 'retry_reasons', 'failure_reasons']:
+                for key, count in figures[group].items():
+                    total[group][key] = total[group].get(key, 0) + count
+    
+    for total in tasks.values():
+        for timing in TIMINGS:
+            histogram = total[timing]
+            histogram['mean'] = histogram['sum'] / histogram['count'] if histogram['count'] else None
+            for q in (50, 95, 99):
+                histogram[f'p{q}'] = quantile(histogram, q / 100)
+    return {'buckets': TASK_METRICS_BUCKETS, 'tasks': tasks}
@@ -0,0 +1,126 @@
+"""
+Celery queues, task routes and worker profiles.
+
+Every task belongs to one of ``TASK_QUEUE_PROFILES``' queues, so a slow
+bulk or maintenance run never holds up customer-facing work:
+
+* ``critical`` - order processing, stock updates and order emails;
+* ``default`` - short background work and anything not routed;
+* ``bulk`` - long, heavy jobs such as inventory syncs and exports;
+* ``maintenance`` - periodic housekeeping, backups and reports.
+
+``route_task`` (``task_routes``) also gives each task a priority from
+``TASK_PRIORITIES`` unless the caller passes one, so order confirmations
+go ahead of other critical work. Priorities here are higher-first, as
+in AMQP, where queues are declared with ``x-max-priority``; the Redis
+transport emulates priorities with ``priority_steps`` and takes 0 first,
+so they are flipped for it.
+
+Each profile sets the concurrency, prefetch multiplier and time limits of
+the workers consuming its queue; ``manage.py run_worker <queue>`` starts
+one.
+"""
+from django.conf import settings
+from kombu import Exchange, Queue
+
+TASK_QUEUE_PROFILES = getattr(settings, 'TASK_QUEUE_PROFILES', {
+    'critical': {'concurrency': 4, 'prefetch_multiplier': 1, 'soft_time_limit': 30, 'time_limit': 60},
+    'default': {'concurrency': 4, 'prefetch_multiplier': 4, 'soft_time_limit': 300, 'time_limit': 360},
+    'bulk': {'concurrency': 2, 'prefetch_multiplier': 1, 'soft_time_limit': 3600, 'time_limit': 3900},
+    'maintenance': {'concurrency': 1, 'prefetch_multiplier': 1, 'soft_time_limit': 7200, 'time_limit': 7500},
+})
+TASK_DEFAULT_QUEUE = getattr(settings, 'TASK_DEFAULT_QUEUE', 'default')
+TASK_QUEUES = getattr(settings, 'TASK_QUEUES', {
+    'celery_tasks.send_order_confirmation_email': 'critical',
+    'celery_tasks.update_product_stock': 'critical',
+    'celery_tasks.process_order_items': 'critical',
+    'celery_tasks.flush_email_queue': 'critical',
+    'celery_tasks.release_expired_order_claims': 'critical',
+    'celery_tasks.sync_external_inventory': 'bulk',
+    'celery_tasks.bulk_update_order_status': 'bulk',
+    'celery_tasks.export_order_lines': 'bulk',
+    'celery_tasks.update_recommendations': 'bulk',
+    'celery_tasks.process_images': 'bulk',
+    'celery_tasks.generate_daily_report': 'maintenance',
+    'celery_tasks.backup_database': 'maintenance',
+    'celery_tasks.cleanup_old_orders': 'maintenance',
+    'celery_tasks.detect_counter_drift': 'maintenance',
+    'celery_tasks.prune_outbox_events': 'maintenance',
+    'celery_tasks.rebalance_stock_shards': 'maintenance',
+    'celery_tasks.take_stock_snapshots': 'maintenance',
+    'celery_tasks.reconcile_stock_ledger': 'maintenance',
+    'celery_tasks.build_autocomplete_index': 'maintenance',
+})
+# 0 (lowest) to TASK_MAX_PRIORITY; tasks not listed get TASK_DEFAULT_PRIORITY.
+TASK_MAX_PRIORITY = getattr(settings, 'TASK_MAX_PRIORITY', 9)
+TASK_DEFAULT_PRIORITY = getattr(settings, 'TASK_DEFAULT_PRIORITY', 5)
+TASK_PRIORITIES = getattr(settings, 'TASK_PRIORITIES', {
+    'celery_tasks.send_order_confirmation_email': 9,
+    'celery_tasks.flush_email_queue': 8,
+    'celery_tasks.update_product_stock': 7,
+    'celery_tasks.process_order_items': 7,
+})
+
+
+def queue_of(name):
+    return TASK_QUEUES.get(name, TASK_DEFAULT_QUEUE)
+
+
+def reversed_priorities(broker_url):
+    return (broker_url or '').startswith(('redis://', 'rediss://', 'redis+socket://'))
+
+
+def transport_priority(priority, broker_url):
+    return TASK_MAX_PRIORITY - priority if reversed_priorities(broker_url) else priority
+
+
+def route_task(name, args, kwargs, options, task=None, **kw):
+    from celery import current_app
+    
+    route = {'queue': queue_of(name)}
+    if options.get('priority') is None:
+        route['priority'] = transport_priority(
+            TASK_PRIORITIES.get(name, TASK_DEFAULT_PRIORITY), current_app.conf.broker_url
+        )
+    return route
+
+
+def celery_config(broker_url):
+    """
+    Celery settings for the queues and routes above.
+    """
+    return {
+        'task_queues': [
+            Queue(name, Exchange(name), routing_key=name, queue_arguments={'x-max-priority': TASK_MAX_PRIORITY})
+            for name in TASK_QUEUE_PROFILES
+        ],
+        'task_default_queue': TASK_DEFAULT_QUEUE,
+        'task_default_priority': transport_priority(TASK_DEFAULT_PRIORITY, broker_url),
+        'task_queue_max_priority': TASK_MAX_PRIORITY,
+        'task_routes': (route_task,),
+        'broker_transport_options': {
+            'priority_steps': list(range(TASK_MAX_PRIORITY + 1)),
+            'sep': ':',
+            'queue_order_strategy': 'priority',
+            **getattr(settings, 'CELERY_BROKER_TRANSPORT_OPTIONS', {}),
+        },
+    }
+
+
+def worker_arguments(queue):
+    """
+    ``celery worker`` arguments for a worker consuming ``queue``.
+    """
+    profile = TASK_QUEUE_PROFILES[queue]
+    return [
+        'worker',
+        f'--queues={queue}',
+        f'--hostname={queue}@%h',
+        f"--concurrency={profile['concurrency']}",
+        f"--prefetch-multiplier={profile['prefetch_multiplier']}",
+        f"--soft-time-limit={profile['soft_time_limit']}",
+        f"--time-limit={profile['time_limit']}",
+        # Hand tasks to idle processes only, so one long task does not
+        # hold back those prefetched behind it.
+        '-O', 'fair',
+    ]
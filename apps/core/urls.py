@@ -0,0 +1,12 @@
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from .views import ChangeFeedViewSet, ImageVariantView, TaskMetricsView
+
+router = DefaultRouter()
+router.register(r'changes', ChangeFeedViewSet, basename='changes')
+
+urlpatterns = [
+    path('', include(router.urls)),
+    path('images/<str:variant>/<path:source>', ImageVariantView.as_view(), name='image-variant'),
+    path('task-metrics/', TaskMetricsView.as_view(), name='task-metrics'),
+]
@@ -0,0 +1,63 @@
+from django.http import HttpResponseRedirect
+from rest_framework import viewsets, permissions
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .images import stored_variant_url
+from .outbox import change_feed
+from .serializers import ChangeFeedQuerySerializer, OutboxEventSerializer
+from .task_metrics import collect
+
+
+class ChangeFeedViewSet(viewsets.ViewSet):
+    """
+    Cursor-based feed of outbox events for downstream consumers.
+    
+    Pass the returned ``cursor`` as ``after`` to get the next page; an empty
+    page means the consumer is caught up.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    
+    def list(self, request):
+        query = ChangeFeedQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        
+        events = change_feed(params['after'], params['limit'] + 1, params.get('aggregate_type'))
+        has_more = len(events) > params['limit']
+        events = events[:params['limit']]
+        return Response({
+            'results': OutboxEventSerializer(events, many=True).data,
+            'cursor': events[-1].pk if events else params['after'],
+            'has_more': has_more,
+        })
+
+
+class ImageVariantView(APIView):
+    """
+    Redirect to a resized variant of an uploaded image.
+    
+    Images without variants yet are processed on their first request.
+    """
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+    
+    def get(self, request, variant, source):
+        url = stored_variant_url(source, variant)
+        if url is None:
+            raise NotFound()
+        response = HttpResponseRedirect(url)
+        response['Cache-Control'] = 'public, max-age=86400'
+        return response
+
+
+class TaskMetricsView(APIView):
+    """
+    Queue wait and runtime histograms, outcomes and error counts of the
+    Celery tasks, added up over all worker processes.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    
+    def get(self, request):
+        return Response(collect())
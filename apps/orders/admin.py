@@ -29,11 +29,11 @@ class OrderAdmin(admin.ModelAdmin):
     """
     Admin for Order model.
     """
-    list_display = ['order_number', 'customer', 'status', 'total_amount', 'created_at']
+    list_display = ['order_number', 'customer', 'status', 'total_amount', 'items_count', 'created_at']
     list_filter = ['status', 'created_at']
     search_fields = ['order_number', 'customer__username', 'customer__email']
     ordering = ['-created_at']
-    readonly_fields = ['order_number', 'created_at', 'updated_at']
+    readonly_fields = ['order_number', 'items_count', 'created_at', 'updated_at']
     
     inlines = [OrderItemInline, OrderStatusInline]
     
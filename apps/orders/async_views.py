@@ -0,0 +1,12 @@
+"""
+Async versions of the hot order read endpoints.
+"""
+from apps.core.async_views import async_api_view, retrieve
+from .models import Order
+from .serializers import OrderSerializer
+
+
+@async_api_view
+async def order_detail(request, pk):
+    queryset = OrderSerializer.optimize_queryset(Order.objects.all(), request)
+    return await retrieve(request, queryset, OrderSerializer, pk)
@@ -0,0 +1,373 @@
+"""
+Columnar, memory-mapped snapshot of order lines for analytics.
+
+``OrderLineSnapshot.update`` (nightly ``export_order_lines`` task or
+command) exports order lines, one row per ``OrderItem`` with its order's
+date and status and its product's category and vendor, into one raw
+NumPy column file per field under ``ORDER_LINES_SNAPSHOT_DIR``.
+Category, vendor and status are dictionary-encoded: the column holds
+integer codes and ``manifest.json`` the labels.
+
+Rows are sorted by order date, so each run only appends complete days
+after the last one exported. The last ``refresh_days`` days are cut off
+and exported again, picking up recent cancellations. ``manifest.json``
+is only replaced once the column files are written; a crashed run
+leaves the previous snapshot (minus the refresh window) readable.
+
+``aggregate`` answers group-by questions over memory-mapped columns,
+``SCAN_CHUNK_ROWS`` rows at a time, with vectorised filters and
+``bincount`` sums, spread over worker processes. Scans never touch the
+database and only page in the columns they use. Runs of ``update`` must
+not overlap reads, since truncating a mapped file under a reader fails
+it.
+"""
+import json
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .models import OrderItem
+
+ORDER_LINES_SNAPSHOT_DIR = getattr(
+    settings, 'ORDER_LINES_SNAPSHOT_DIR', os.path.join(settings.BASE_DIR, 'var', 'order_lines')
+)
+EXPORT_CHUNK_SIZE = 100000
+ORDER_LINES_SCAN_WORKERS = getattr(settings, 'ORDER_LINES_SCAN_WORKERS', os.cpu_count() or 1)
+SCAN_CHUNK_ROWS = 1 << 24
+MAX_DENSE_GROUPS = 1 << 24
+
+COLUMNS = {
+    'item_id': 'int64',
+    'order_id': 'int64',
+    'product_id': 'int64',
+    'created_at': 'int64',  # Unix seconds of the order.
+    'day': 'int32',  # Local date of the order, as days since 1970-01-01.
+    'quantity': 'int32',
+    'revenue': 'int64',  # total_price in cents.
+    'category': 'int32',
+    'vendor': 'int32',
+    'status': 'int16',
+}
+CATEGORICALS = ['category', 'vendor', 'status']
+BUCKETS = ['day', 'week', 'month']
+
+EPOCH = date(1970, 1, 1)
+
+
+def day_number(day):
+    return (day - EPOCH).days
+
+
+def bucket_numbers(days, bucket):
+    """
+    Map day numbers to day, Monday-based week, or calendar month numbers.
+    """
+    if bucket == 'day':
+        return days.astype(np.int64)
+    if bucket == 'week':
+        # Day 0 is a Thursday; week 0 starts on Monday 1969-12-29.
+        return (days.astype(np.int64) + 3) // 7
+    if bucket == 'month':
+        return days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    raise ValueError(f'Unknown bucket: {bucket}')
+
+
+def bucket_start(number, bucket):
+    if bucket == 'day':
+        return EPOCH + timedelta(days=int(number))
+    if bucket == 'week':
+        return EPOCH + timedelta(days=int(number) * 7 - 3)
+    return date(1970 + int(number) // 12, int(number) % 12 + 1, 1)
+
+
+class OrderLineSnapshot:
+    """
+    The order line column files in ``path``.
+    """
+    def __init__(self, path=None):
+        self.path = path or ORDER_LINES_SNAPSHOT_DIR
+        self.manifest = self.read_manifest()
+    
+    @property
+    def rows(self):
+        return self.manifest['rows']
+    
+    def file(self, name):
+        return os.path.join(self.path, f'{name}.bin')
+    
+    def read_manifest(self):
+        try:
+            with open(os.path.join(self.path, 'manifest.json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'rows': 0, 'last_day': None, 'dictionaries': {name: [] for name in CATEGORICALS}}
+    
+    def write_manifest(self):
+        os.makedirs(self.path, exist_ok=True)
+        target = os.path.join(self.path, 'manifest.json')
+        with open(target + '.tmp', 'w') as f:
+            json.dump(self.manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(target + '.tmp', target)
+    
+    def column(self, name):
+        if not self.rows:
+            return np.empty(0, dtype=COLUMNS[name])
+        return np.memmap(self.file(name), dtype=COLUMNS[name], mode='r', shape=(self.rows,))
+    
+    def truncate(self, rows):
+        """
+        Drop everything from row ``rows`` on, including a crashed run's tail.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        for name, dtype in COLUMNS.items():
+            with open(self.file(name), 'ab') as f:
+                f.truncate(rows * np.dtype(dtype).itemsize)
+    
+    def append(self, columns):
+        """
+        Append ``{name: array}`` for every column. The caller writes the
+        manifest.
+        """
+        for name, dtype in COLUMNS.items():
+            with open(self.file(name), 'ab') as f:
+                f.write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+        self.manifest['rows'] += len(columns['item_id'])
+    
+    def encode(self, name, labels):
+        """
+        Dictionary-encode ``labels``, adding new ones to the dictionary.
+        """
+        dictionary = self.manifest['dictionaries'][name]
+        codes = {label: code for code, label in enumerate(dictionary)}
+        encoded = np.empty(len(labels), dtype=COLUMNS[name])
+        for i, label in enumerate(labels):
+            if label not in codes:
+                codes[label] = len(dictionary)
+                dictionary.append(label)
+            encoded[i] = codes[label]
+        return encoded
+    
+    def update(self, through=None, refresh_days=7, rebuild=False):
+        """
+        Export order lines of days up to ``through`` (yesterday by default)
+        not yet in the snapshot, re-exporting the last ``refresh_days``.
+        Returns the number of rows written.
+        """
+        through = through or timezone.localdate() - timedelta(days=1)
+        if rebuild or self.manifest['last_day'] is None:
+            start, keep = None, 0
+            self.manifest = {'rows': 0, 'last_day': None, 'dictionaries': {name: [] for name in CATEGORICALS}}
+        else:
+            last_day = date.fromisoformat(self.manifest['last_day'])
+            start = last_day - timedelta(days=refresh_days - 1) if refresh_days > 0 else last_day + timedelta(days=1)
+            keep = int(np.searchsorted(self.column('day'), day_number(start), side='left'))
+            self.manifest['rows'] = keep
+            self.manifest['last_day'] = (start - timedelta(days=1)).isoformat()
+        
+        self.write_manifest()
+        self.truncate(keep)
+        
+        lines = OrderItem.objects.filter(order__created_at__date__lte=through)
+        if start is not None:
+            lines = lines.filter(order__created_at__date__gte=start)
+        lines = lines.order_by('order__created_at', 'id').values_list(
+            'id', 'order_id', 'product_id', 'order__created_at', 'quantity', 'total_price',
+            'product__category__name', 'product__vendor__username', 'order__status',
+        ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        
+        chunk = []
+        for line in lines:
+            chunk.append(line)
+            if len(chunk) == EXPORT_CHUNK_SIZE:
+                self.append(self.to_columns(chunk))
+                chunk = []
+        if chunk:
+            self.append(self.to_columns(chunk))
+        
+        self.manifest['last_day'] = through.isoformat()
+        self.write_manifest()
+        return self.rows - keep
+    
+    def to_columns(self, lines):
+        ids, order_ids, product_ids, created, quantities, prices, categories, vendors, statuses = zip(*lines)
+        return {
+            'item_id': np.array(ids),
+            'order_id': np.array(order_ids),
+            'product_id': np.array(product_ids),
+            'created_at': np.array([int(moment.timestamp()) for moment in created]),
+            'day': np.array([day_number(timezone.localdate(moment)) for moment in created]),
+            'quantity': np.array(quantities),
+            'revenue': np.array([int(price * 100) for price in prices]),
+            'category': self.encode('category', categories),
+            'vendor': self.encode('vendor', vendors),
+            'status': self.encode('status', statuses),
+        }
+    
+    def aggregate(self, group_by=(), bucket=None, start=None, end=None, where=None, workers=None):
+        """
+        Sum the lines, units and revenue of order lines from day ``start``
+        to ``end``, matching ``where`` (``{column: value or list}``),
+        grouped by the categorical columns in ``group_by`` and by
+        ``bucket`` (``'day'``, ``'week'`` or ``'month'``).
+        
+        Scans longer than one chunk are split over ``workers`` processes
+        (``ORDER_LINES_SCAN_WORKERS``), each mapping the files itself.
+        """
+        for name in group_by:
+            if name not in CATEGORICALS:
+                raise ValueError(f'Cannot group by {name}; choose from {", ".join(CATEGORICALS)}.')
+        if bucket is not None and bucket not in BUCKETS:
+            raise ValueError(f'Unknown bucket: {bucket}')
+        
+        days = self.column('day')
+        lo = int(np.searchsorted(days, day_number(start), side='left')) if start else 0
+        hi = int(np.searchsorted(days, day_number(end), side='right')) if end else self.rows
+        if lo >= hi:
+            return []
+        
+        filters = self.filters(where or {})
+        if filters is None:
+            return []
+        
+        # Each group is one integer key in a mixed-radix system of the
+        # grouping columns' cardinalities.
+        radices = [len(self.manifest['dictionaries'][name]) for name in group_by]
+        first_day, first_bucket, bucket_offsets = int(days[lo]), 0, None
+        if bucket:
+            # Days are sorted, so one lookup table maps every day in range
+            # to its bucket offset.
+            buckets = bucket_numbers(np.arange(first_day, int(days[hi - 1]) + 1), bucket)
+            first_bucket = int(buckets[0])
+            bucket_offsets = (buckets - first_bucket).astype(np.int64)
+            radices.append(int(bucket_offsets[-1]) + 1)
+        
+        plan = {
+            'path': self.path,
+            'rows': self.rows,
+            'group_by': list(group_by),
+            'radices': radices,
+            'first_day': first_day,
+            'bucket_offsets': bucket_offsets,
+            'filters': filters,
+        }
+        ranges = [(offset, min(offset + SCAN_CHUNK_ROWS, hi)) for offset in range(lo, hi, SCAN_CHUNK_ROWS)]
+        workers = min(workers or ORDER_LINES_SCAN_WORKERS, len(ranges))
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                parts = list(pool.map(_scan, [(plan, part) for part in _split(ranges, workers)]))
+        else:
+            parts = [_scan((plan, ranges))]
+        
+        totals = defaultdict(lambda: [0, 0, 0])
+        for part in parts:
+            for key, sums in part.items():
+                total = totals[key]
+                for n in range(3):
+                    total[n] += sums[n]
+        return [self.decode(key, total, group_by, bucket, radices, first_bucket) for key, total in sorted(totals.items())]
+    
+    def filters(self, where):
+        """
+        ``(column, allowed values)`` pairs, or None if nothing can match.
+        Categoricals get a boolean lookup table indexed by code.
+        """
+        filters = []
+        for name, values in where.items():
+            if name not in COLUMNS:
+                raise ValueError(f'Unknown column: {name}')
+            values = values if isinstance(values, (list, tuple, set)) else [values]
+            if name in CATEGORICALS:
+                dictionary = self.manifest['dictionaries'][name]
+                allowed = np.isin(np.array(dictionary, dtype=object), list(values))
+                if not allowed.any():
+                    return None
+                filters.append((name, allowed))
+            else:
+                filters.append((name, np.array(values, dtype=COLUMNS[name])))
+        return filters
+    
+    def decode(self, key, total, group_by, bucket, radices, first_bucket):
+        row = {}
+        if bucket:
+            key, number = divmod(key, radices[-1])
+            row['bucket'] = bucket_start(number + first_bucket, bucket)
+        labels = {}
+        for name, radix in reversed(list(zip(group_by, radices))):
+            key, code = divmod(key, radix)
+            labels[name] = self.manifest['dictionaries'][name][code]
+        lines, units, cents = total
+        return {
+            **{name: labels[name] for name in group_by},
+            **row,
+            'lines': lines,
+            'units': units,
+            'revenue': (Decimal(cents) / 100).quantize(Decimal('0.01')),
+        }
+
+
+def _split(items, parts):
+    return [items[i::parts] for i in range(parts)]
+
+
+def _scan(task):
+    """
+    Group and sum the row ranges of one ``aggregate`` worker, returning
+    ``{group key: [lines, units, cents]}``.
+    """
+    plan, ranges = task
+    snapshot = OrderLineSnapshot(plan['path'])
+    snapshot.manifest['rows'] = plan['rows']
+    group_by, radices, filters = plan['group_by'], plan['radices'], plan['filters']
+    bucket_offsets = plan['bucket_offsets']
+    columns = {name: snapshot.column(name) for name in {*group_by, *dict(filters), 'day', 'quantity', 'revenue'}}
+    groups = int(np.prod(radices, dtype=np.int64)) if radices else 1
+    dense = np.zeros((3, groups), dtype=np.int64) if groups <= MAX_DENSE_GROUPS else None
+    totals = defaultdict(lambda: [0, 0, 0])
+    
+    for lo, hi in ranges:
+        window = slice(lo, hi)
+        mask = None
+        for name, values in filters:
+            if name in CATEGORICALS:
+                matches = values[columns[name][window]]
+            else:
+                matches = np.isin(columns[name][window], values)
+            mask = matches if mask is None else mask & matches
+        
+        def read(name):
+            return columns[name][window] if mask is None else columns[name][window][mask]
+        
+        keys = np.zeros(hi - lo if mask is None else int(mask.sum()), dtype=np.int64)
+        for name, radix in zip(group_by, radices):
+            keys = keys * radix + read(name)
+        if bucket_offsets is not None:
+            keys = keys * radices[-1] + bucket_offsets[read('day') - plan['first_day']]
+        quantity, revenue = read('quantity'), read('revenue')
+        
+        if dense is not None:
+            dense[0] += np.bincount(keys, minlength=groups)
+            dense[1] += np.bincount(keys, weights=quantity, minlength=groups).round().astype(np.int64)
+            dense[2] += np.bincount(keys, weights=revenue, minlength=groups).round().astype(np.int64)
+        else:
+            present, inverse = np.unique(keys, return_inverse=True)
+            sums = np.stack([
+                np.bincount(inverse),
+                np.bincount(inverse, weights=quantity).round().astype(np.int64),
+                np.bincount(inverse, weights=revenue).round().astype(np.int64),
+            ])
+            for i, key in enumerate(present.tolist()):
+                total = totals[key]
+                for n in range(3):
+                    total[n] += int(sums[n, i])
+    
+    if dense is not None:
+        return {int(key): dense[:, key].tolist() for key in np.flatnonzero(dense[0])}
+    return dict(totals)
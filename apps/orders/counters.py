@@ -0,0 +1,123 @@
+"""
+Counter-cache columns derived from orders.
+
+* ``Order.items_count`` - number of items of the order.
+* ``User.orders_count`` - number of orders placed by the customer.
+* ``User.lifetime_value`` - ``total_amount`` of the customer's orders that
+  are not cancelled.
+
+Counters are adjusted with ``F()`` expressions by the signal handlers in
+``apps.orders.signals`` in the same transaction as the change. Writes that
+skip signals (``bulk_create``, ``QuerySet.update``) must call the
+``apply_*`` helpers themselves. ``find_drift`` and ``reconcile`` detect and
+repair anything that slipped through.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, Q, Sum
+
+from apps.core.bulk import chunked
+from .models import Order, OrderItem
+
+User = get_user_model()
+
+UNCOUNTED_STATUSES = ['cancelled']
+
+
+def order_value(status, total_amount):
+    """
+    What an order contributes to its customer's lifetime value.
+    """
+    if status in UNCOUNTED_STATUSES:
+        return Decimal('0')
+    return Decimal(total_amount or 0)
+
+
+def _group_by_delta(deltas):
+    groups = defaultdict(list)
+    for pk, delta in deltas.items():
+        if delta:
+            groups[delta].append(pk)
+    return groups.items()
+
+
+def apply_items_count_deltas(deltas):
+    """
+    Add ``{order_id: delta}`` to ``Order.items_count``, one UPDATE per
+    distinct delta.
+    """
+    for delta, order_ids in _group_by_delta(deltas):
+        Order.objects.filter(pk__in=order_ids).update(items_count=F('items_count') + delta)
+
+
+def apply_customer_deltas(orders_deltas=None, value_deltas=None):
+    """
+    Add ``{user_id: delta}`` to ``orders_count`` and ``lifetime_value``.
+    """
+    for delta, user_ids in _group_by_delta(orders_deltas or {}):
+        User.objects.filter(pk__in=user_ids).update(orders_count=F('orders_count') + delta)
+    for delta, user_ids in _group_by_delta(value_deltas or {}):
+        User.objects.filter(pk__in=user_ids).update(lifetime_value=F('lifetime_value') + delta)
+
+
+def expected_items_counts(order_ids):
+    counts = dict(
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .values_list('order_id').annotate(count=Count('id')).order_by()
+    )
+    return {order_id: counts.get(order_id, 0) for order_id in order_ids}
+
+
+def expected_customer_totals(user_ids):
+    rows = (
+        Order.objects.filter(customer_id__in=user_ids)
+        .values('customer_id')
+        .annotate(
+            orders_count=Count('id'),
+            lifetime_value=Sum('total_amount', filter=~Q(status__in=UNCOUNTED_STATUSES)),
+        )
+        .order_by()
+    )
+    totals = {user_id: (0, Decimal('0')) for user_id in user_ids}
+    for row in rows:
+        totals[row['customer_id']] = (row['orders_count'], row['lifetime_value'] or Decimal('0'))
+    return totals
+
+
+def find_drift(chunk_size=2000):
+    """
+    Yield ``(model, pk, field, stored, expected)`` for every counter that
+    disagrees with the underlying rows, checking ``chunk_size`` rows at a time.
+    """
+    order_ids = Order.objects.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=chunk_size)
+    for chunk in chunked(order_ids, chunk_size):
+        stored = dict(Order.objects.filter(pk__in=chunk).values_list('pk', 'items_count'))
+        for order_id, expected in expected_items_counts(chunk).items():
+            if stored.get(order_id) != expected:
+                yield Order, order_id, 'items_count', stored.get(order_id), expected
+    
+    user_ids = User.objects.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=chunk_size)
+    for chunk in chunked(user_ids, chunk_size):
+        stored = {
+            row['pk']: (row['orders_count'], row['lifetime_value'])
+            for row in User.objects.filter(pk__in=chunk).values('pk', 'orders_count', 'lifetime_value')
+        }
+        for user_id, (orders_count, lifetime_value) in expected_customer_totals(chunk).items():
+            current_count, current_value = stored[user_id]
+            if current_count != orders_count:
+                yield User, user_id, 'orders_count', current_count, orders_count
+            if current_value != lifetime_value:
+                yield User, user_id, 'lifetime_value', current_value, lifetime_value
+
+
+def reconcile(fix=False, chunk_size=2000):
+    """
+    Return the list of drifted counters, rewriting them when ``fix`` is set.
+    """
+    drift = list(find_drift(chunk_size))
+    if fix:
+        for model, pk, field, _, expected in drift:
+            model.objects.filter(pk=pk).update(**{field: expected})
+    return drift
@@ -0,0 +1,91 @@
+"""
+Fulfilment work queue over pending orders.
+
+Workers claim batches of pending orders under a lease. A claimed order is
+invisible to other workers until its lease is released or runs out, at
+which point it can be claimed again, so a crashed worker never strands
+its orders.
+
+On databases with ``SELECT ... FOR UPDATE SKIP LOCKED`` (PostgreSQL)
+concurrent claims lock disjoint rows and never wait on each other.
+Elsewhere (SQLite) candidates are read without locks and the claiming
+``UPDATE`` re-checks that each row is still claimable, so two workers can
+never hold the same order; a worker that loses a race just gets fewer rows.
+"""
+from datetime import timedelta
+from uuid import uuid4
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Order
+
+DEFAULT_LEASE_SECONDS = 300
+
+
+def claimable_orders(now=None):
+    now = now or timezone.now()
+    return Order.objects.filter(
+        Q(lease_expires_at__isnull=True) | Q(lease_expires_at__lt=now),
+        status='pending',
+    )
+
+
+def claim_orders(worker, limit, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """
+    Claim up to ``limit`` of the oldest pending orders for ``worker``.
+    
+    Returns the claim token; the claimed orders are those carrying it.
+    """
+    now = timezone.now()
+    token = uuid4().hex
+    claimable = claimable_orders(now)
+    candidates = claimable.order_by('created_at', 'pk').values_list('pk', flat=True)
+    
+    def take(order_ids):
+        claimable.filter(pk__in=order_ids).update(
+            claimed_by=worker,
+            claim_token=token,
+            lease_expires_at=now + timedelta(seconds=lease_seconds),
+        )
+    
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            take(list(candidates.select_for_update(skip_locked=True)[:limit]))
+    else:
+        take(list(candidates[:limit]))
+    return token
+
+
+def renew_claim(order_id, worker, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """
+    Extend a live lease held by ``worker``. Returns whether it was renewed.
+    """
+    now = timezone.now()
+    return bool(
+        Order.objects.filter(
+            pk=order_id, claimed_by=worker, lease_expires_at__gte=now
+        ).update(lease_expires_at=now + timedelta(seconds=lease_seconds))
+    )
+
+
+def release_claim(order_id, worker):
+    """
+    Give an order held by ``worker`` back to the queue.
+    """
+    return bool(
+        Order.objects.filter(pk=order_id, claimed_by=worker).update(
+            claimed_by=None, claim_token='', lease_expires_at=None
+        )
+    )
+
+
+def release_expired_claims(now=None):
+    """
+    Clear lapsed leases. Claiming already ignores them; this keeps the
+    columns truthful for the admin and reports.
+    """
+    return Order.objects.filter(lease_expires_at__lt=now or timezone.now()).update(
+        claimed_by=None, claim_token='', lease_expires_at=None
+    )
@@ -0,0 +1,21 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.orders.rollups import backfill
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the vendor sales rollups from order history.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help='First day to rebuild (YYYY-MM-DD).')
+        parser.add_argument('--end', type=date.fromisoformat, help='Last day to rebuild (YYYY-MM-DD).')
+        parser.add_argument('--window-days', type=int, default=31)
+    
+    def handle(self, *args, **options):
+        if options['window_days'] < 1:
+            raise CommandError('--window-days must be at least 1.')
+        
+        written = backfill(options['start'], options['end'], options['window_days'])
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} rollup rows.'))
@@ -0,0 +1,59 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.benchmarking import rolled_back, seed_catalog
+from apps.orders.counters import expected_customer_totals, expected_items_counts
+from apps.orders.models import Order, OrderItem
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Create an order item by item and save it again, as the GraphQL CreateOrder mutation does, '
+        'then save a stale copy of its customer and check that no counter column was overwritten. '
+        'Everything is rolled back.'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=3)
+    
+    def handle(self, *args, **options):
+        with rolled_back():
+            products = seed_catalog(options['items'], vendors=1, categories=1, prefix='countercheck')
+            customer = User.objects.create(username='counter-check', email='counter-check@example.com')
+            stale_customer = User.objects.get(pk=customer.pk)
+            
+            order = Order.objects.create(customer=customer, shipping_address='-', billing_address='-')
+            total = Decimal('0')
+            for product in products:
+                OrderItem.objects.create(
+                    order=order, product=product, quantity=1, unit_price=product.price, total_price=product.price
+                )
+                total += product.price
+            order.subtotal = order.total_amount = total
+            order.save()
+            
+            stale_customer.first_name = 'Stale'
+            stale_customer.save()
+            
+            order.refresh_from_db()
+            customer.refresh_from_db()
+            stored = {
+                'items_count': order.items_count,
+                'orders_count': customer.orders_count,
+                'lifetime_value': customer.lifetime_value,
+            }
+            orders_count, lifetime_value = expected_customer_totals([customer.pk])[customer.pk]
+            expected = {
+                'items_count': expected_items_counts([order.pk])[order.pk],
+                'orders_count': orders_count,
+                'lifetime_value': lifetime_value,
+            }
+            for field in stored:
+                self.stdout.write(f'{field}: stored {stored[field]}, expected {expected[field]}')
+            if stored != expected:
+                raise CommandError('A save wrote back stale counter columns.')
+        self.stdout.write(self.style.SUCCESS('Counters survived the saves.'))
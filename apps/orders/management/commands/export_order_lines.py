@@ -0,0 +1,22 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from apps.orders.columnar import OrderLineSnapshot
+
+
+class Command(BaseCommand):
+    help = 'Append new days of order lines to the columnar analytics snapshot.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--path', help='Snapshot directory (default ORDER_LINES_SNAPSHOT_DIR).')
+        parser.add_argument('--through', type=date.fromisoformat, help='Last day to export (default yesterday).')
+        parser.add_argument('--refresh-days', type=int, default=7, help='Trailing days to export again.')
+        parser.add_argument('--rebuild', action='store_true', help='Export all history from scratch.')
+    
+    def handle(self, *args, **options):
+        snapshot = OrderLineSnapshot(options['path'])
+        written = snapshot.update(options['through'], options['refresh_days'], options['rebuild'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {written} rows; the snapshot has {snapshot.rows} rows through {snapshot.manifest["last_day"]}.'
+        ))
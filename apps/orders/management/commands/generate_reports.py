@@ -0,0 +1,27 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.orders.reports import REPORT_CHUNK_DAYS, REPORT_WORKERS, generate
+
+
+class Command(BaseCommand):
+    help = 'Write the daily sales reports of the days whose orders changed since the last run.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help='First day (default: the first order).')
+        parser.add_argument('--end', type=date.fromisoformat, help='Last day (default: yesterday).')
+        parser.add_argument('--workers', type=int, default=REPORT_WORKERS)
+        parser.add_argument('--chunk-days', type=int, default=REPORT_CHUNK_DAYS)
+        parser.add_argument('--force', action='store_true', help='Recompute days that did not change.')
+        parser.add_argument('--path', help='Output directory (default REPORTS_DIR/daily).')
+    
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['chunk_days'] < 1:
+            raise CommandError('--workers and --chunk-days must be at least 1.')
+        
+        written = generate(
+            options['start'], options['end'], options['workers'], options['chunk_days'],
+            options['force'], options['path'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} daily reports.'))
@@ -0,0 +1,44 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.orders.columnar import BUCKETS, OrderLineSnapshot
+
+
+class Command(BaseCommand):
+    help = (
+        'Aggregate lines, units and revenue over the order line snapshot, e.g. '
+        '--group-by category --bucket week --where status=delivered,shipped'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--path', help='Snapshot directory (default ORDER_LINES_SNAPSHOT_DIR).')
+        parser.add_argument('--group-by', nargs='*', default=[])
+        parser.add_argument('--bucket', choices=BUCKETS)
+        parser.add_argument('--start', type=date.fromisoformat)
+        parser.add_argument('--end', type=date.fromisoformat)
+        parser.add_argument('--where', action='append', default=[], help='column=value[,value...]')
+    
+    def handle(self, *args, **options):
+        where = {}
+        for condition in options['where']:
+            name, _, values = condition.partition('=')
+            if not values:
+                raise CommandError(f'Expected column=value, got {condition!r}.')
+            values = values.split(',')
+            where[name] = [int(value) for value in values] if name.endswith('_id') else values
+        
+        snapshot = OrderLineSnapshot(options['path'])
+        start = time.perf_counter()
+        try:
+            rows = snapshot.aggregate(
+                options['group_by'], options['bucket'], options['start'], options['end'], where
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - start
+        
+        for row in rows:
+            self.stdout.write('  '.join(f'{key}={value}' for key, value in row.items()))
+        self.stdout.write(f'{len(rows)} groups over {snapshot.rows} rows in {elapsed * 1000:.1f} ms')
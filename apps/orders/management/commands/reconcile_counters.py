@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.orders.counters import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Compare order and customer counter columns with the underlying rows.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Rewrite drifted counters.')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+    
+    def handle(self, *args, **options):
+        drift = reconcile(fix=options['fix'], chunk_size=options['chunk_size'])
+        for model, pk, field, stored, expected in drift:
+            self.stdout.write(f'{model.__name__}({pk}).{field}: stored {stored}, expected {expected}')
+        
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('No counter drift.'))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'Fixed {len(drift)} counters.'))
+        else:
+            raise CommandError(f'{len(drift)} counters drifted; run with --fix to repair them.')
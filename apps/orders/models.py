@@ -3,10 +3,23 @@ from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 
+from apps.core.identifiers import order_numbers
+from apps.core.models import CounterColumnsMixin, OutboxModel
+
 User = get_user_model()
 
 
-class Order(models.Model):
+def status_changed_event(order_id, order_number, previous_status, status, updated_at):
+    return ('order.status_changed', {
+        'id': order_id,
+        'order_number': order_number,
+        'previous_status': previous_status,
+        'status': status,
+        'updated_at': updated_at,
+    })
+
+
+class Order(CounterColumnsMixin, OutboxModel):
     """
     Order model.
     """
@@ -36,14 +49,55 @@ class Order(models.Model):
         return self.total_amount
     
     notes = models.TextField(blank=True)
+    items_count = models.PositiveIntegerField(default=0, editable=False)
+    
+    # Fulfilment work queue lease, see apps.orders.fulfilment.
+    claimed_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='claimed_orders'
+    )
+    claim_token = models.CharField(max_length=32, blank=True, db_index=True)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['created_at', 'lease_expires_at'],
+                name='order_pending_queue_idx',
+                condition=models.Q(status='pending'),
+            ),
+            models.Index(fields=['created_at'], name='order_created_at_idx'),
+        ]
+    
+    # Maintained by apps.orders.counters.
+    counter_fields = ['items_count']
+    
+    outbox_aggregate_type = 'order'
+    outbox_event_prefix = 'order'
+    outbox_fields = [
+        'id', 'order_number', 'customer_id', 'status', 'subtotal', 'tax_amount',
+        'shipping_cost', 'total_amount', 'items_count', 'updated_at'
+    ]
+    
+    def outbox_events(self, action, previous):
+        events = super().outbox_events(action, previous)
+        old_status = previous.get('status', self.status)
+        if action == 'updated' and old_status != self.status:
+            events.append(status_changed_event(
+                self.pk, self.order_number, old_status, self.status, self.updated_at
+            ))
+        return events
+    
+    def save(self, *args, **kwargs):
+        if not self.order_number:
+            self.order_number = order_numbers.next()
+        super().save(*args, **kwargs)
 
 
-class OrderItem(models.Model):
+class OrderItem(OutboxModel):
     """
     Order item model.
     """
@@ -55,8 +109,15 @@ class OrderItem(models.Model):
     
     created_at = models.DateTimeField(auto_now_add=True)
     
+    outbox_aggregate_type = 'order'
+    outbox_event_prefix = 'order_item'
+    outbox_fields = ['id', 'order_id', 'product_id', 'quantity', 'unit_price', 'total_price']
+    
     class Meta:
         ordering = ['created_at']
+    
+    def outbox_aggregate_id(self):
+        return self.order_id
 
 
 class OrderStatus(models.Model):
@@ -90,3 +151,27 @@ class ShippingAddress(models.Model):
     
     class Meta:
         ordering = ['-is_default', '-created_at']
+
+
+class VendorSalesRollup(models.Model):
+    """
+    Sales of one vendor's product on one day, see ``apps.orders.rollups``.
+    """
+    vendor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sales_rollups')
+    product = models.ForeignKey('products.Product', on_delete=models.CASCADE, related_name='sales_rollups')
+    day = models.DateField()
+    lines_count = models.IntegerField(default=0)
+    units_sold = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(fields=['vendor', 'product', 'day'], name='unique_vendor_product_day'),
+        ]
+        indexes = [
+            models.Index(fields=['vendor', 'day'], name='vendor_sales_day_idx'),
+        ]
+    
+    def __str__(self):
+        return f'{self.vendor_id}/{self.product_id} {self.day}'
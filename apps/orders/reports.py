@@ -0,0 +1,256 @@
+"""
+Daily sales reports.
+
+``generate`` writes one gzipped JSON report per day to
+``REPORTS_DIR/daily/year=YYYY/month=MM/YYYY-MM-DD.json.gz``, with every
+figure aggregated in the database:
+
+* orders and revenue by status; ``revenue`` and ``average_order_value``
+  leave out cancelled orders, like the vendor rollups;
+* lines, units and revenue by category and by vendor, and units sold;
+* new customers, as non-vendor accounts created that day.
+
+Days are reported by the local date the order was placed. Before
+computing anything, one grouped query per table fingerprints every day of
+the range (count, sums, latest update or id); only days whose
+fingerprint differs from the one in ``manifest.json`` are computed again.
+Changed days are split into runs of up to ``REPORT_CHUNK_DAYS``
+consecutive days, each computed with range queries grouped by day on a
+thread of its own, as the work is done by the database.
+
+Fingerprints are taken before the figures, so a change racing a run is
+picked up by the next one. Moving products between categories or
+vendors does not change any fingerprint; pass ``force`` to recompute.
+"""
+import gzip
+import hashlib
+import json
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .counters import UNCOUNTED_STATUSES
+from .models import Order, OrderItem
+
+User = get_user_model()
+
+REPORTS_DIR = getattr(settings, 'REPORTS_DIR', os.path.join(settings.BASE_DIR, 'var', 'reports'))
+REPORT_WORKERS = getattr(settings, 'REPORT_WORKERS', 4)
+REPORT_CHUNK_DAYS = getattr(settings, 'REPORT_CHUNK_DAYS', 7)
+
+
+def report_path(day, directory=None):
+    directory = directory or os.path.join(REPORTS_DIR, 'daily')
+    return os.path.join(directory, f'year={day.year}', f'month={day.month:02d}', f'{day.isoformat()}.json.gz')
+
+
+def _by_day(queryset, field, start, end):
+    # A range on the column itself, unlike __date, can use its index.
+    since = timezone.make_aware(datetime.combine(start, time.min))
+    until = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))
+    return queryset.filter(**{f'{field}__gte': since, f'{field}__lt': until}).annotate(day=TruncDate(field))
+
+
+def fingerprints(start, end):
+    """
+    ``{day: digest}`` of the data behind each day's report.
+    """
+    parts = defaultdict(list)
+    queries = [
+        _by_day(Order.objects.all(), 'created_at', start, end)
+        .values('day')
+        .annotate(count=Count('id'), total=Sum('total_amount'), latest=Max('updated_at')),
+        _by_day(OrderItem.objects.all(), 'order__created_at', start, end)
+        .values('day')
+        .annotate(count=Count('id'), units=Sum('quantity'), total=Sum('total_price'), latest=Max('id')),
+        _by_day(User.objects.filter(is_vendor=False), 'created_at', start, end)
+        .values('day')
+        .annotate(count=Count('id'), latest=Max('id')),
+    ]
+    for index, query in enumerate(queries):
+        for row in query.order_by():
+            parts[row.pop('day')].append((index, sorted(row.items())))
+    
+    days = {}
+    day = start
+    while day <= end:
+        days[day] = hashlib.md5(repr(parts.get(day, [])).encode()).hexdigest()
+        day += timedelta(days=1)
+    return days
+
+
+def daily_metrics(start, end):
+    """
+    ``{day: report}`` for every day from ``start`` to ``end``.
+    """
+    reports = {}
+    day = start
+    while day <= end:
+        reports[day] = {
+            'date': day,
+            'orders': 0,
+            'revenue': Decimal('0.00'),
+            'average_order_value': Decimal('0.00'),
+            'by_status': {},
+            'by_category': [],
+            'by_vendor': [],
+            'units_sold': 0,
+            'new_customers': 0,
+        }
+        day += timedelta(days=1)
+    
+    statuses = (
+        _by_day(Order.objects.all(), 'created_at', start, end)
+        .values('day', 'status')
+        .annotate(orders=Count('id'), revenue=Sum('total_amount'))
+        .order_by()
+    )
+    for row in statuses:
+        report = reports[row['day']]
+        report['by_status'][row['status']] = {'orders': row['orders'], 'revenue': row['revenue']}
+        if row['status'] not in UNCOUNTED_STATUSES:
+            report['orders'] += row['orders']
+            report['revenue'] += row['revenue']
+    
+    items = _by_day(OrderItem.objects.all(), 'order__created_at', start, end).exclude(
+        order__status__in=UNCOUNTED_STATUSES
+    )
+    for key, group in [('by_category', 'product__category'), ('by_vendor', 'product__vendor')]:
+        label = f'{group}__name' if key == 'by_category' else f'{group}__username'
+        rows = (
+            items.values('day', f'{group}_id', label)
+            .annotate(lines=Count('id'), units=Sum('quantity'), revenue=Sum('total_price'))
+            .order_by('day', '-revenue', f'{group}_id')
+        )
+        for row in rows:
+            reports[row['day']][key].append({
+                'id': row[f'{group}_id'],
+                'name': row[label],
+                'lines': row['lines'],
+                'units': row['units'],
+                'revenue': row['revenue'],
+            })
+    
+    customers = (
+        _by_day(User.objects.filter(is_vendor=False), 'created_at', start, end)
+        .values('day')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    for row in customers:
+        reports[row['day']]['new_customers'] = row['count']
+    
+    for report in reports.values():
+        report['units_sold'] = sum(row['units'] for row in report['by_category'])
+        if report['orders']:
+            report['average_order_value'] = (report['revenue'] / report['orders']).quantize(Decimal('0.01'))
+    return reports
+
+
+def write_report(report, directory=None):
+    path = report_path(report['date'], directory)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with gzip.open(path + '.tmp', 'wt') as f:
+        json.dump(report, f, cls=DjangoJSONEncoder)
+    os.replace(path + '.tmp', path)
+
+
+def read_report(day, directory=None):
+    """
+    The stored report of ``day``, or None.
+    """
+    try:
+        with gzip.open(report_path(day, directory), 'rt') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_range(task):
+    """
+    Compute and write the reports of one run of days.
+    """
+    start, end, directory = task
+    reports = daily_metrics(start, end)
+    for report in reports.values():
+        write_report(report, directory)
+    return len(reports)
+
+
+def _write_range_in_thread(task):
+    try:
+        return _write_range(task)
+    finally:
+        # Each thread opened its own connections.
+        connections.close_all()
+
+
+def _runs(days, chunk_days):
+    """
+    Split sorted days into runs of at most ``chunk_days`` consecutive days.
+    """
+    runs = []
+    for day in days:
+        if runs and day == runs[-1][1] + timedelta(days=1) and (day - runs[-1][0]).days < chunk_days:
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return runs
+
+
+def _read_manifest(directory):
+    try:
+        with open(os.path.join(directory, 'manifest.json')) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'days': {}}
+
+
+def generate(start=None, end=None, workers=REPORT_WORKERS, chunk_days=REPORT_CHUNK_DAYS, force=False, directory=None):
+    """
+    Write the reports of the days from ``start`` (default: the first
+    order) to ``end`` (default: yesterday) whose data changed since the
+    last run. Returns how many days were written.
+    """
+    directory = directory or os.path.join(REPORTS_DIR, 'daily')
+    end = end or timezone.localdate() - timedelta(days=1)
+    if start is None:
+        first = Order.objects.aggregate(first=Min('created_at'))['first']
+        start = timezone.localdate(first) if first is not None else end
+    if start > end:
+        return 0
+    
+    manifest = _read_manifest(directory)
+    current = fingerprints(start, end)
+    changed = [
+        day for day, digest in current.items()
+        if force or manifest['days'].get(day.isoformat()) != digest
+        or not os.path.exists(report_path(day, directory))
+    ]
+    if not changed:
+        return 0
+    
+    tasks = [(run_start, run_end, directory) for run_start, run_end in _runs(changed, chunk_days)]
+    if workers > 1 and len(tasks) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            written = sum(pool.map(_write_range_in_thread, tasks))
+    else:
+        written = sum(map(_write_range, tasks))
+    
+    manifest['days'].update({day.isoformat(): current[day] for day in changed})
+    manifest['updated_at'] = timezone.now().isoformat()
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, 'manifest.json.tmp'), 'w') as f:
+        json.dump(manifest, f)
+    os.replace(os.path.join(directory, 'manifest.json.tmp'), os.path.join(directory, 'manifest.json'))
+    return written
@@ -0,0 +1,202 @@
+"""
+Vendor sales rollups.
+
+``VendorSalesRollup`` holds, per vendor, product and day, the order lines
+(``lines_count``), units and revenue of orders that are not cancelled,
+dated by when the order was placed. Orders themselves cannot be counted
+from rows per product: an order with two lines would count twice.
+
+The rollups are kept up to date incrementally in the transaction of each
+change:
+
+* order items created, edited or deleted (``apps.orders.signals`` and the
+  bulk hooks of ``OrderItemSerializer``),
+* orders moving into or out of a cancelled status (``apps.orders.signals``
+  and ``apps.orders.transitions``).
+
+``backfill`` rebuilds the rollups from order history one window of days at
+a time; ``vendor_sales`` answers the dashboard's range queries from the
+rollups alone.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from apps.products.models import Product
+from .counters import UNCOUNTED_STATUSES
+from .models import Order, OrderItem, VendorSalesRollup
+
+ITEM_FIELDS = ['order_id', 'product_id', 'quantity', 'total_price']
+
+
+def counted(status):
+    return status not in UNCOUNTED_STATUSES
+
+
+def item_row(item):
+    return tuple(getattr(item, field) for field in ITEM_FIELDS)
+
+
+def _new_delta():
+    return [0, 0, Decimal('0')]
+
+
+def apply_rollup_deltas(deltas):
+    """
+    Add ``{(vendor_id, product_id, day): [lines, units, revenue]}`` to the
+    rollups, creating rows as needed.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+    VendorSalesRollup.objects.bulk_create(
+        [
+            VendorSalesRollup(vendor_id=vendor_id, product_id=product_id, day=day)
+            for (vendor_id, product_id, day), (lines, _, _) in deltas.items()
+            if lines > 0
+        ],
+        ignore_conflicts=True,
+    )
+    for (vendor_id, product_id, day), (lines, units, revenue) in deltas.items():
+        VendorSalesRollup.objects.filter(vendor_id=vendor_id, product_id=product_id, day=day).update(
+            lines_count=F('lines_count') + lines,
+            units_sold=F('units_sold') + units,
+            revenue=F('revenue') + revenue,
+        )
+
+
+def _add_rows(deltas, rows, sign):
+    """
+    Add ``(product_id, quantity, total_price, order_created_at)`` rows.
+    """
+    vendors = dict(
+        Product.objects.filter(pk__in={row[0] for row in rows}).values_list('pk', 'vendor_id')
+    )
+    for product_id, quantity, total_price, created_at in rows:
+        if product_id not in vendors:
+            continue
+        delta = deltas[(vendors[product_id], product_id, timezone.localdate(created_at))]
+        delta[0] += sign
+        delta[1] += sign * quantity
+        delta[2] += sign * Decimal(total_price)
+
+
+def change_items(removed=(), added=()):
+    """
+    Apply order lines going away and appearing, each given as
+    ``(order_id, product_id, quantity, total_price)``. Lines of cancelled
+    orders are skipped.
+    """
+    orders = dict(
+        Order.objects.filter(pk__in={item[0] for item in (*removed, *added)})
+        .exclude(status__in=UNCOUNTED_STATUSES)
+        .values_list('pk', 'created_at')
+    )
+    deltas = defaultdict(_new_delta)
+    for items, sign in ((removed, -1), (added, 1)):
+        rows = [
+            (product_id, quantity, total_price, orders[order_id])
+            for order_id, product_id, quantity, total_price in items
+            if order_id in orders
+        ]
+        _add_rows(deltas, rows, sign)
+    apply_rollup_deltas(deltas)
+
+
+def change_orders(removed=(), added=()):
+    """
+    Remove and add all lines of the given orders, e.g. on cancellation.
+    """
+    deltas = defaultdict(_new_delta)
+    for order_ids, sign in ((removed, -1), (added, 1)):
+        if order_ids:
+            rows = list(
+                OrderItem.objects.filter(order_id__in=order_ids)
+                .values_list('product_id', 'quantity', 'total_price', 'order__created_at')
+            )
+            _add_rows(deltas, rows, sign)
+    apply_rollup_deltas(deltas)
+
+
+def backfill(start=None, end=None, window_days=31):
+    """
+    Rebuild the rollups of days ``start`` to ``end`` (default: all order
+    history) from the order items. Returns the number of rollup rows.
+    
+    Each window of ``window_days`` days is replaced in one transaction.
+    """
+    if start is None:
+        first = Order.objects.aggregate(first=Min('created_at'))['first']
+        if first is None:
+            return 0
+        start = timezone.localdate(first)
+    end = end or timezone.localdate()
+    
+    written = 0
+    while start <= end:
+        window_end = min(start + timedelta(days=window_days - 1), end)
+        rows = (
+            OrderItem.objects.filter(
+                order__created_at__date__gte=start,
+                order__created_at__date__lte=window_end,
+            )
+            .exclude(order__status__in=UNCOUNTED_STATUSES)
+            .annotate(day=TruncDate('order__created_at'))
+            .values('product__vendor_id', 'product_id', 'day')
+            .annotate(lines=Count('id'), units=Sum('quantity'), revenue=Sum('total_price'))
+            .order_by()
+        )
+        with transaction.atomic():
+            VendorSalesRollup.objects.filter(day__gte=start, day__lte=window_end).delete()
+            rollups = VendorSalesRollup.objects.bulk_create(
+                [
+                    VendorSalesRollup(
+                        vendor_id=row['product__vendor_id'],
+                        product_id=row['product_id'],
+                        day=row['day'],
+                        lines_count=row['lines'],
+                        units_sold=row['units'],
+                        revenue=row['revenue'],
+                    )
+                    for row in rows
+                ],
+                batch_size=1000,
+            )
+        written += len(rollups)
+        start = window_end + timedelta(days=1)
+    return written
+
+
+def vendor_sales(vendor_id, start, end, group_by='day', limit=100):
+    """
+    Totals and a per-day or per-product breakdown of a vendor's sales.
+    """
+    rollups = VendorSalesRollup.objects.filter(vendor_id=vendor_id, day__gte=start, day__lte=end)
+    sums = {
+        'lines_count': Sum('lines_count'),
+        'units_sold': Sum('units_sold'),
+        'revenue': Sum('revenue'),
+    }
+    totals = rollups.aggregate(**sums)
+    
+    if group_by == 'product':
+        breakdown = (
+            rollups.values('product_id', product_name=F('product__name'), product_sku=F('product__sku'))
+            .annotate(**sums)
+            .order_by('-revenue', 'product_id')[:limit]
+        )
+    else:
+        breakdown = rollups.values('day').annotate(**sums).order_by('day')
+    
+    return {
+        'vendor': vendor_id,
+        'start': start,
+        'end': end,
+        'lines_count': totals['lines_count'] or 0,
+        'units_sold': totals['units_sold'] or 0,
+        'revenue': totals['revenue'] or Decimal('0'),
+        'breakdown': list(breakdown),
+    }
@@ -1,8 +1,18 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.utils import timezone
 from rest_framework import serializers
+
+from apps.core.bulk import BulkSerializerMixin
+from apps.core.serializers import ChoiceDisplayField, SparseFieldsetMixin, ValuesSerializer
+from apps.users.models import full_name_expression
+from .counters import apply_items_count_deltas
 from .models import Order, OrderItem, OrderStatus, ShippingAddress
+from .rollups import ITEM_FIELDS, change_items, item_row
 
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(BulkSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for OrderItem model.
     """
@@ -16,7 +26,39 @@ class OrderItemSerializer(serializers.ModelSerializer):
             'quantity', 'unit_price', 'total_price', 'created_at'
         ]
         read_only_fields = ['id', 'created_at', 'total_price']
+        bulk_computed_fields = ['total_price']
+    
+    def build_bulk_instance(self, validated_data, instance=None):
+        previous_order_id = instance.order_id if instance is not None else None
+        item = super().build_bulk_instance(validated_data, instance)
+        item.total_price = item.unit_price * item.quantity
+        item._previous_order_id = previous_order_id
+        return item
     
+    def after_bulk_create(self, objects):
+        apply_items_count_deltas(Counter(item.order_id for item in objects))
+        change_items(added=[item_row(item) for item in objects])
+    
+    def after_bulk_update(self, objects):
+        deltas = Counter()
+        for item in objects:
+            if item._previous_order_id != item.order_id:
+                deltas[item._previous_order_id] -= 1
+                deltas[item.order_id] += 1
+        apply_items_count_deltas(deltas)
+        
+        removed, added = [], []
+        for item in objects:
+            loaded = getattr(item, '_loaded_values', {})
+            previous = tuple(loaded.get(field, getattr(item, field)) for field in ITEM_FIELDS)
+            if previous != item_row(item):
+                removed.append(previous)
+                added.append(item_row(item))
+            loaded.update(zip(ITEM_FIELDS, item_row(item)))
+            item._loaded_values = loaded
+        change_items(removed=removed, added=added)
+        for item in objects:
+            item._previous_order_id = item.order_id
 
 
 
@@ -51,9 +93,13 @@ class ShippingAddressSerializer(serializers.ModelSerializer):
 
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Serializer for Order model.
+    
+    Supports ``?fields=`` and ``?expand=items,status_history`` sparse responses
+    outside the ``list`` action; ``shipping_address``, ``billing_address`` and
+    ``notes`` can be expanded too.
     """
     customer_name = serializers.CharField(source='customer.get_full_name', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
@@ -69,6 +115,16 @@ class OrderSerializer(serializers.ModelSerializer):
             'items', 'status_history'
         ]
         read_only_fields = ['id', 'order_number', 'created_at', 'updated_at']
+        expandable_fields = ['items', 'status_history']
+        heavy_fields = ['shipping_address', 'billing_address', 'notes']
+        field_columns = {
+            'customer_name': ['customer__first_name', 'customer__last_name'],
+            'status_display': ['status'],
+        }
+        prefetch_fields = {
+            'items': ['items__product'],
+            'status_history': ['status_history__created_by'],
+        }
     
 
 
@@ -90,7 +146,28 @@ class OrderListSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'order_number', 'created_at', 'items_count']
     
     def get_items_count(self, obj):
-        return obj.items.count()
+        return obj.items_count
+
+
+class OrderListValuesSerializer(ValuesSerializer):
+    """
+    Values-based equivalent of OrderListSerializer for read-only listing.
+    """
+    id = serializers.IntegerField(read_only=True)
+    order_number = serializers.CharField(read_only=True)
+    customer_name = serializers.CharField(read_only=True)
+    status = serializers.CharField(read_only=True)
+    status_display = ChoiceDisplayField(Order.STATUS_CHOICES, source='status')
+    total_amount = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    created_at = serializers.DateTimeField(read_only=True)
+    items_count = serializers.IntegerField(read_only=True)
+    
+    class Meta:
+        values = ['id', 'order_number', 'status', 'total_amount', 'created_at', 'items_count']
+    
+    @classmethod
+    def get_annotations(cls):
+        return {'customer_name': full_name_expression('customer__')}
 
 
 class OrderCreateSerializer(serializers.ModelSerializer):
@@ -118,3 +195,70 @@ class OrderUpdateStatusSerializer(serializers.ModelSerializer):
         fields = ['status', 'notes']
     
 
+
+
+class OrderClaimSerializer(serializers.Serializer):
+    """
+    Serializer for claiming pending orders from the fulfilment queue.
+    """
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=10)
+    lease_seconds = serializers.IntegerField(min_value=30, max_value=3600, default=300)
+
+
+class OrderBulkStatusSerializer(serializers.Serializer):
+    """
+    Serializer for moving many orders to one status.
+    """
+    order_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=20000
+    )
+    status = serializers.ChoiceField(choices=Order.STATUS_CHOICES)
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+
+
+class VendorSalesQuerySerializer(serializers.Serializer):
+    """
+    Serializer for vendor sales dashboard query parameters.
+    """
+    MAX_DAYS = 731
+    
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    group_by = serializers.ChoiceField(choices=['day', 'product'], default='day')
+    vendor = serializers.IntegerField(min_value=1, required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=1000, default=100)
+    
+    def validate(self, attrs):
+        attrs['end'] = attrs.get('end') or timezone.localdate()
+        attrs['start'] = attrs.get('start') or attrs['end'] - timedelta(days=29)
+        if attrs['start'] > attrs['end']:
+            raise serializers.ValidationError({'start': 'Must not be after end.'})
+        if (attrs['end'] - attrs['start']).days >= self.MAX_DAYS:
+            raise serializers.ValidationError({'start': f'Ranges are limited to {self.MAX_DAYS} days.'})
+        return attrs
+
+
+class VendorSalesRowSerializer(serializers.Serializer):
+    """
+    Serializer for one day or product of the vendor sales breakdown.
+    """
+    day = serializers.DateField(required=False)
+    product_id = serializers.IntegerField(required=False)
+    product_name = serializers.CharField(required=False)
+    product_sku = serializers.CharField(required=False)
+    lines_count = serializers.IntegerField()
+    units_sold = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
+class VendorSalesSerializer(serializers.Serializer):
+    """
+    Serializer for the vendor sales dashboard.
+    """
+    vendor = serializers.IntegerField()
+    start = serializers.DateField()
+    end = serializers.DateField()
+    lines_count = serializers.IntegerField()
+    units_sold = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+    breakdown = VendorSalesRowSerializer(many=True)
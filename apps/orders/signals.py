@@ -0,0 +1,136 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .counters import apply_customer_deltas, apply_items_count_deltas, order_value
+from .models import Order, OrderItem
+from .rollups import ITEM_FIELDS, change_items, change_orders, counted, item_row
+from .streams import publish_order_status
+
+User = get_user_model()
+
+ORDER_COUNTER_FIELDS = ['customer_id', 'status', 'total_amount']
+
+
+def _deleted_through(origin, model):
+    """
+    Whether a cascade started from ``model``, whose row is going away too.
+    """
+    return isinstance(origin, model) or getattr(origin, 'model', None) is model
+
+
+def _previous_values(instance, fields):
+    """
+    The stored values of ``fields`` before this save, or None for new rows.
+    """
+    if instance._state.adding:
+        return None
+    loaded = getattr(instance, '_loaded_values', {})
+    if all(field in loaded for field in fields):
+        return {field: loaded[field] for field in fields}
+    return type(instance).objects.filter(pk=instance.pk).values(*fields).first()
+
+
+def _remember_values(instance, fields):
+    loaded = getattr(instance, '_loaded_values', {})
+    loaded.update({field: getattr(instance, field) for field in fields})
+    instance._loaded_values = loaded
+
+
+def _count_on_cached(instance, relation, deltas):
+    """
+    Apply ``{field: delta}`` to the related instance the caller may still
+    hold, which the ``F()`` update leaves behind.
+    """
+    if instance._meta.get_field(relation).is_cached(instance):
+        related = getattr(instance, relation)
+        for field, delta in deltas.items():
+            setattr(related, field, getattr(related, field) + delta)
+
+
+@receiver(pre_save, sender=Order)
+def capture_order_counter_state(sender, instance, **kwargs):
+    instance._counter_previous = _previous_values(instance, ORDER_COUNTER_FIELDS)
+
+
+@receiver(post_save, sender=Order)
+def update_customer_counters(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_counter_previous', None)
+    orders_deltas, value_deltas = {}, {}
+    
+    if previous is not None:
+        customer_id = previous['customer_id']
+        orders_deltas[customer_id] = -1
+        value_deltas[customer_id] = -order_value(previous['status'], previous['total_amount'])
+    
+    customer_id = instance.customer_id
+    orders_deltas[customer_id] = orders_deltas.get(customer_id, 0) + 1
+    value_deltas[customer_id] = (
+        value_deltas.get(customer_id, 0) + order_value(instance.status, instance.total_amount)
+    )
+    
+    apply_customer_deltas(orders_deltas, value_deltas)
+    _count_on_cached(instance, 'customer', {
+        'orders_count': orders_deltas[customer_id], 'lifetime_value': value_deltas[customer_id],
+    })
+    _remember_values(instance, ORDER_COUNTER_FIELDS)
+
+
+@receiver(post_save, sender=Order)
+def push_order_status(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_counter_previous', None)
+    if previous is not None and previous['status'] != instance.status:
+        publish_order_status(instance.pk, instance.order_number, instance.status, instance.updated_at)
+
+
+@receiver(post_save, sender=Order)
+def update_sales_rollups(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_counter_previous', None)
+    if previous is None or counted(previous['status']) == counted(instance.status):
+        return
+    if counted(instance.status):
+        change_orders(added=[instance.pk])
+    else:
+        change_orders(removed=[instance.pk])
+
+
+@receiver(post_delete, sender=Order)
+def release_customer_counters(sender, instance, origin=None, **kwargs):
+    if _deleted_through(origin, User):
+        return
+    apply_customer_deltas(
+        {instance.customer_id: -1},
+        {instance.customer_id: -order_value(instance.status, instance.total_amount)},
+    )
+
+
+@receiver(pre_save, sender=OrderItem)
+def capture_item_counter_state(sender, instance, **kwargs):
+    instance._counter_previous = _previous_values(instance, ITEM_FIELDS)
+
+
+@receiver(post_save, sender=OrderItem)
+def update_items_count(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_counter_previous', None)
+    if previous is None:
+        apply_items_count_deltas({instance.order_id: 1})
+        _count_on_cached(instance, 'order', {'items_count': 1})
+    elif previous['order_id'] != instance.order_id:
+        apply_items_count_deltas({previous['order_id']: -1, instance.order_id: 1})
+        _count_on_cached(instance, 'order', {'items_count': 1})
+    
+    if previous is None:
+        change_items(added=[item_row(instance)])
+    else:
+        row = tuple(previous[field] for field in ITEM_FIELDS)
+        if row != item_row(instance):
+            change_items(removed=[row], added=[item_row(instance)])
+    _remember_values(instance, ITEM_FIELDS)
+
+
+@receiver(post_delete, sender=OrderItem)
+def release_items_count(sender, instance, origin=None, **kwargs):
+    change_items(removed=[item_row(instance)])
+    if _deleted_through(origin, Order) or _deleted_through(origin, User):
+        return
+    apply_items_count_deltas({instance.order_id: -1})
@@ -0,0 +1,119 @@
+"""
+Live order status and stock updates over Server-Sent Events and WebSocket.
+
+``GET /api/v1/orders/stream/?orders=1,2&products=7`` streams events for
+the listed orders and products as SSE. Under ASGI the same query on
+``/ws/orders/stream/`` opens a WebSocket; browsers cannot set headers
+there, so the token may also be passed as ``?token=``.
+
+Events are ``order.status`` and ``product.stock``.
+"""
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from rest_framework import exceptions
+
+from apps.core.pubsub import broker, publish
+from apps.core.streams import header, query_params, sse_response, websocket_stream
+from apps.products.models import Product
+from apps.products.streams import product_channel
+from apps.users.authentication import CachedTokenAuthentication, get_request_user
+from .models import Order
+
+STREAM_MAX_SUBSCRIPTIONS = 200
+
+
+def order_channel(order_id):
+    return f'order.{order_id}'
+
+
+def publish_order_status(order_id, order_number, status, updated_at=None):
+    publish(order_channel(order_id), {
+        'type': 'order.status',
+        'order_id': order_id,
+        'order_number': order_number,
+        'status': status,
+        'updated_at': updated_at,
+    })
+
+
+def parse_ids(value):
+    if not value:
+        return []
+    try:
+        return sorted({int(part) for part in value.split(',') if part.strip()})
+    except ValueError:
+        raise exceptions.ValidationError('Expected a comma-separated list of ids.')
+
+
+def stream_channels(params):
+    """
+    Channels for the ``orders`` and ``products`` ids in ``params``.
+    """
+    order_ids = parse_ids(params.get('orders'))
+    product_ids = parse_ids(params.get('products'))
+    if not order_ids and not product_ids:
+        raise exceptions.ValidationError('Pass orders and/or products to watch.')
+    if len(order_ids) + len(product_ids) > STREAM_MAX_SUBSCRIPTIONS:
+        raise exceptions.ValidationError(f'At most {STREAM_MAX_SUBSCRIPTIONS} ids can be watched.')
+    
+    found_orders = set(Order.objects.filter(pk__in=order_ids).values_list('pk', flat=True))
+    found_products = set(Product.objects.filter(pk__in=product_ids).values_list('pk', flat=True))
+    if found_orders != set(order_ids) or found_products != set(product_ids):
+        raise exceptions.NotFound('Unknown order or product.')
+    
+    return [order_channel(pk) for pk in order_ids] + [product_channel(pk) for pk in product_ids]
+
+
+def authenticate_token(token_key):
+    if not token_key:
+        raise exceptions.NotAuthenticated()
+    user, _ = CachedTokenAuthentication().authenticate_credentials(token_key)
+    return user
+
+
+def token_from_header(value):
+    parts = (value or '').split()
+    if len(parts) == 2 and parts[0].lower() == 'token':
+        return parts[1]
+    return None
+
+
+@sync_to_async
+def resolve_http_stream(request):
+    if not get_request_user(request).is_authenticated:
+        raise exceptions.NotAuthenticated()
+    return stream_channels(request.GET)
+
+
+async def order_stream(request):
+    """
+    Stream order status and stock changes as Server-Sent Events.
+    """
+    try:
+        channels = await resolve_http_stream(request)
+    except exceptions.APIException as e:
+        return JsonResponse({'error': e.detail}, status=e.status_code)
+    return sse_response(broker.subscribe(channels))
+
+
+@sync_to_async
+def resolve_websocket_stream(scope):
+    params = query_params(scope)
+    authenticate_token(token_from_header(header(scope, 'authorization')) or params.get('token'))
+    return stream_channels(params)
+
+
+async def order_stream_websocket(scope, receive, send):
+    """
+    WebSocket counterpart of ``order_stream``.
+    """
+    if (await receive())['type'] != 'websocket.connect':
+        return
+    try:
+        channels = await resolve_websocket_stream(scope)
+    except exceptions.APIException:
+        await send({'type': 'websocket.close', 'code': 4403})
+        return
+    
+    await send({'type': 'websocket.accept'})
+    await websocket_stream(receive, send, broker.subscribe(channels))
@@ -0,0 +1,121 @@
+"""
+Order status state machine and bulk status transitions.
+
+``transition_orders`` moves many orders to one status with one guarded
+``UPDATE ... WHERE id IN (...) AND status = <source>`` per source status
+and records the matching ``OrderStatus`` history rows with
+``bulk_create``. ``QuerySet.update`` skips ``save()`` and the model
+signals, so the customers' ``lifetime_value`` deltas, the vendor sales
+rollups, the outbox events and the stream pushes are done here as well.
+"""
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.core.bulk import BULK_BATCH_SIZE, chunked
+from apps.core.outbox import record_events
+from .counters import apply_customer_deltas, order_value
+from .models import Order, OrderStatus, status_changed_event
+from .rollups import change_orders, counted
+from .streams import publish_order_status
+
+ORDER_TRANSITIONS = {
+    'pending': ['confirmed', 'cancelled'],
+    'confirmed': ['processing', 'cancelled'],
+    'processing': ['shipped'],
+    'shipped': ['delivered'],
+    'delivered': [],
+    'cancelled': [],
+}
+
+
+def can_transition(source, target):
+    return target in ORDER_TRANSITIONS.get(source, [])
+
+
+def transition_error(source, target):
+    if source == target:
+        return f'Order is already {target}.'
+    return f'Cannot change status from {source} to {target}.'
+
+
+def _transition_chunk(order_ids, target, user, notes, report):
+    now = timezone.now()
+    orders = Order.objects.filter(pk__in=order_ids)
+    if connection.features.has_select_for_update:
+        orders = orders.select_for_update()
+    current = {
+        pk: (status, customer_id, total_amount, order_number)
+        for pk, status, customer_id, total_amount, order_number
+        in orders.values_list('pk', 'status', 'customer_id', 'total_amount', 'order_number')
+    }
+    
+    by_source = defaultdict(list)
+    for order_id in order_ids:
+        if order_id not in current:
+            report['errors'].append({'id': order_id, 'error': 'Order not found.'})
+        elif not can_transition(current[order_id][0], target):
+            report['errors'].append({
+                'id': order_id, 'error': transition_error(current[order_id][0], target)
+            })
+        else:
+            by_source[current[order_id][0]].append(order_id)
+    
+    changed = []
+    for source, source_ids in by_source.items():
+        updated = Order.objects.filter(pk__in=source_ids, status=source).update(
+            status=target, updated_at=now
+        )
+        if updated == len(source_ids):
+            moved = source_ids
+        else:
+            # Without row locks another writer got to some of them first.
+            moved = set(
+                Order.objects.filter(pk__in=source_ids, status=target, updated_at=now)
+                .values_list('pk', flat=True)
+            )
+            for order_id in source_ids:
+                if order_id not in moved:
+                    report['errors'].append({'id': order_id, 'error': 'Order was changed concurrently.'})
+            moved = [order_id for order_id in source_ids if order_id in moved]
+        changed.extend((order_id, source) for order_id in moved)
+    
+    value_deltas = defaultdict(int)
+    events = []
+    for order_id, source in changed:
+        _, customer_id, total_amount, order_number = current[order_id]
+        value_deltas[customer_id] += order_value(target, total_amount) - order_value(source, total_amount)
+        report['results'].append({'id': order_id, 'from_status': source, 'status': target})
+        events.append(('order', order_id) + status_changed_event(order_id, order_number, source, target, now))
+        publish_order_status(order_id, order_number, target, now)
+    apply_customer_deltas(value_deltas=value_deltas)
+    change_orders(
+        removed=[order_id for order_id, source in changed if counted(source) and not counted(target)],
+        added=[order_id for order_id, source in changed if counted(target) and not counted(source)],
+    )
+    record_events(events)
+    
+    OrderStatus.objects.bulk_create(
+        [OrderStatus(order_id=order_id, status=target, notes=notes, created_by=user)
+         for order_id, _ in changed],
+        batch_size=BULK_BATCH_SIZE,
+    )
+
+
+def transition_orders(order_ids, target, user=None, notes='', batch_size=BULK_BATCH_SIZE):
+    """
+    Move the given orders to ``target`` where the state machine allows it.
+    
+    Returns ``{'results': [{'id', 'from_status', 'status'}], 'errors':
+    [{'id', 'error'}]}``. Each batch of ``batch_size`` orders is written in
+    its own transaction.
+    """
+    if target not in ORDER_TRANSITIONS:
+        raise ValueError(f'Unknown order status: {target}')
+    
+    report = {'results': [], 'errors': []}
+    for chunk in chunked(dict.fromkeys(order_ids), batch_size):
+        with transaction.atomic():
+            _transition_chunk(chunk, target, user, notes, report)
+    return report
@@ -1,13 +1,17 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import OrderViewSet, OrderItemViewSet, OrderStatusViewSet, ShippingAddressViewSet
+from . import async_views, streams
+from .views import OrderViewSet, OrderItemViewSet, OrderStatusViewSet, ShippingAddressViewSet, VendorSalesViewSet
 
 router = DefaultRouter()
 router.register(r'orders', OrderViewSet)
 router.register(r'order-items', OrderItemViewSet)
 router.register(r'order-status', OrderStatusViewSet)
 router.register(r'shipping-addresses', ShippingAddressViewSet)
+router.register(r'vendor-sales', VendorSalesViewSet, basename='vendor-sales')
 
 urlpatterns = [
+    path('async/orders/<int:pk>/', async_views.order_detail, name='async-order-detail'),
+    path('orders/stream/', streams.order_stream, name='order-stream'),
     path('', include(router.urls)),
 ]
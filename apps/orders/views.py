@@ -1,15 +1,27 @@
+from collections import defaultdict
+from itertools import islice
+
 from rest_framework import viewsets, status, permissions
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Q, Sum, Count
+from django.db.models import Q, Sum, Count, F
 from django_filters import rest_framework as filters
 
+from apps.core.exports import EXPORT_CHUNK_SIZE, parse_updated_since, streaming_export_response
+from apps.core.mixins import BulkModelMixin, ValuesListMixin
+from apps.users.models import full_name_expression
+
+from . import fulfilment
 from .models import Order, OrderItem, OrderStatus, ShippingAddress
 from .serializers import (
-    OrderSerializer, OrderListSerializer, OrderCreateSerializer,
+    OrderSerializer, OrderListSerializer, OrderListValuesSerializer, OrderCreateSerializer,
     OrderItemSerializer, OrderStatusSerializer, ShippingAddressSerializer,
-    OrderUpdateStatusSerializer
+    OrderUpdateStatusSerializer, OrderClaimSerializer, OrderBulkStatusSerializer,
+    VendorSalesQuerySerializer, VendorSalesSerializer
 )
+from .rollups import vendor_sales
+from .transitions import can_transition, transition_error, transition_orders
 
 
 class OrderFilter(filters.FilterSet):
@@ -36,7 +48,53 @@ class OrderFilter(filters.FilterSet):
         )
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+ORDER_EXPORT_COLUMNS = [
+    'id', 'order_number', 'customer_id', 'customer_name', 'status',
+    'subtotal', 'tax_amount', 'shipping_cost', 'total_amount', 'created_at', 'updated_at'
+]
+ORDER_ITEM_EXPORT_COLUMNS = [
+    'id', 'product_id', 'product_sku', 'product_name', 'quantity', 'unit_price', 'total_price'
+]
+
+
+def attach_order_items(order_rows, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Add an ``items`` list to each order row, one items query per chunk.
+    """
+    order_rows = iter(order_rows)
+    while True:
+        batch = list(islice(order_rows, chunk_size))
+        if not batch:
+            return
+        
+        items = defaultdict(list)
+        item_rows = OrderItem.objects.filter(
+            order_id__in=[row['id'] for row in batch]
+        ).annotate(
+            product_sku=F('product__sku'),
+            product_name=F('product__name'),
+        ).order_by('order_id', 'id').values('order_id', *ORDER_ITEM_EXPORT_COLUMNS)
+        for item in item_rows:
+            items[item.pop('order_id')].append(item)
+        
+        for row in batch:
+            row['items'] = items.get(row['id'], [])
+            yield row
+
+
+def flatten_order_lines(orders):
+    """
+    Turn nested order rows into one CSV row per order item.
+    """
+    for order in orders:
+        items = order.pop('items')
+        for item in items or [{}]:
+            row = dict(order)
+            row.update({f'item_{key}': value for key, value in item.items()})
+            yield row
+
+
+class OrderViewSet(ValuesListMixin, viewsets.ModelViewSet):
     """
     ViewSet for Order model.
     """
@@ -50,7 +108,7 @@ class OrderViewSet(viewsets.ModelViewSet):
     
     def get_serializer_class(self):
         if self.action == 'list':
-            return OrderListSerializer
+            return OrderListValuesSerializer
         elif self.action == 'create':
             return OrderCreateSerializer
         elif self.action == 'update_status':
@@ -64,9 +122,9 @@ class OrderViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         queryset = super().get_queryset()
-        if self.action == 'list':
+        if self.action in ['list', 'export']:
             return queryset
-        return queryset.select_related('customer').prefetch_related('items', 'status_history')
+        return OrderSerializer.optimize_queryset(queryset, self.request)
     
     def create(self, request, *args, **kwargs):
         try:
@@ -82,12 +140,82 @@ class OrderViewSet(viewsets.ModelViewSet):
         """
         Get all pending orders.
         """
-        orders = Order.objects.all()
-        pending_orders = [order for order in orders if order.status == 'pending']
-        
-        serializer = OrderListSerializer(pending_orders, many=True)
+        pending_orders = OrderListValuesSerializer.get_values_queryset(
+            Order.objects.filter(status='pending')
+        )
+        serializer = OrderListValuesSerializer(pending_orders, many=True)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['post'])
+    def claim(self, request):
+        """
+        Claim a batch of the oldest pending orders for fulfilment.
+        """
+        serializer = OrderClaimSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        token = fulfilment.claim_orders(
+            request.user,
+            serializer.validated_data['limit'],
+            serializer.validated_data['lease_seconds'],
+        )
+        orders = Order.objects.filter(claim_token=token).order_by('created_at', 'pk')
+        orders = OrderSerializer.optimize_queryset(orders, request)
+        return Response({
+            'claim_token': token,
+            'orders': OrderSerializer(orders, many=True, context=self.get_serializer_context()).data,
+        })
+    
+    @action(detail=True, methods=['post'])
+    def renew_claim(self, request, pk=None):
+        """
+        Extend the lease on an order claimed by the current user.
+        """
+        serializer = OrderClaimSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        if not fulfilment.renew_claim(pk, request.user, serializer.validated_data['lease_seconds']):
+            return Response(
+                {'error': 'Order is not claimed by you or the lease has expired'},
+                status=status.HTTP_409_CONFLICT
+            )
+        return Response({'status': 'success'})
+    
+    @action(detail=True, methods=['post'])
+    def release_claim(self, request, pk=None):
+        """
+        Return an order claimed by the current user to the queue.
+        """
+        if not fulfilment.release_claim(pk, request.user):
+            return Response(
+                {'error': 'Order is not claimed by you'},
+                status=status.HTTP_409_CONFLICT
+            )
+        return Response({'status': 'success'})
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Stream the (filtered) orders with their items as NDJSON or CSV.
+        
+        CSV output has one row per order item. Pass ``updated_since`` to only
+        receive orders changed since then.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        updated_since = parse_updated_since(request.query_params.get('updated_since'))
+        if updated_since:
+            queryset = queryset.filter(updated_at__gte=updated_since)
+        
+        order_rows = queryset.annotate(
+            customer_name=full_name_expression('customer__'),
+        ).order_by('updated_at', 'id').values(*ORDER_EXPORT_COLUMNS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        rows = attach_order_items(order_rows)
+        
+        if request.query_params.get('output') == 'csv':
+            rows = flatten_order_lines(rows)
+        columns = ORDER_EXPORT_COLUMNS + [f'item_{column}' for column in ORDER_ITEM_EXPORT_COLUMNS]
+        return streaming_export_response(request, rows, columns, 'orders')
+    
     @action(detail=False, methods=['get'])
     def order_stats(self, request):
         """
@@ -114,14 +242,46 @@ class OrderViewSet(viewsets.ModelViewSet):
         
         if serializer.is_valid():
             old_status = order.status
-            serializer.save()
+            new_status = serializer.validated_data.get('status', old_status)
+            if new_status != old_status and not can_transition(old_status, new_status):
+                return Response(
+                    {'error': transition_error(old_status, new_status)},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
             
-           
+            serializer.save()
+            if new_status != old_status:
+                OrderStatus.objects.create(
+                    order=order, status=new_status,
+                    notes=serializer.validated_data.get('notes', ''), created_by=request.user
+                )
             
             return Response(serializer.data)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=False, methods=['post'])
+    def bulk_status(self, request):
+        """
+        Move many orders to one status, validating each transition.
+        """
+        serializer = OrderBulkStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        report = transition_orders(
+            serializer.validated_data['order_ids'],
+            serializer.validated_data['status'],
+            user=request.user,
+            notes=serializer.validated_data['notes'],
+        )
+        if not report['errors']:
+            response_status = status.HTTP_200_OK
+        elif report['results']:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response(report, status=response_status)
+    
     @action(detail=False, methods=['get'])
     def completed_orders(self, request):
         """
@@ -138,20 +298,19 @@ class OrderViewSet(viewsets.ModelViewSet):
         """
         order = self.get_object()
         
-        # if order.status not in ['pending', 'confirmed']:
-        #     return Response(
-        #         {'error': 'Order cannot be cancelled in current status'},
-        #         status=status.HTTP_400_BAD_REQUEST
-        #     )
-        
-        order.status = 'cancelled'
-        order.save()
+        report = transition_orders([order.pk], 'cancelled', user=request.user)
+        if report['errors']:
+            return Response(
+                {'error': report['errors'][0]['error']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
+        order.refresh_from_db()
         serializer = OrderSerializer(order)
         return Response(serializer.data)
 
 
-class OrderItemViewSet(viewsets.ModelViewSet):
+class OrderItemViewSet(BulkModelMixin, viewsets.ModelViewSet):
     """
     ViewSet for OrderItem model.
     """
@@ -239,3 +398,27 @@ class ShippingAddressViewSet(viewsets.ModelViewSet):
             serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class VendorSalesViewSet(viewsets.ViewSet):
+    """
+    Vendor sales dashboard, answered from the daily sales rollups.
+    
+    Vendors see their own sales; staff pass ``vendor``.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def list(self, request):
+        query = VendorSalesQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        
+        if request.user.is_staff and 'vendor' in params:
+            vendor_id = params['vendor']
+        elif request.user.is_vendor:
+            vendor_id = request.user.pk
+        else:
+            raise PermissionDenied('Only vendors have a sales dashboard.')
+        
+        sales = vendor_sales(vendor_id, params['start'], params['end'], params['group_by'], params['limit'])
+        return Response(VendorSalesSerializer(sales).data)
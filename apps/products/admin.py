@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Category, Product, ProductReview, ProductImage
+from .inventory import disable_sharding, enable_sharding
+from .models import Category, Product, ProductReview, ProductImage, StockMovement, StockSnapshot
 
 
 @admin.register(Category)
@@ -20,14 +21,27 @@ class ProductAdmin(admin.ModelAdmin):
     """
     Admin for Product model.
     """
-    list_display = ['name', 'category', 'vendor', 'price', 'stock_quantity', 'is_active', 'created_at']
+    list_display = [
+        'name', 'category', 'vendor', 'price', 'stock_quantity', 'stock_shard_count', 'is_active', 'created_at'
+    ]
     list_filter = ['category', 'vendor', 'is_active', 'created_at']
     search_fields = ['name', 'description', 'sku']
     ordering = ['-created_at']
+    actions = ['shard_stock', 'unshard_stock']
     
     def get_vendor_name(self, obj):
         return obj.vendor.get_full_name()
     get_vendor_name.short_description = 'Vendor'
+    
+    @admin.action(description='Shard stock of selected products')
+    def shard_stock(self, request, queryset):
+        for product in queryset:
+            enable_sharding(product)
+    
+    @admin.action(description='Unshard stock of selected products')
+    def unshard_stock(self, request, queryset):
+        for product in queryset:
+            disable_sharding(product)
 
 
 @admin.register(ProductReview)
@@ -56,3 +70,30 @@ class ProductImageAdmin(admin.ModelAdmin):
     ordering = ['-created_at']
     
 
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    """
+    Read-only admin for the stock movement ledger.
+    """
+    list_display = ['product', 'kind', 'quantity', 'reference', 'created_at']
+    list_filter = ['kind', 'created_at']
+    search_fields = ['product__sku', 'reference']
+    ordering = ['-created_at']
+    raw_id_fields = ['product']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(StockSnapshot)
+class StockSnapshotAdmin(admin.ModelAdmin):
+    """
+    Admin for StockSnapshot model.
+    """
+    list_display = ['product', 'quantity', 'taken_at']
+    search_fields = ['product__sku']
+    ordering = ['-taken_at']
+    raw_id_fields = ['product']
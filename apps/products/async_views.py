@@ -0,0 +1,26 @@
+"""
+Async versions of the hot product and category read endpoints.
+"""
+from apps.core.async_views import async_api_view, filter_queryset, paginate, retrieve
+from .models import Category, Product
+from .serializers import CategorySerializer, ProductListValuesSerializer, ProductSerializer
+from .views import CategoryViewSet, ProductViewSet
+
+
+@async_api_view
+async def product_list(request):
+    queryset = filter_queryset(request, Product.objects.all(), ProductViewSet)
+    queryset = ProductListValuesSerializer.get_values_queryset(queryset)
+    return await paginate(request, queryset, ProductListValuesSerializer)
+
+
+@async_api_view
+async def product_detail(request, pk):
+    queryset = ProductSerializer.optimize_queryset(Product.objects.all(), request)
+    return await retrieve(request, queryset, ProductSerializer, pk)
+
+
+@async_api_view
+async def category_list(request):
+    queryset = filter_queryset(request, Category.objects.all(), CategoryViewSet)
+    return await paginate(request, queryset, CategorySerializer)
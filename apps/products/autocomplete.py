@@ -0,0 +1,410 @@
+"""
+Typeahead over product names, SKUs and category names.
+
+``AutocompleteIndex`` is a sorted array of normalised terms: every name
+from each of its first ``AUTOCOMPLETE_MAX_WORDS`` words on ("smart phone
+case", "phone case", "case"), and the SKU. The terms starting with a
+prefix are one ``bisect`` range. Entries are ranked by the popularity of
+their product or category (units sold over the last
+``AUTOCOMPLETE_POPULARITY_DAYS``; for categories, those of their
+products), so the best of a short range is a sort of a few hundred ranks.
+Prefixes whose range holds more than ``HEAVY_RANGE`` entries have their
+best ``HEAVY_RESULTS`` objects precomputed instead.
+
+``build`` writes the index to ``AUTOCOMPLETE_INDEX_PATH`` as flat numpy
+arrays, which load without any per-entry work but splitting one string.
+Each process loads it on first use and again whenever it is rebuilt.
+
+Product and category writes in between that touch an indexed column
+(``INDEXED_FIELDS``) are published by the signal handlers through
+``note_changes``: a sequence number in the cache and one key per change.
+Every ``AUTOCOMPLETE_REFRESH_SECONDS`` a process reads the changes it has
+not seen, reloads those rows and serves them from a small overlay in
+front of the index until the next build.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from apps.orders.models import VendorSalesRollup
+from .models import Category, Product
+
+AUTOCOMPLETE_INDEX_PATH = getattr(
+    settings, 'AUTOCOMPLETE_INDEX_PATH', os.path.join(settings.BASE_DIR, 'var', 'autocomplete.npz')
+)
+AUTOCOMPLETE_MAX_WORDS = getattr(settings, 'AUTOCOMPLETE_MAX_WORDS', 6)
+AUTOCOMPLETE_MAX_LIMIT = getattr(settings, 'AUTOCOMPLETE_MAX_LIMIT', 20)
+AUTOCOMPLETE_POPULARITY_DAYS = getattr(settings, 'AUTOCOMPLETE_POPULARITY_DAYS', 90)
+AUTOCOMPLETE_REFRESH_SECONDS = getattr(settings, 'AUTOCOMPLETE_REFRESH_SECONDS', 5)
+AUTOCOMPLETE_CACHE_ALIAS = getattr(settings, 'AUTOCOMPLETE_CACHE_ALIAS', 'default')
+
+KINDS = ['product', 'category']
+HEAVY_RANGE = 256
+# Twice the largest limit, so changed objects can be skipped.
+HEAVY_RESULTS = 2 * AUTOCOMPLETE_MAX_LIMIT
+# Changes not picked up within a day are covered by the next build.
+CHANGE_TTL = 24 * 3600
+MAX_PENDING_CHANGES = 10000
+SEQ_KEY = 'autocomplete:seq'
+# The columns the index is built from, by kind.
+INDEXED_FIELDS = {
+    'product': ['name', 'sku', 'is_active', 'category_id'],
+    'category': ['name', 'is_active'],
+}
+
+
+def normalize(text):
+    return ' '.join(text.replace('\n', ' ').casefold().split())
+
+
+def terms_of(label, sku=''):
+    words = normalize(label).split(' ')
+    terms = [' '.join(words[i:]) for i in range(min(len(words), AUTOCOMPLETE_MAX_WORDS))]
+    if sku:
+        terms.append(normalize(sku))
+    return [term for term in terms if term]
+
+
+def prefix_end(prefix):
+    """
+    The smallest string after every string starting with ``prefix``.
+    """
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def object_key(kind, pk):
+    return (KINDS.index(kind) << 48) | pk
+
+
+def _pack(strings):
+    return np.frombuffer('\n'.join(strings).encode(), dtype=np.uint8)
+
+
+def _unpack(array):
+    return array.tobytes().decode().split('\n') if len(array) else []
+
+
+class AutocompleteIndex:
+    """
+    Terms sorted for prefix ranges, with the objects they point to.
+    
+    ``rank`` orders every entry by popularity (0 is the most popular) and
+    ``ranked_objects[r]`` is the object of the entry of rank ``r``.
+    """
+    def __init__(self, keys, rank, ranked_objects, kinds, ids, labels, weights, heavy, seq=0):
+        self.keys = keys
+        self.rank = rank
+        self.ranked_objects = ranked_objects
+        self.kinds = kinds
+        self.ids = ids
+        self.labels = labels
+        self.weights = weights
+        self.heavy = heavy
+        self.seq = seq
+        self.object_keys = (kinds.astype(np.int64) << 48) | ids
+        self.object_order = np.argsort(self.object_keys)
+    
+    @classmethod
+    def from_objects(cls, objects, seq=0):
+        """
+        Build from ``(kind, id, label, sku, weight)`` tuples.
+        """
+        kinds, ids, labels, weights, entries = [], [], [], [], []
+        for index, (kind, pk, label, sku, weight) in enumerate(objects):
+            kinds.append(KINDS.index(kind))
+            ids.append(pk)
+            labels.append(label.replace('\n', ' '))
+            weights.append(weight)
+            entries.extend((term, index) for term in terms_of(label, sku))
+        entries.sort()
+        keys = [term for term, _ in entries]
+        entry_objects = np.array([index for _, index in entries], dtype=np.int32)
+        weights = np.array(weights, dtype=np.float64)
+        
+        # Most popular first; ties keep term order.
+        by_rank = np.argsort(-weights[entry_objects], kind='stable')
+        rank = np.empty(len(by_rank), dtype=np.int32)
+        rank[by_rank] = np.arange(len(by_rank), dtype=np.int32)
+        index = cls(
+            keys, rank, entry_objects[by_rank], np.array(kinds, dtype=np.int8),
+            np.array(ids, dtype=np.int64), labels, weights, {}, seq,
+        )
+        index.heavy = index._heavy_prefixes()
+        return index
+    
+    def _heavy_prefixes(self):
+        """
+        The best objects of every prefix matching more than
+        ``HEAVY_RANGE`` entries, found by walking down the prefix tree
+        from the root as long as ranges stay that large.
+        """
+        heavy = {}
+        stack = [('', 0, len(self.keys))]
+        while stack:
+            prefix, lo, hi = stack.pop()
+            if prefix:
+                heavy[prefix] = self._best(lo, hi, HEAVY_RESULTS)
+            depth = len(prefix)
+            position = lo
+            while position < hi and len(self.keys[position]) == depth:
+                position += 1
+            while position < hi:
+                child = prefix + self.keys[position][depth]
+                end = bisect_left(self.keys, prefix_end(child), position, hi)
+                if end - position > HEAVY_RANGE:
+                    stack.append((child, position, end))
+                position = end
+        return heavy
+    
+    def _best(self, lo, hi, limit):
+        """
+        Distinct objects of entries ``lo`` to ``hi``, best first.
+        """
+        ranks = self.rank[lo:hi]
+        if len(ranks) > 4 * limit:
+            best = np.sort(ranks[np.argpartition(ranks, 4 * limit)[:4 * limit]])
+            objects = list(dict.fromkeys(self.ranked_objects[best].tolist()))
+            if len(objects) >= limit:
+                return np.array(objects[:limit], dtype=np.int32)
+        objects = list(dict.fromkeys(self.ranked_objects[np.sort(ranks)].tolist()))
+        return np.array(objects[:limit], dtype=np.int32)
+    
+    def candidates(self, prefix):
+        """
+        Objects with a term starting with the normalised ``prefix``, best
+        first; for heavy prefixes only the best ``HEAVY_RESULTS``.
+        """
+        if not prefix:
+            return []
+        heavy = self.heavy.get(prefix)
+        if heavy is not None:
+            return heavy.tolist()
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_left(self.keys, prefix_end(prefix), lo)
+        return self._best(lo, hi, hi - lo).tolist() if hi > lo else []
+    
+    def find(self, kind, pk):
+        """
+        The object index of ``(kind, pk)``, or None.
+        """
+        key = object_key(kind, pk)
+        position = np.searchsorted(self.object_keys, key, sorter=self.object_order)
+        if position < len(self.object_order) and self.object_keys[self.object_order[position]] == key:
+            return int(self.object_order[position])
+        return None
+    
+    def result(self, index):
+        return {'type': KINDS[self.kinds[index]], 'id': int(self.ids[index]), 'label': self.labels[index]}
+    
+    def save(self, path):
+        heavy = list(self.heavy.items())
+        offsets = np.cumsum([0] + [len(objects) for _, objects in heavy])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            np.savez(
+                f,
+                keys=_pack(self.keys),
+                rank=self.rank,
+                ranked_objects=self.ranked_objects,
+                kinds=self.kinds,
+                ids=self.ids,
+                labels=_pack(self.labels),
+                weights=self.weights,
+                heavy_keys=_pack(prefix for prefix, _ in heavy),
+                heavy_offsets=offsets,
+                heavy_objects=np.concatenate([objects for _, objects in heavy] or [np.empty(0, np.int32)]),
+                seq=self.seq,
+            )
+        os.replace(path + '.tmp', path)
+    
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            offsets, objects = data['heavy_offsets'], data['heavy_objects']
+            heavy = {
+                prefix: objects[offsets[i]:offsets[i + 1]]
+                for i, prefix in enumerate(_unpack(data['heavy_keys']))
+            }
+            return cls(
+                _unpack(data['keys']), data['rank'], data['ranked_objects'], data['kinds'], data['ids'],
+                _unpack(data['labels']), data['weights'], heavy, int(data['seq']),
+            )
+
+
+def popularity():
+    """
+    Units sold per product over the last ``AUTOCOMPLETE_POPULARITY_DAYS``.
+    """
+    since = timezone.localdate() - timedelta(days=AUTOCOMPLETE_POPULARITY_DAYS)
+    return dict(
+        VendorSalesRollup.objects.filter(day__gte=since)
+        .values_list('product_id').annotate(units=Sum('units_sold')).order_by()
+    )
+
+
+def database_objects(chunk_size=5000):
+    """
+    ``(kind, id, label, sku, weight)`` of the active products and
+    categories.
+    """
+    units = popularity()
+    category_weights = defaultdict(int)
+    products = Product.objects.filter(is_active=True).values_list('pk', 'name', 'sku', 'category_id')
+    for pk, name, sku, category_id in products.iterator(chunk_size=chunk_size):
+        category_weights[category_id] += units.get(pk, 0)
+        yield 'product', pk, name, sku, units.get(pk, 0)
+    for pk, name in Category.objects.filter(is_active=True).values_list('pk', 'name'):
+        yield 'category', pk, name, '', category_weights[pk]
+
+
+def build(path=None):
+    """
+    Rebuild the index from the database. Returns the number of terms.
+    """
+    # Changes published from here on are replayed over the new index.
+    seq = _cache().get(SEQ_KEY) or 0
+    index = AutocompleteIndex.from_objects(database_objects(), seq=seq)
+    index.save(path or AUTOCOMPLETE_INDEX_PATH)
+    return len(index.keys)
+
+
+def _cache():
+    return caches[AUTOCOMPLETE_CACHE_ALIAS]
+
+
+def note_changes(changes):
+    """
+    Publish ``(kind, id)`` pairs of changed objects to every process once
+    the current transaction commits.
+    """
+    changes = list(changes)
+    if changes:
+        transaction.on_commit(lambda: _publish(changes))
+
+
+def indexed_changes(kind, instances):
+    """
+    ``(kind, id)`` of the saved ``instances`` whose indexed columns differ
+    from the values they were loaded with, for ``note_changes``. Instances
+    not loaded from the database count as changed. The saved values become
+    the loaded ones, so saving again is only a change if they differ.
+    """
+    changes = []
+    for instance in instances:
+        loaded = getattr(instance, '_loaded_values', None)
+        saved = {field: getattr(instance, field) for field in INDEXED_FIELDS[kind]}
+        if loaded is None or any(field not in loaded or loaded[field] != value for field, value in saved.items()):
+            changes.append((kind, instance.pk))
+        instance._loaded_values = {**(loaded or {}), **saved}
+    return changes
+
+
+def _publish(changes):
+    cache = _cache()
+    cache.add(SEQ_KEY, 0, None)
+    last = cache.incr(SEQ_KEY, len(changes))
+    cache.set_many(
+        {f'autocomplete:change:{last - len(changes) + 1 + i}': change for i, change in enumerate(changes)},
+        CHANGE_TTL,
+    )
+
+
+class Autocomplete:
+    """
+    The loaded index plus the overlay of objects changed since it was
+    built, refreshed at most every ``AUTOCOMPLETE_REFRESH_SECONDS``.
+    """
+    def __init__(self, path=None):
+        self.path = path or AUTOCOMPLETE_INDEX_PATH
+        self.index = None
+        self.mtime = None
+        self.seen = 0
+        self.overlay = {}
+        self.excluded = frozenset()
+        self.checked_at = 0
+        self._lock = threading.Lock()
+    
+    def refresh(self, force=False):
+        with self._lock:
+            if not force and time.monotonic() - self.checked_at < AUTOCOMPLETE_REFRESH_SECONDS:
+                return
+            self.checked_at = time.monotonic()
+            mtime = os.path.getmtime(self.path) if os.path.exists(self.path) else None
+            if mtime != self.mtime:
+                self.index = AutocompleteIndex.load(self.path) if mtime else None
+                self.mtime = mtime
+                self.seen = self.index.seq if self.index else 0
+                self.overlay = {}
+                self.excluded = frozenset()
+            self._read_changes()
+    
+    def _read_changes(self):
+        cache = _cache()
+        seq = cache.get(SEQ_KEY) or 0
+        if seq < self.seen:
+            # The counter was lost; only the next build catches up.
+            self.seen = seq
+        start = max(self.seen, seq - MAX_PENDING_CHANGES)
+        changes = set(cache.get_many([f'autocomplete:change:{n}' for n in range(start + 1, seq + 1)]).values())
+        self.seen = seq
+        if not changes:
+            return
+        
+        overlay = dict(self.overlay)
+        ids = defaultdict(list)
+        for kind, pk in changes:
+            overlay[(kind, pk)] = None
+            ids[kind].append(pk)
+        rows = [
+            ('product', pk, name, sku) for pk, name, sku in
+            Product.objects.filter(pk__in=ids['product'], is_active=True).values_list('pk', 'name', 'sku')
+        ] + [
+            ('category', pk, name, '') for pk, name in
+            Category.objects.filter(pk__in=ids['category'], is_active=True).values_list('pk', 'name')
+        ]
+        for kind, pk, label, sku in rows:
+            base = self.index.find(kind, pk) if self.index else None
+            weight = self.index.weights[base] if base is not None else 0
+            overlay[(kind, pk)] = (terms_of(label, sku), weight, {'type': kind, 'id': pk, 'label': label})
+        
+        self.overlay = overlay
+        if self.index is not None:
+            found = (self.index.find(kind, pk) for kind, pk in overlay)
+            self.excluded = frozenset(index for index in found if index is not None)
+    
+    def search(self, query, limit=10):
+        """
+        The ``limit`` most popular products and categories with a word or
+        SKU starting with ``query``.
+        """
+        self.refresh()
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        index, overlay, excluded = self.index, self.overlay, self.excluded
+        
+        results = []
+        if index is not None:
+            for object_index in index.candidates(prefix):
+                if object_index not in excluded:
+                    results.append((index.weights[object_index], len(results), index.result(object_index)))
+                    if len(results) == limit:
+                        break
+        for entry in overlay.values():
+            if entry is not None and any(term.startswith(prefix) for term in entry[0]):
+                results.append((entry[1], len(results), entry[2]))
+        results.sort(key=lambda result: (-result[0], result[1]))
+        return [result for _, _, result in results[:limit]]
+
+
+autocomplete = Autocomplete()
@@ -0,0 +1,119 @@
+"""
+Facet counts for product listings.
+
+``facet_counts`` counts the products of a filtered queryset per category,
+price bucket and stock state in one aggregate query: a row per category
+with a conditional ``Count`` (``COUNT(*) FILTER (WHERE ...)``) per price
+bucket and stock state, which are then summed over the categories.
+
+``cached_facet_counts`` keeps the result per filter under a version
+that every product or category write replaces once it commits
+(``invalidate``). Stock reservations update rows without saving them,
+so the stock counts may lag by up to ``PRODUCT_FACETS_CACHE_TTL``.
+"""
+import hashlib
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, Q
+
+PRODUCT_FACET_PRICE_BUCKETS = getattr(settings, 'PRODUCT_FACET_PRICE_BUCKETS', [0, 25, 50, 100, 250, 500, 1000])
+PRODUCT_FACETS_CACHE_ALIAS = getattr(settings, 'PRODUCT_FACETS_CACHE_ALIAS', 'default')
+PRODUCT_FACETS_CACHE_TTL = getattr(settings, 'PRODUCT_FACETS_CACHE_TTL', 60)
+
+VERSION_KEY = 'product-facets:version'
+# Query parameters that change the page, not the set of products.
+IGNORED_PARAMS = {'page', 'page_size', 'ordering', 'fields', 'facets'}
+
+
+def price_buckets():
+    """
+    ``(key, min, max)`` of every price bucket; the last one is open-ended.
+    """
+    edges = [Decimal(str(edge)) for edge in PRODUCT_FACET_PRICE_BUCKETS]
+    return [
+        (f'{low}-{high}' if high is not None else f'{low}+', low, high)
+        for low, high in zip(edges, [*edges[1:], None])
+    ]
+
+
+def money(value):
+    """
+    Render a bucket bound as a decimal string, like ``price``.
+    """
+    return str(value.quantize(Decimal('0.01'))) if value is not None else None
+
+
+def facet_counts(queryset):
+    """
+    Counts per category, price bucket and stock state of ``queryset``.
+    """
+    buckets = price_buckets()
+    conditions = {
+        f'price_{i}': Q(price__gte=low) & (Q(price__lt=high) if high is not None else Q())
+        for i, (_, low, high) in enumerate(buckets)
+    }
+    conditions['price_none'] = Q(price__isnull=True)
+    conditions['in_stock'] = Q(stock_quantity__gt=0)
+    
+    rows = list(
+        queryset.order_by()
+        .values('category_id', 'category__name')
+        .annotate(total=Count('id'), **{name: Count('id', filter=q) for name, q in conditions.items()})
+    )
+    totals = {name: sum(row[name] for row in rows) for name in ['total', *conditions]}
+    
+    return {
+        'total': totals['total'],
+        'category': [
+            {'id': row['category_id'], 'name': row['category__name'], 'count': row['total']}
+            for row in sorted(rows, key=lambda row: (-row['total'], row['category__name']))
+        ],
+        'price': [
+            {'key': key, 'min': money(low), 'max': money(high), 'count': totals[f'price_{i}']}
+            for i, (key, low, high) in enumerate(buckets)
+        ] + [{'key': 'none', 'min': None, 'max': None, 'count': totals['price_none']}],
+        'in_stock': {'true': totals['in_stock'], 'false': totals['total'] - totals['in_stock']},
+    }
+
+
+def _cache():
+    return caches[PRODUCT_FACETS_CACHE_ALIAS]
+
+
+def current_version():
+    version = _cache().get(VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        _cache().set(VERSION_KEY, version, None)
+    return version
+
+
+def invalidate():
+    """
+    Retire every cached facet result once the current transaction commits.
+    """
+    transaction.on_commit(lambda: _cache().set(VERSION_KEY, time.time_ns(), None))
+
+
+def cache_key(params):
+    filters = sorted(
+        (name, value) for name in params if name not in IGNORED_PARAMS for value in params.getlist(name)
+    )
+    digest = hashlib.md5(repr(filters).encode()).hexdigest()
+    return f'product-facets:{current_version()}:{digest}'
+
+
+def cached_facet_counts(queryset, params):
+    """
+    ``facet_counts`` of the queryset the query ``params`` filtered down to.
+    """
+    key = cache_key(params)
+    counts = _cache().get(key)
+    if counts is None:
+        counts = facet_counts(queryset)
+        _cache().set(key, counts, PRODUCT_FACETS_CACHE_TTL)
+    return counts
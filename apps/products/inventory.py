@@ -0,0 +1,247 @@
+"""
+Stock reservations, with an optional sharded mode for hot products.
+
+By default a product's stock is ``Product.stock_quantity`` and every
+reservation is a guarded ``UPDATE`` of that row, so all checkouts of one
+product queue on its row lock. ``enable_sharding`` spreads the stock
+over ``STOCK_SHARDS`` ``StockShard`` rows instead: a reservation starts
+at a random shard and takes from the first one with enough stock, only
+locking several shards when no single one can cover it. Concurrent
+reservations then mostly touch different rows.
+
+For a sharded product ``stock_quantity`` is the aggregate the background
+``rebalance`` last wrote; ``available_stock`` reads the shard sum
+through a short per-process cache. Setting ``stock_quantity`` through
+``save()`` (``update_stock``, the admin, bulk updates) redistributes the
+new total over the shards.
+
+Reservations and releases add ``product.stock_reserved`` /
+``product.stock_released`` outbox events; aggregate refreshes go through
+``save()`` and add ``product.stock_changed`` as usual. Every change is
+also written to the stock ledger (``apps.products.ledger``).
+"""
+import random
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+
+from apps.core.cache import LocalTTLCache
+from apps.core.outbox import record_events
+from .ledger import movement, record_movements
+from .models import Product, StockShard
+from .streams import publish_stock_change
+
+STOCK_SHARDS = getattr(settings, 'STOCK_SHARDS', 8)
+
+_aggregates = LocalTTLCache(max_entries=10000, ttl=getattr(settings, 'STOCK_AGGREGATE_TTL', 2))
+
+
+def split(total, count):
+    """
+    Divide ``total`` into ``count`` near-equal parts.
+    """
+    base, extra = divmod(total, count)
+    return [base + (1 if i < extra else 0) for i in range(count)]
+
+
+def _locked_shards(product_id):
+    return list(StockShard.objects.select_for_update().filter(product_id=product_id).order_by('shard'))
+
+
+def _shard_count(product_id):
+    return Product.objects.filter(pk=product_id).values_list('stock_shard_count', flat=True).first()
+
+
+def _record(product_id, event_type, kind, delta, reference):
+    record_events([('product', product_id, event_type, {'id': product_id, 'quantity': abs(delta)})])
+    record_movements([movement(product_id, kind, delta, reference)])
+
+
+def enable_sharding(product, shards=None):
+    """
+    Move the product's stock into ``shards`` sub-counters.
+    """
+    shards = shards or STOCK_SHARDS
+    with transaction.atomic():
+        product = Product.objects.select_for_update().get(pk=product.pk)
+        if not product.stock_shard_count:
+            StockShard.objects.bulk_create([
+                StockShard(product=product, shard=shard, quantity=quantity)
+                for shard, quantity in enumerate(split(product.stock_quantity, shards))
+            ])
+            Product.objects.filter(pk=product.pk).update(stock_shard_count=shards)
+            product.stock_shard_count = shards
+    _aggregates.delete(product.pk)
+    return product
+
+
+def disable_sharding(product):
+    """
+    Fold the shards back into ``stock_quantity``.
+    """
+    with transaction.atomic():
+        product = Product.objects.select_for_update().get(pk=product.pk)
+        if product.stock_shard_count:
+            total = sum(shard.quantity for shard in _locked_shards(product.pk))
+            StockShard.objects.filter(product=product).delete()
+            product.stock_quantity = total
+            product.stock_shard_count = 0
+            product._stock_aggregated = True
+            product.save(update_fields=['stock_quantity', 'stock_shard_count', 'updated_at'])
+    _aggregates.delete(product.pk)
+    return product
+
+
+def set_shard_total(product_id, total):
+    """
+    Redistribute a sharded product's shards so they hold ``total``.
+    Returns what they held before.
+    """
+    with transaction.atomic():
+        shards = _locked_shards(product_id)
+        previous = sum(shard.quantity for shard in shards)
+        for shard, quantity in zip(shards, split(total, len(shards))):
+            shard.quantity = quantity
+        StockShard.objects.bulk_update(shards, ['quantity'])
+    _aggregates.delete(product_id)
+    return previous
+
+
+def apply_stock_level(product, previous):
+    """
+    Handle ``product.stock_quantity`` having been set directly, from
+    ``previous``: redistribute the shards of a sharded product and return
+    the ledger movement (unsaved, or None if nothing changed).
+    
+    The movement kind is ``product._stock_movement_kind`` if set, else a
+    restock or an adjustment.
+    """
+    if product.stock_shard_count:
+        previous = set_shard_total(product.pk, product.stock_quantity)
+    delta = product.stock_quantity - previous
+    if not delta:
+        return None
+    kind = getattr(product, '_stock_movement_kind', None) or ('restock' if delta > 0 else 'adjustment')
+    return movement(product.pk, kind, delta)
+
+
+def reserve(product_id, quantity, kind='reservation', reference=''):
+    """
+    Take ``quantity`` units of stock. Returns False if there is not enough.
+    """
+    with transaction.atomic():
+        shard_count = _shard_count(product_id)
+        if shard_count is None:
+            return False
+        
+        if not shard_count:
+            reserved = Product.objects.filter(
+                pk=product_id, stock_shard_count=0, stock_quantity__gte=quantity
+            ).update(stock_quantity=F('stock_quantity') - quantity)
+            if reserved:
+                _record(product_id, 'product.stock_reserved', kind, -quantity, reference)
+                transaction.on_commit(lambda: _push_stock(product_id))
+                return True
+        else:
+            reserved = _reserve_from_shards(product_id, shard_count, quantity)
+            if reserved:
+                _record(product_id, 'product.stock_reserved', kind, -quantity, reference)
+                return True
+    
+    if _shard_count(product_id) != shard_count:
+        # Sharding was switched on or off meanwhile.
+        return reserve(product_id, quantity, kind, reference)
+    return False
+
+
+def _reserve_from_shards(product_id, shard_count, quantity):
+    start = random.randrange(shard_count)
+    for offset in range(shard_count):
+        taken = StockShard.objects.filter(
+            product_id=product_id, shard=(start + offset) % shard_count, quantity__gte=quantity
+        ).update(quantity=F('quantity') - quantity)
+        if taken:
+            return True
+    
+    # No single shard holds enough: take from several, locked in shard order.
+    shards = _locked_shards(product_id)
+    if sum(shard.quantity for shard in shards) < quantity:
+        return False
+    remaining = quantity
+    for shard in sorted(shards, key=lambda shard: -shard.quantity):
+        take = min(shard.quantity, remaining)
+        shard.quantity -= take
+        remaining -= take
+        if not remaining:
+            break
+    StockShard.objects.bulk_update(shards, ['quantity'])
+    return True
+
+
+def release(product_id, quantity, kind='release', reference=''):
+    """
+    Put ``quantity`` units back, e.g. for a cancelled order.
+    """
+    with transaction.atomic():
+        shard_count = _shard_count(product_id)
+        if shard_count:
+            StockShard.objects.filter(
+                product_id=product_id, shard=random.randrange(shard_count)
+            ).update(quantity=F('quantity') + quantity)
+        else:
+            Product.objects.filter(pk=product_id).update(stock_quantity=F('stock_quantity') + quantity)
+            transaction.on_commit(lambda: _push_stock(product_id))
+        _record(product_id, 'product.stock_released', kind, quantity, reference)
+
+
+def _push_stock(product_id):
+    product = Product.objects.filter(pk=product_id).only('pk', 'stock_quantity').first()
+    if product is not None:
+        publish_stock_change(product)
+
+
+def available_stock(product_id):
+    """
+    Current stock; for sharded products at most ``STOCK_AGGREGATE_TTL``
+    seconds old.
+    """
+    row = Product.objects.filter(pk=product_id).values('stock_quantity', 'stock_shard_count').first()
+    if row is None:
+        return 0
+    if not row['stock_shard_count']:
+        return row['stock_quantity']
+    
+    total = _aggregates.get(product_id)
+    if total is None:
+        total = StockShard.objects.filter(product_id=product_id).aggregate(total=Sum('quantity'))['total'] or 0
+        _aggregates.set(product_id, total)
+    return total
+
+
+def rebalance(product_id):
+    """
+    Even out a sharded product's shards and refresh ``stock_quantity``.
+    """
+    with transaction.atomic():
+        shards = _locked_shards(product_id)
+        if not shards:
+            return
+        total = sum(shard.quantity for shard in shards)
+        for shard, quantity in zip(shards, split(total, len(shards))):
+            shard.quantity = quantity
+        StockShard.objects.bulk_update(shards, ['quantity'])
+        
+        product = Product.objects.get(pk=product_id)
+        if product.stock_quantity != total:
+            product.stock_quantity = total
+            product._stock_aggregated = True
+            product.save(update_fields=['stock_quantity', 'updated_at'])
+    _aggregates.set(product_id, total)
+
+
+def rebalance_all():
+    product_ids = list(Product.objects.filter(stock_shard_count__gt=0).values_list('pk', flat=True))
+    for product_id in product_ids:
+        rebalance(product_id)
+    return len(product_ids)
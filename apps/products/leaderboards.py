@@ -0,0 +1,315 @@
+"""
+Bestseller and trending leaderboards per category.
+
+``Leaderboards.consume`` reads order placement events
+(``order_item.created``) from the outbox change feed, resuming at the
+cursor it stopped at, and adds the units sold to two boards for the
+product's category and two for the whole catalog (``ALL``):
+
+* ``bestsellers`` - units sold in the last ``LEADERBOARD_WINDOW_HOURS``.
+  Sales are kept in hourly buckets and a bucket sliding out of the
+  window is subtracted again.
+* ``trending`` - units sold with exponential decay, halving every
+  ``LEADERBOARD_HALF_LIFE_HOURS``. Scores are kept relative to ``base``:
+  a sale at ``t`` adds ``units * 2 ** ((t - base) / half_life)``, so
+  nothing has to be decayed in place. ``base`` only moves forward, and
+  all scores are scaled down, once that factor grows large.
+
+Each board is a ``RankedBoard``, which keeps its products sorted by
+score, so the top N is a slice. After every run the state is saved to
+``LEADERBOARD_SNAPSHOT_PATH``, which a restarted updater resumes from,
+and the top ``LEADERBOARD_SIZE`` of every board is published to the
+cache that ``top`` reads.
+
+Cancellations and edited order lines are not subtracted; ``rebuild``
+recounts the window from the order items of orders not cancelled.
+"""
+import json
+import os
+import time
+from bisect import bisect_left, insort
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+
+from apps.core.cache import TieredCache
+from apps.core.models import OutboxEvent
+from apps.core.outbox import change_feed
+from apps.orders.models import OrderItem
+from .models import Product
+
+LEADERBOARD_SNAPSHOT_PATH = getattr(
+    settings, 'LEADERBOARD_SNAPSHOT_PATH', os.path.join(settings.BASE_DIR, 'var', 'leaderboards.json')
+)
+LEADERBOARD_WINDOW_HOURS = getattr(settings, 'LEADERBOARD_WINDOW_HOURS', 7 * 24)
+LEADERBOARD_HALF_LIFE_HOURS = getattr(settings, 'LEADERBOARD_HALF_LIFE_HOURS', 6)
+LEADERBOARD_SIZE = getattr(settings, 'LEADERBOARD_SIZE', 100)
+LEADERBOARD_BATCH_SIZE = getattr(settings, 'LEADERBOARD_BATCH_SIZE', 1000)
+
+BOARDS = ['bestsellers', 'trending']
+ALL = 'all'
+BUCKET_SECONDS = 3600
+# Scores are rescaled once they carry a factor above 2 ** REBASE_HALF_LIVES,
+# and trending products whose current score drops below MIN_TRENDING leave
+# the board.
+REBASE_HALF_LIVES = 20
+MIN_TRENDING = 0.01
+
+published = TieredCache(
+    'leaderboard',
+    max_entries=1000,
+    local_ttl=getattr(settings, 'LEADERBOARD_LOCAL_TTL', 10),
+    shared_alias=getattr(settings, 'LEADERBOARD_CACHE_ALIAS', 'default'),
+    shared_ttl=getattr(settings, 'LEADERBOARD_CACHE_TTL', 600),
+)
+
+
+def board_key(board, category=ALL):
+    return f'{board}:{category}'
+
+
+class RankedBoard:
+    """
+    Scores by product, with ``(-score, product_id)`` pairs kept sorted so
+    the best products come first.
+    """
+    def __init__(self, scores=None):
+        self.scores = dict(scores or {})
+        self.ranked = sorted((-score, product_id) for product_id, score in self.scores.items())
+    
+    def add(self, product_id, amount, floor=0):
+        """
+        Add ``amount`` to the product's score; products at or below
+        ``floor`` are dropped.
+        """
+        old = self.scores.get(product_id)
+        if old is not None:
+            del self.ranked[bisect_left(self.ranked, (-old, product_id))]
+        score = (old or 0) + amount
+        if score > floor:
+            self.scores[product_id] = score
+            insort(self.ranked, (-score, product_id))
+        else:
+            self.scores.pop(product_id, None)
+    
+    def scale(self, factor, floor=0):
+        self.__init__({
+            product_id: score * factor for product_id, score in self.scores.items() if score * factor > floor
+        })
+    
+    def top(self, n):
+        return [(product_id, -score) for score, product_id in self.ranked[:n]]
+    
+    def __len__(self):
+        return len(self.scores)
+
+
+class Leaderboards:
+    """
+    The updater's state, saved at ``path``.
+    """
+    def __init__(self, path=None, load=True):
+        self.path = path or LEADERBOARD_SNAPSHOT_PATH
+        self.cursor = 0
+        self.base = time.time()
+        self.buckets = {}
+        self.categories = {}
+        self.boards = {}
+        if load and os.path.exists(self.path):
+            with open(self.path) as f:
+                self._restore(json.load(f))
+    
+    @property
+    def half_life(self):
+        return LEADERBOARD_HALF_LIFE_HOURS * 3600
+    
+    def board(self, board, category=ALL):
+        key = board_key(board, category)
+        if key not in self.boards:
+            self.boards[key] = RankedBoard()
+        return self.boards[key]
+    
+    def _restore(self, state):
+        self.cursor = state['cursor']
+        self.base = state['base']
+        self.categories = {int(product_id): category for product_id, category in state['categories'].items()}
+        for hour, sales in state['buckets'].items():
+            self.buckets[int(hour)] = {int(product_id): units for product_id, units in sales.items()}
+            for product_id, units in self.buckets[int(hour)].items():
+                self._add_bestseller(product_id, units)
+        for key, scores in state['trending'].items():
+            self.boards[key] = RankedBoard({int(product_id): score for product_id, score in scores.items()})
+    
+    def save(self):
+        state = {
+            'cursor': self.cursor,
+            'base': self.base,
+            'categories': self.categories,
+            'buckets': self.buckets,
+            'trending': {
+                key: board.scores for key, board in self.boards.items() if key.startswith('trending:')
+            },
+        }
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + '.tmp', 'w') as f:
+            json.dump(state, f)
+        os.replace(self.path + '.tmp', self.path)
+    
+    def _add_bestseller(self, product_id, units):
+        for category in (self.categories[product_id], ALL):
+            self.board('bestsellers', category).add(product_id, units)
+    
+    def add_sale(self, product_id, units, at, now=None):
+        """
+        Count ``units`` of the product sold at ``at`` (epoch seconds).
+        The product's category must be in ``categories``.
+        """
+        now = time.time() if now is None else now
+        hour = int(at // BUCKET_SECONDS)
+        if hour > self.oldest_hour(now):
+            sales = self.buckets.setdefault(hour, {})
+            sales[product_id] = sales.get(product_id, 0) + units
+            self._add_bestseller(product_id, units)
+        
+        weight = units * 2 ** ((at - self.base) / self.half_life)
+        for category in (self.categories[product_id], ALL):
+            self.board('trending', category).add(product_id, weight)
+    
+    def oldest_hour(self, now):
+        """
+        The last bucket just outside the window.
+        """
+        return int(now // BUCKET_SECONDS) - LEADERBOARD_WINDOW_HOURS
+    
+    def expire(self, now=None):
+        """
+        Drop bestseller buckets that slid out of the window and rescale
+        trending scores once due.
+        """
+        now = time.time() if now is None else now
+        for hour in sorted(self.buckets):
+            if hour > self.oldest_hour(now):
+                break
+            for product_id, units in self.buckets.pop(hour).items():
+                self._add_bestseller(product_id, -units)
+        
+        if now - self.base > REBASE_HALF_LIVES * self.half_life:
+            factor = 2 ** ((self.base - now) / self.half_life)
+            for key, board in self.boards.items():
+                if key.startswith('trending:'):
+                    board.scale(factor, MIN_TRENDING)
+            self.base = now
+    
+    def _load_categories(self, product_ids):
+        missing = set(product_ids) - set(self.categories)
+        if missing:
+            self.categories.update(Product.objects.filter(pk__in=missing).values_list('pk', 'category_id'))
+    
+    def consume(self, batch_size=LEADERBOARD_BATCH_SIZE):
+        """
+        Count the order lines placed since the cursor. Returns how many
+        were counted.
+        """
+        counted = 0
+        while True:
+            events = change_feed(self.cursor, batch_size, aggregate_type='order')
+            sales = [
+                (event.payload['product_id'], event.payload['quantity'], event.created_at.timestamp())
+                for event in events
+                if event.event_type == 'order_item.created'
+            ]
+            self._load_categories(product_id for product_id, _, _ in sales)
+            now = time.time()
+            for product_id, units, at in sales:
+                if product_id in self.categories:
+                    self.add_sale(product_id, units, at, now)
+                    counted += 1
+            if events:
+                self.cursor = events[-1].pk
+            if len(events) < batch_size:
+                return counted
+    
+    def current_scores(self, board, category=ALL, n=LEADERBOARD_SIZE, now=None):
+        """
+        The top ``n`` of a board as ``(product_id, score)``, with trending
+        scores decayed to ``now``.
+        """
+        top = self.board(board, category).top(n)
+        if board != 'trending':
+            return top
+        now = time.time() if now is None else now
+        factor = 2 ** ((self.base - now) / self.half_life)
+        return [(product_id, round(score * factor, 4)) for product_id, score in top]
+    
+    def publish(self):
+        """
+        Put the top ``LEADERBOARD_SIZE`` of every board in the cache.
+        """
+        updated_at = datetime.now(dt_timezone.utc)
+        for key in list(self.boards):
+            board, category = key.split(':')
+            category = category if category == ALL else int(category)
+            published.set(key, {
+                'updated_at': updated_at,
+                'results': self.current_scores(board, category, now=updated_at.timestamp()),
+            })
+
+
+def update(path=None):
+    """
+    Fold new order lines into the leaderboards, save and publish them.
+    Returns how many order lines were counted.
+    """
+    leaderboards = Leaderboards(path)
+    leaderboards.expire()
+    counted = leaderboards.consume()
+    leaderboards.save()
+    leaderboards.publish()
+    return counted
+
+
+def rebuild(path=None, chunk_size=LEADERBOARD_BATCH_SIZE):
+    """
+    Recount the leaderboards from the order items of the window and
+    continue from the latest outbox event. Returns how many order lines
+    were counted.
+    """
+    leaderboards = Leaderboards(path, load=False)
+    now = time.time()
+    counted = 0
+    latest = OutboxEvent.objects.order_by('-pk').values('pk', 'created_at').first()
+    if latest is not None:
+        leaderboards.cursor = latest['pk']
+        items = (
+            OrderItem.objects.filter(
+                created_at__gt=datetime.fromtimestamp(
+                    (leaderboards.oldest_hour(now) + 1) * BUCKET_SECONDS, dt_timezone.utc
+                ),
+                created_at__lte=latest['created_at'],
+            )
+            .exclude(order__status='cancelled')
+            .values_list('product_id', 'product__category_id', 'quantity', 'created_at')
+        )
+        for product_id, category_id, units, created_at in items.iterator(chunk_size=chunk_size):
+            leaderboards.categories[product_id] = category_id
+            leaderboards.add_sale(product_id, units, created_at.timestamp(), now)
+            counted += 1
+    
+    leaderboards.save()
+    leaderboards.publish()
+    return counted
+
+
+def top(board, category=ALL, limit=20):
+    """
+    The published top ``limit`` of a board, ``{'updated_at', 'results'}``,
+    falling back to the saved snapshot when the cache has none.
+    """
+    key = board_key(board, category)
+    entry = published.get(key)
+    if entry is None:
+        Leaderboards().publish()
+        # A board that does not exist yet is not cached, so it shows up
+        # as soon as an update or rebuild publishes it.
+        entry = published.get(key) or {'updated_at': None, 'results': []}
+    return {'updated_at': entry['updated_at'], 'results': entry['results'][:limit]}
@@ -0,0 +1,141 @@
+"""
+Append-only stock movement ledger.
+
+Every change to a product's stock adds a ``StockMovement`` with the
+signed quantity: reservations, sales and releases from
+``apps.products.inventory``, and stock levels set directly (update
+endpoint, admin, bulk updates, external syncs) as the difference to the
+previous level. Movements are only ever inserted, with ``bulk_create``.
+
+``take_snapshots`` periodically stores each product's ledger balance in
+a ``StockSnapshot``, so the stock at any time is the latest snapshot
+before it plus the movements after that snapshot: two indexed range
+reads on ``(product, taken_at)`` and ``(product, created_at)``.
+
+``find_drift``/``reconcile`` compare the ledger with the actual stock in
+chunks. Products that existed before the ledger start out drifted; the
+first ``reconcile(fix=True)`` records their opening balances.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import DateTimeField, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.core.bulk import chunked
+from .models import Product, StockMovement, StockShard, StockSnapshot
+
+STOCK_LEDGER_BATCH_SIZE = getattr(settings, 'STOCK_LEDGER_BATCH_SIZE', 1000)
+STOCK_SNAPSHOT_SETTLE_SECONDS = getattr(settings, 'STOCK_SNAPSHOT_SETTLE_SECONDS', 60)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def movement(product_id, kind, quantity, reference=''):
+    return StockMovement(product_id=product_id, kind=kind, quantity=quantity, reference=reference)
+
+
+def record_movements(movements):
+    """
+    Insert unsaved ``StockMovement`` objects, skipping zero quantities.
+    """
+    movements = [m for m in movements if m is not None and m.quantity]
+    if movements:
+        StockMovement.objects.bulk_create(movements, batch_size=STOCK_LEDGER_BATCH_SIZE)
+
+
+def ledger_rows(product_ids, at=None):
+    """
+    Annotate the products with their latest snapshot before ``at``, the
+    movements after it, and their actual stock, all in one query.
+    """
+    snapshots = StockSnapshot.objects.filter(product_id=OuterRef('pk')).order_by('-taken_at')
+    movements = StockMovement.objects.filter(product_id=OuterRef('pk'), created_at__gt=OuterRef('snapshot_at'))
+    if at is not None:
+        snapshots = snapshots.filter(taken_at__lte=at)
+        movements = movements.filter(created_at__lte=at)
+    shard_total = (
+        StockShard.objects.filter(product_id=OuterRef('pk'))
+        .values('product_id').annotate(total=Sum('quantity')).values('total')
+    )
+    moved = movements.values('product_id').annotate(total=Sum('quantity')).values('total')
+    
+    return (
+        Product.objects.filter(pk__in=product_ids)
+        .annotate(
+            snapshot_at=Coalesce(
+                Subquery(snapshots.values('taken_at')[:1]), Value(EPOCH), output_field=DateTimeField()
+            ),
+            snapshot_quantity=Coalesce(Subquery(snapshots.values('quantity')[:1]), 0),
+            moved=Coalesce(Subquery(moved, output_field=IntegerField()), 0),
+            shard_total=Coalesce(Subquery(shard_total, output_field=IntegerField()), 0),
+        )
+        .order_by()
+        .values('pk', 'stock_quantity', 'stock_shard_count', 'shard_total', 'snapshot_quantity', 'moved')
+    )
+
+
+def stock_at(product_id, at):
+    """
+    Stock of the product at ``at`` according to the ledger.
+    """
+    row = ledger_rows([product_id], at=at).first()
+    return row['snapshot_quantity'] + row['moved'] if row else 0
+
+
+def movements_since_snapshot(product_id):
+    snapshot = StockSnapshot.objects.filter(product_id=product_id).order_by('-taken_at').first()
+    movements = StockMovement.objects.filter(product_id=product_id).order_by('created_at', 'id')
+    if snapshot is not None:
+        movements = movements.filter(created_at__gt=snapshot.taken_at)
+    return movements
+
+
+def product_ids(chunk_size):
+    return Product.objects.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=chunk_size)
+
+
+def take_snapshots(chunk_size=2000):
+    """
+    Snapshot every product with movements since its last snapshot.
+    
+    Movements younger than ``STOCK_SNAPSHOT_SETTLE_SECONDS`` are left for
+    the next run, since a transaction still in flight may yet commit one
+    with an earlier ``created_at``.
+    """
+    taken_at = timezone.now() - timedelta(seconds=STOCK_SNAPSHOT_SETTLE_SECONDS)
+    taken = 0
+    for chunk in chunked(product_ids(chunk_size), chunk_size):
+        snapshots = [
+            StockSnapshot(product_id=row['pk'], quantity=row['snapshot_quantity'] + row['moved'], taken_at=taken_at)
+            for row in ledger_rows(chunk, at=taken_at)
+            if row['moved']
+        ]
+        StockSnapshot.objects.bulk_create(snapshots, batch_size=STOCK_LEDGER_BATCH_SIZE)
+        taken += len(snapshots)
+    return taken
+
+
+def find_drift(chunk_size=2000):
+    """
+    Yield ``(product_id, stock, ledger_balance)`` for every product whose
+    stock disagrees with its ledger, ``chunk_size`` products at a time.
+    """
+    for chunk in chunked(product_ids(chunk_size), chunk_size):
+        for row in ledger_rows(chunk):
+            stock = row['shard_total'] if row['stock_shard_count'] else row['stock_quantity']
+            balance = row['snapshot_quantity'] + row['moved']
+            if stock != balance:
+                yield row['pk'], stock, balance
+
+
+def reconcile(fix=False, chunk_size=2000):
+    """
+    Return the drifted products; with ``fix``, record a reconciliation
+    movement bringing each ledger in line with the actual stock.
+    """
+    drift = list(find_drift(chunk_size))
+    if fix:
+        record_movements(movement(pk, 'reconciliation', stock - balance) for pk, stock, balance in drift)
+    return drift
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.products.autocomplete import build
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product and category typeahead index.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--path', help='Index file (default AUTOCOMPLETE_INDEX_PATH).')
+    
+    def handle(self, *args, **options):
+        terms = build(path=options['path'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {terms} terms.'))
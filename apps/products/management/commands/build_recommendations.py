@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.products.recommendations import CO_OCCURRENCE_TOP_K, update
+
+
+class Command(BaseCommand):
+    help = 'Fold new orders into the product co-occurrence matrix and refresh "frequently bought together".'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='Recount all orders from scratch.')
+        parser.add_argument('--path', help='Matrix file (default CO_OCCURRENCE_PATH).')
+        parser.add_argument('--top-k', type=int, default=CO_OCCURRENCE_TOP_K)
+    
+    def handle(self, *args, **options):
+        if options['top_k'] < 1:
+            raise CommandError('--top-k must be at least 1.')
+        
+        refreshed = update(rebuild=options['rebuild'], path=options['path'], k=options['top_k'])
+        self.stdout.write(self.style.SUCCESS(f'Refreshed the neighbours of {refreshed} products.'))
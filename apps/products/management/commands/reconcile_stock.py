@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.products.ledger import reconcile, take_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Compare product stock with the stock movement ledger.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Record reconciliation movements for drifted products.')
+        parser.add_argument('--snapshot', action='store_true', help='Take stock snapshots afterwards.')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+    
+    def handle(self, *args, **options):
+        drift = reconcile(fix=options['fix'], chunk_size=options['chunk_size'])
+        for product_id, stock, balance in drift:
+            self.stdout.write(f'Product({product_id}): stock {stock}, ledger {balance}')
+        
+        if options['snapshot']:
+            count = take_snapshots(chunk_size=options['chunk_size'])
+            self.stdout.write(f'Took {count} snapshots.')
+        
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('No stock drift.'))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'Reconciled {len(drift)} products.'))
+        else:
+            raise CommandError(f'{len(drift)} products drifted; run with --fix to record the differences.')
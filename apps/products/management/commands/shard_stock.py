@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.products.inventory import STOCK_SHARDS, disable_sharding, enable_sharding, rebalance_all
+from apps.products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Switch products to sharded stock counters, back again, or rebalance their shards.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('skus', nargs='*')
+        parser.add_argument('--shards', type=int, default=STOCK_SHARDS)
+        parser.add_argument('--disable', action='store_true', help='Fold the shards back into stock_quantity.')
+        parser.add_argument('--rebalance', action='store_true', help='Rebalance every sharded product.')
+    
+    def handle(self, *args, **options):
+        if options['rebalance']:
+            count = rebalance_all()
+            self.stdout.write(self.style.SUCCESS(f'Rebalanced {count} products.'))
+            return
+        
+        if not options['skus']:
+            raise CommandError('Give the SKUs to shard, or --rebalance.')
+        if options['shards'] < 1:
+            raise CommandError('--shards must be at least 1.')
+        
+        products = list(Product.objects.filter(sku__in=options['skus']))
+        missing = set(options['skus']) - {product.sku for product in products}
+        if missing:
+            raise CommandError(f'Unknown SKUs: {", ".join(sorted(missing))}')
+        
+        for product in products:
+            if options['disable']:
+                product = disable_sharding(product)
+                self.stdout.write(f'{product.sku}: unsharded, stock {product.stock_quantity}')
+            else:
+                product = enable_sharding(product, options['shards'])
+                self.stdout.write(f'{product.sku}: {product.stock_shard_count} shards, stock {product.stock_quantity}')
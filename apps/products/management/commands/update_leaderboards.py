@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from apps.products.leaderboards import rebuild, update
+
+
+class Command(BaseCommand):
+    help = 'Fold new order lines into the bestseller and trending leaderboards.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='Recount the window from the order items.')
+        parser.add_argument('--path', help='Snapshot file (default LEADERBOARD_SNAPSHOT_PATH).')
+    
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            counted = rebuild(path=options['path'])
+        else:
+            counted = update(path=options['path'])
+        self.stdout.write(self.style.SUCCESS(f'Counted {counted} order lines.'))
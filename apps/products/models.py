@@ -3,6 +3,9 @@ from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.auth import get_user_model
 from decimal import Decimal
 
+from apps.core.identifiers import skus
+from apps.core.models import OutboxModel
+
 User = get_user_model()
 
 
@@ -21,9 +24,17 @@ class Category(models.Model):
         verbose_name = 'Category'
         verbose_name_plural = 'Categories'
         ordering = ['name']
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets the autocomplete signal handler skip saves that leave the
+        # name and visibility alone.
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
 
 
-class Product(models.Model):
+class Product(OutboxModel):
     """
     Product model.
     """
@@ -36,14 +47,40 @@ class Product(models.Model):
     image = models.ImageField(upload_to='products/', blank=True)
     
     stock_quantity = models.PositiveIntegerField(default=0)
+    # 0 keeps the stock in stock_quantity; otherwise it lives in that many
+    # StockShard rows and stock_quantity is their last aggregated total.
+    stock_shard_count = models.PositiveSmallIntegerField(default=0, editable=False)
     sku = models.CharField(max_length=50, unique=True, blank=True)
     
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    outbox_aggregate_type = 'product'
+    outbox_event_prefix = 'product'
+    outbox_fields = [
+        'id', 'sku', 'name', 'price', 'category_id', 'vendor_id',
+        'stock_quantity', 'is_active', 'updated_at'
+    ]
+    
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Covers the facet counts (apps.products.facets).
+            models.Index(fields=['category', 'price', 'stock_quantity'], name='product_facets_idx'),
+        ]
+    
+    def outbox_events(self, action, previous):
+        events = super().outbox_events(action, previous)
+        old_stock = previous.get('stock_quantity', self.stock_quantity)
+        if action == 'updated' and old_stock != self.stock_quantity:
+            events.append(('product.stock_changed', {
+                'id': self.pk,
+                'sku': self.sku,
+                'previous_stock_quantity': old_stock,
+                'stock_quantity': self.stock_quantity,
+            }))
+        return events
     
     def get_vendor_name(self):
         return self.vendor.get_full_name()
@@ -55,10 +92,94 @@ class Product(models.Model):
     
     def save(self, *args, **kwargs):
         if not self.sku:
-            self.sku = f"SKU-{self.id or 'NEW'}-{self.name[:5].upper()}"
+            self.sku = skus.next()
         super().save(*args, **kwargs)
 
 
+class StockShard(models.Model):
+    """
+    One of the sub-counters holding the stock of a sharded product.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_shards')
+    shard = models.PositiveSmallIntegerField()
+    quantity = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['product', 'shard']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'shard'], name='unique_product_stock_shard'),
+        ]
+    
+    def __str__(self):
+        return f'{self.product_id}#{self.shard}: {self.quantity}'
+
+
+class StockMovement(models.Model):
+    """
+    Append-only record of one change to a product's stock.
+    """
+    KIND_CHOICES = [
+        ('reservation', 'Reservation'),
+        ('release', 'Release'),
+        ('sale', 'Sale'),
+        ('restock', 'Restock'),
+        ('adjustment', 'Adjustment'),
+        ('sync', 'External sync'),
+        ('reconciliation', 'Reconciliation'),
+    ]
+    
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_movements')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    # Signed change in units: negative takes stock, positive adds it.
+    quantity = models.IntegerField()
+    reference = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['product', 'created_at'], name='stock_movement_product_idx'),
+        ]
+    
+    def __str__(self):
+        return f'{self.product_id} {self.kind} {self.quantity:+d}'
+
+
+class StockSnapshot(models.Model):
+    """
+    Ledger balance of a product: its movements up to ``taken_at`` summed.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_snapshots')
+    quantity = models.IntegerField()
+    taken_at = models.DateTimeField()
+    
+    class Meta:
+        ordering = ['-taken_at']
+        indexes = [
+            models.Index(fields=['product', 'taken_at'], name='stock_snapshot_product_idx'),
+        ]
+    
+    def __str__(self):
+        return f'{self.product_id} @ {self.taken_at}: {self.quantity}'
+
+
+class ProductNeighbors(models.Model):
+    """
+    Products most often bought together with ``product``, best first, as
+    ``[neighbor_id, orders_together, score]`` triples. See
+    ``apps.products.recommendations``.
+    """
+    product = models.OneToOneField(
+        Product, on_delete=models.CASCADE, primary_key=True, related_name='neighbors'
+    )
+    neighbors = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Product neighbors'
+        verbose_name_plural = 'Product neighbors'
+
+
 class ProductReview(models.Model):
     """
     Product review model.
@@ -0,0 +1,207 @@
+"""
+"Frequently bought together" from product co-occurrence in orders.
+
+``update`` reads order lines in chunks of ``CO_OCCURRENCE_CHUNK_ORDERS``
+orders and counts, for every pair of products, the orders containing
+both. The counts form a sparse symmetric matrix kept in COO form: one
+sorted ``int64`` key per non-zero cell (``row << 32 | column``) and its
+count, with the diagonal holding each product's own order count. The
+matrix and the last order folded in are saved to ``CO_OCCURRENCE_PATH``,
+so later runs only read orders placed since.
+
+After each run the products whose rows changed get their top
+``CO_OCCURRENCE_TOP_K`` neighbours rewritten into ``ProductNeighbors``,
+ranked by cosine similarity, ``together / sqrt(orders_a * orders_b)``,
+which keeps best sellers from topping every list.
+
+Orders are folded in once, ``CO_OCCURRENCE_SETTLE_MINUTES`` after they
+were placed; cancellations and later edits only show up after a
+``rebuild``. Orders with more than ``CO_OCCURRENCE_MAX_ORDER_LINES``
+distinct products are skipped as they say little about affinity and
+cost quadratically many pairs.
+"""
+import os
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from apps.orders.models import Order, OrderItem
+from .models import ProductNeighbors
+
+CO_OCCURRENCE_PATH = getattr(
+    settings, 'CO_OCCURRENCE_PATH', os.path.join(settings.BASE_DIR, 'var', 'co_occurrence.npz')
+)
+CO_OCCURRENCE_TOP_K = getattr(settings, 'CO_OCCURRENCE_TOP_K', 20)
+CO_OCCURRENCE_CHUNK_ORDERS = getattr(settings, 'CO_OCCURRENCE_CHUNK_ORDERS', 10000)
+CO_OCCURRENCE_MAX_ORDER_LINES = getattr(settings, 'CO_OCCURRENCE_MAX_ORDER_LINES', 50)
+CO_OCCURRENCE_SETTLE_MINUTES = getattr(settings, 'CO_OCCURRENCE_SETTLE_MINUTES', 60)
+
+SHIFT = 32
+MERGE_ENTRIES = 10000000
+
+
+def order_pairs(order_ids, product_ids):
+    """
+    Keys of every ordered product pair (including each product with
+    itself) within each order.
+    """
+    order_ids, product_ids = np.unique(np.stack([order_ids, product_ids]), axis=1)
+    starts = np.flatnonzero(np.r_[True, order_ids[1:] != order_ids[:-1]]) if len(order_ids) else order_ids
+    sizes = np.diff(np.r_[starts, len(order_ids)])
+    keep = np.repeat(sizes <= CO_OCCURRENCE_MAX_ORDER_LINES, sizes)
+    starts, sizes = np.repeat(starts, sizes)[keep], np.repeat(sizes, sizes)[keep]
+    rows = np.flatnonzero(keep)
+    
+    # Each line pairs with all lines of its order, itself included.
+    left = np.repeat(rows, sizes)
+    offsets = np.arange(len(left)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    right = np.repeat(starts, sizes) + offsets
+    return (product_ids[left] << SHIFT) | product_ids[right]
+
+
+def count_keys(keys, counts=None):
+    """
+    Sum ``counts`` (default 1 each) per distinct key, returning sorted
+    keys and their totals.
+    """
+    if not len(keys):
+        return keys.astype(np.int64), np.empty(0, dtype=np.int64)
+    counts = np.ones(len(keys), dtype=np.int64) if counts is None else counts
+    order = np.argsort(keys, kind='stable')
+    keys, counts = keys[order], counts[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    return keys[starts], np.add.reduceat(counts, starts)
+
+
+class CoOccurrenceMatrix:
+    """
+    The sparse co-occurrence counts saved at ``path``.
+    """
+    def __init__(self, path=None, load=True):
+        self.path = path or CO_OCCURRENCE_PATH
+        self.keys = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.last_order_id = 0
+        if load and os.path.exists(self.path):
+            with np.load(self.path) as data:
+                self.keys, self.counts = data['keys'], data['counts']
+                self.last_order_id = int(data['last_order_id'])
+    
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + '.tmp', 'wb') as f:
+            np.savez(f, keys=self.keys, counts=self.counts, last_order_id=self.last_order_id)
+        os.replace(self.path + '.tmp', self.path)
+    
+    def add(self, keys, counts):
+        self.keys, self.counts = count_keys(np.r_[self.keys, keys], np.r_[self.counts, counts])
+    
+    def rows(self, product_ids):
+        """
+        ``(row, column, count)`` arrays of the given products' rows.
+        """
+        rows = self.keys >> SHIFT
+        index = np.isin(rows, product_ids)
+        return rows[index], self.keys[index] & ((1 << SHIFT) - 1), self.counts[index]
+    
+    def diagonal(self, product_ids):
+        """
+        How many orders contain each product. Every product in the
+        matrix has its diagonal cell.
+        """
+        keys = (product_ids << SHIFT) | product_ids
+        return self.counts[np.searchsorted(self.keys, keys)]
+    
+    def top_neighbors(self, product_ids, k=CO_OCCURRENCE_TOP_K):
+        """
+        ``{product_id: [[neighbor_id, together, score], ...]}``, best first.
+        """
+        rows, columns, counts = self.rows(product_ids)
+        off_diagonal = rows != columns
+        rows, columns, counts = rows[off_diagonal], columns[off_diagonal], counts[off_diagonal]
+        neighbors = {int(product_id): [] for product_id in product_ids}
+        if not len(rows):
+            return neighbors
+        
+        scores = counts / np.sqrt(self.diagonal(rows) * self.diagonal(columns))
+        order = np.lexsort((columns, -counts, -scores, rows))
+        rows, columns, counts, scores = rows[order], columns[order], counts[order], scores[order]
+        starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+        rank = np.arange(len(rows)) - np.repeat(starts, np.diff(np.r_[starts, len(rows)]))
+        for row, column, count, score in zip(
+            rows[rank < k].tolist(), columns[rank < k].tolist(),
+            counts[rank < k].tolist(), scores[rank < k].tolist(),
+        ):
+            neighbors[row].append([column, count, round(score, 4)])
+        return neighbors
+
+
+def new_orders(after, until, chunk_orders=CO_OCCURRENCE_CHUNK_ORDERS):
+    """
+    Yield ``(last_order_id, order_ids, product_ids)`` for orders with ids
+    above ``after`` placed before ``until``, ``chunk_orders`` at a time.
+    """
+    orders = Order.objects.filter(created_at__lt=until).exclude(status='cancelled').order_by('pk')
+    while True:
+        chunk = list(orders.filter(pk__gt=after).values_list('pk', flat=True)[:chunk_orders])
+        if not chunk:
+            return
+        lines = np.array(
+            OrderItem.objects.filter(order_id__in=chunk).values_list('order_id', 'product_id'),
+            dtype=np.int64,
+        ).reshape(-1, 2)
+        after = chunk[-1]
+        yield after, lines[:, 0], lines[:, 1]
+
+
+def update(rebuild=False, path=None, k=CO_OCCURRENCE_TOP_K):
+    """
+    Fold orders placed since the last run into the matrix and refresh the
+    neighbours of the products they touched. Returns how many products
+    were refreshed.
+    """
+    matrix = CoOccurrenceMatrix(path, load=not rebuild)
+    until = timezone.now() - timedelta(minutes=CO_OCCURRENCE_SETTLE_MINUTES)
+    pending_keys, pending_counts = [], []
+    
+    def merge():
+        if pending_keys:
+            matrix.add(np.concatenate(pending_keys), np.concatenate(pending_counts))
+            pending_keys.clear()
+            pending_counts.clear()
+    
+    touched = set()
+    for last_order_id, order_ids, product_ids in new_orders(matrix.last_order_id, until):
+        keys, counts = count_keys(order_pairs(order_ids, product_ids))
+        pending_keys.append(keys)
+        pending_counts.append(counts)
+        touched.update(np.unique(keys >> SHIFT).tolist())
+        matrix.last_order_id = last_order_id
+        # Merging sorts the whole matrix, so not after every chunk.
+        if sum(map(len, pending_keys)) > MERGE_ENTRIES:
+            merge()
+    merge()
+    matrix.save()
+    
+    if rebuild:
+        touched.update(ProductNeighbors.objects.values_list('product_id', flat=True))
+    touched = sorted(touched)
+    for start in range(0, len(touched), CO_OCCURRENCE_CHUNK_ORDERS):
+        neighbors = matrix.top_neighbors(touched[start:start + CO_OCCURRENCE_CHUNK_ORDERS], k)
+        ProductNeighbors.objects.bulk_create(
+            [ProductNeighbors(product_id=product_id, neighbors=rows) for product_id, rows in neighbors.items()],
+            update_conflicts=True,
+            unique_fields=['product'],
+            update_fields=['neighbors', 'updated_at'],
+            batch_size=1000,
+        )
+    return len(touched)
+
+
+def neighbors_of(product_id):
+    """
+    The stored neighbours of a product, in a single primary key read.
+    """
+    return ProductNeighbors.objects.filter(product_id=product_id).values('neighbors', 'updated_at').first()
@@ -1,5 +1,17 @@
+from django.db.models import F
 from rest_framework import serializers
+
+from apps.core.bulk import BulkSerializerMixin
+from apps.core.identifiers import skus
+from apps.core.serializers import ImageVariantsField, SparseFieldsetMixin, ValuesSerializer
+from apps.users.models import full_name_expression
+from .autocomplete import AUTOCOMPLETE_MAX_LIMIT, indexed_changes, note_changes
+from .facets import invalidate
+from .inventory import apply_stock_level
+from .leaderboards import LEADERBOARD_SIZE
+from .ledger import movement, record_movements
 from .models import Category, Product, ProductReview, ProductImage
+from .streams import publish_stock_change
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -18,13 +30,15 @@ class ProductImageSerializer(serializers.ModelSerializer):
     """
     Serializer for ProductImage model.
     """
+    variants = ImageVariantsField(source='image')
+    
     class Meta:
         model = ProductImage
-        fields = ['id', 'image', 'alt_text', 'is_primary', 'created_at']
+        fields = ['id', 'image', 'variants', 'alt_text', 'is_primary', 'created_at']
         read_only_fields = ['id', 'created_at']
 
 
-class ProductReviewSerializer(serializers.ModelSerializer):
+class ProductReviewSerializer(BulkSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for ProductReview model.
     """
@@ -41,12 +55,16 @@ class ProductReviewSerializer(serializers.ModelSerializer):
 
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Serializer for Product model.
+    
+    Supports ``?fields=`` and ``?expand=images,reviews,description`` sparse
+    responses outside the ``list`` action.
     """
     category_name = serializers.CharField(source='category.name', read_only=True)
     vendor_name = serializers.CharField(source='vendor.get_full_name', read_only=True)
+    image_variants = ImageVariantsField(source='image')
     images = ProductImageSerializer(many=True, read_only=True)
     reviews = ProductReviewSerializer(many=True, read_only=True)
     average_rating = serializers.SerializerMethodField()
@@ -55,10 +73,22 @@ class ProductSerializer(serializers.ModelSerializer):
         model = Product
         fields = [
             'id', 'name', 'description', 'price', 'category', 'category_name',
-            'vendor', 'vendor_name', 'image', 'stock_quantity', 'sku',
+            'vendor', 'vendor_name', 'image', 'image_variants', 'stock_quantity', 'sku',
             'is_active', 'created_at', 'updated_at', 'images', 'reviews', 'average_rating'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at', 'average_rating']
+        expandable_fields = ['images', 'reviews']
+        heavy_fields = ['description']
+        field_columns = {
+            'category_name': ['category__name'],
+            'vendor_name': ['vendor__first_name', 'vendor__last_name'],
+            'image_variants': ['image'],
+        }
+        prefetch_fields = {
+            'images': ['images'],
+            'reviews': ['reviews__user'],
+            'average_rating': ['reviews'],
+        }
     
     def get_average_rating(self, obj):
         reviews = obj.reviews.all()
@@ -86,7 +116,31 @@ class ProductListSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
-class ProductCreateSerializer(serializers.ModelSerializer):
+class ProductListValuesSerializer(ValuesSerializer):
+    """
+    Values-based equivalent of ProductListSerializer for read-only listing.
+    """
+    id = serializers.IntegerField(read_only=True)
+    name = serializers.CharField(read_only=True)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, allow_null=True, read_only=True)
+    category_name = serializers.CharField(read_only=True)
+    vendor_name = serializers.CharField(read_only=True)
+    stock_quantity = serializers.IntegerField(read_only=True)
+    is_active = serializers.BooleanField(read_only=True)
+    created_at = serializers.DateTimeField(read_only=True)
+    
+    class Meta:
+        values = ['id', 'name', 'price', 'stock_quantity', 'is_active', 'created_at']
+    
+    @classmethod
+    def get_annotations(cls):
+        return {
+            'category_name': F('category__name'),
+            'vendor_name': full_name_expression('vendor__'),
+        }
+
+
+class ProductCreateSerializer(BulkSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for product creation.
     """
@@ -97,4 +151,52 @@ class ProductCreateSerializer(serializers.ModelSerializer):
             'image', 'stock_quantity', 'sku', 'is_active'
         ]
     
+    def build_bulk_instance(self, validated_data, instance=None):
+        product = super().build_bulk_instance(validated_data, instance)
+        if instance is not None and not product.sku:
+            # bulk_update skips Product.save().
+            product.sku = skus.next()
+        return product
+    
+    def before_bulk_create(self, objects):
+        # bulk_create skips Product.save() too; one allocation covers the
+        # whole batch.
+        missing = [product for product in objects if not product.sku]
+        for product, sku in zip(missing, skus.allocate(len(missing))):
+            product.sku = sku
+    
+    def after_bulk_create(self, objects):
+        record_movements(movement(product.pk, 'restock', product.stock_quantity) for product in objects)
+        invalidate()
+        note_changes(('product', product.pk) for product in objects if product.is_active)
+    
+    def after_bulk_update(self, objects):
+        # bulk_update skips the post_save signals that record stock
+        # movements and push stock changes.
+        movements = []
+        for product in objects:
+            loaded = getattr(product, '_loaded_values', {})
+            if loaded.get('stock_quantity', product.stock_quantity) != product.stock_quantity:
+                movements.append(apply_stock_level(product, loaded['stock_quantity']))
+                publish_stock_change(product)
+            loaded['stock_quantity'] = product.stock_quantity
+            product._loaded_values = loaded
+        record_movements(movements)
+        invalidate()
+        note_changes(indexed_changes('product', objects))
+    
+
+class LeaderboardQuerySerializer(serializers.Serializer):
+    """
+    Serializer for bestseller and trending leaderboard query parameters.
+    """
+    category = serializers.IntegerField(min_value=1, required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=LEADERBOARD_SIZE, default=20)
+
 
+class AutocompleteQuerySerializer(serializers.Serializer):
+    """
+    Serializer for typeahead query parameters.
+    """
+    q = serializers.CharField(max_length=100)
+    limit = serializers.IntegerField(min_value=1, max_value=AUTOCOMPLETE_MAX_LIMIT, default=10)
@@ -0,0 +1,63 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.core.images import watch_image_field
+from .autocomplete import indexed_changes, note_changes
+from .facets import invalidate
+from .inventory import apply_stock_level
+from .ledger import movement, record_movements
+from .models import Category, Product, ProductImage
+from .streams import publish_stock_change
+
+watch_image_field(Product, 'image')
+watch_image_field(ProductImage, 'image')
+
+
+@receiver(post_save, sender=Product)
+def apply_stock_change(sender, instance, created, **kwargs):
+    """
+    Record stock set directly on a product in the ledger, spreading it over
+    the shards of a sharded product.
+    """
+    if created:
+        record_movements([movement(instance.pk, 'restock', instance.stock_quantity)])
+        return
+    
+    loaded = getattr(instance, '_loaded_values', {})
+    previous = loaded.get('stock_quantity', instance.stock_quantity)
+    if previous != instance.stock_quantity and not getattr(instance, '_stock_aggregated', False):
+        record_movements([apply_stock_level(instance, previous)])
+
+
+@receiver(post_save, sender=Product)
+def push_stock_change(sender, instance, created, **kwargs):
+    loaded = getattr(instance, '_loaded_values', {})
+    if not created and loaded.get('stock_quantity', instance.stock_quantity) != instance.stock_quantity:
+        publish_stock_change(instance)
+    loaded['stock_quantity'] = instance.stock_quantity
+    instance._loaded_values = loaded
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_facet_counts(sender, **kwargs):
+    invalidate()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Category)
+def publish_autocomplete_change(sender, instance, created, **kwargs):
+    # Most saves (stock, prices, inventory syncs) leave the index alone.
+    kind = sender._meta.model_name
+    changes = indexed_changes(kind, [instance])
+    if created:
+        changes = [(kind, instance.pk)] if instance.is_active else []
+    note_changes(changes)
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Category)
+def publish_autocomplete_removal(sender, instance, **kwargs):
+    note_changes([(sender._meta.model_name, instance.pk)])
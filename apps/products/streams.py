@@ -0,0 +1,16 @@
+"""
+Live stock updates for ``apps.core.streams`` subscribers.
+"""
+from apps.core.pubsub import publish
+
+
+def product_channel(product_id):
+    return f'product.{product_id}'
+
+
+def publish_stock_change(product):
+    publish(product_channel(product.pk), {
+        'type': 'product.stock',
+        'product_id': product.pk,
+        'stock_quantity': product.stock_quantity,
+    })
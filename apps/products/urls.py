@@ -1,5 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views
 from .views import CategoryViewSet, ProductViewSet, ProductReviewViewSet
 
 router = DefaultRouter()
@@ -8,5 +9,8 @@ router.register(r'products', ProductViewSet)
 router.register(r'reviews', ProductReviewViewSet)
 
 urlpatterns = [
+    path('async/products/', async_views.product_list, name='async-product-list'),
+    path('async/products/<int:pk>/', async_views.product_detail, name='async-product-detail'),
+    path('async/categories/', async_views.category_list, name='async-category-list'),
     path('', include(router.urls)),
 ]
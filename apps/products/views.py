@@ -1,13 +1,23 @@
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
-from django.db.models import Q, Avg
+from django.db.models import Q, Avg, F
 from django_filters import rest_framework as filters
 
+from apps.core.exports import EXPORT_CHUNK_SIZE, parse_updated_since, streaming_export_response
+from apps.core.mixins import BulkModelMixin, ValuesListMixin
+from apps.users.models import full_name_expression
+
+from .autocomplete import autocomplete as autocomplete_index
+from .facets import cached_facet_counts
+from .leaderboards import ALL, top
 from .models import Category, Product, ProductReview, ProductImage
+from .recommendations import neighbors_of
 from .serializers import (
-    CategorySerializer, ProductSerializer, ProductListSerializer,
-    ProductCreateSerializer, ProductReviewSerializer, ProductImageSerializer
+    CategorySerializer, ProductSerializer, ProductListSerializer, ProductListValuesSerializer,
+    ProductCreateSerializer, ProductReviewSerializer, ProductImageSerializer, LeaderboardQuerySerializer,
+    AutocompleteQuerySerializer
 )
 
 
@@ -93,7 +103,7 @@ class CategoryViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(BulkModelMixin, ValuesListMixin, viewsets.ModelViewSet):
     """
     ViewSet for Product model.
     """
@@ -104,10 +114,11 @@ class ProductViewSet(viewsets.ModelViewSet):
     search_fields = ['name', 'description', 'sku']
     ordering_fields = ['name', 'price', 'created_at', 'stock_quantity']
     ordering = ['-created_at']
+    bulk_serializer_class = ProductCreateSerializer
     
     def get_serializer_class(self):
         if self.action == 'list':
-            return ProductListSerializer
+            return ProductListValuesSerializer
         elif self.action == 'create':
             return ProductCreateSerializer
         return ProductSerializer
@@ -117,11 +128,22 @@ class ProductViewSet(viewsets.ModelViewSet):
             return [permissions.IsAuthenticated()]
         return super().get_permissions()
     
+    def list(self, request, *args, **kwargs):
+        """
+        List products; ``?facets=true`` adds the counts per category, price
+        bucket and stock state of the whole filtered result.
+        """
+        response = super().list(request, *args, **kwargs)
+        if request.query_params.get('facets') in ('1', 'true'):
+            queryset = self.filter_queryset(self.get_queryset())
+            response.data['facets'] = cached_facet_counts(queryset, request.query_params)
+        return response
+    
     def get_queryset(self):
         queryset = super().get_queryset()
-        if self.action == 'list':
+        if self.action in ['list', 'export', 'bulk']:
             return queryset
-        return queryset.select_related('category', 'vendor').prefetch_related('images', 'reviews')
+        return ProductSerializer.optimize_queryset(queryset, self.request)
     
     def create(self, request, *args, **kwargs):
         try:
@@ -143,6 +165,28 @@ class ProductViewSet(viewsets.ModelViewSet):
         serializer = ProductListSerializer(in_stock_products, many=True)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Stream the whole (filtered) catalog as NDJSON or CSV.
+        
+        Pass ``updated_since`` to only receive products changed since then.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        updated_since = parse_updated_since(request.query_params.get('updated_since'))
+        if updated_since:
+            queryset = queryset.filter(updated_at__gte=updated_since)
+        
+        columns = [
+            'id', 'sku', 'name', 'description', 'price', 'category_id', 'category_name',
+            'vendor_id', 'vendor_name', 'stock_quantity', 'is_active', 'created_at', 'updated_at'
+        ]
+        rows = queryset.annotate(
+            category_name=F('category__name'),
+            vendor_name=full_name_expression('vendor__'),
+        ).order_by('updated_at', 'id').values(*columns).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        return streaming_export_response(request, rows, columns, 'products')
+    
     @action(detail=True, methods=['post'])
     def add_review(self, request, pk=None):
         """
@@ -175,6 +219,77 @@ class ProductViewSet(viewsets.ModelViewSet):
         serializer = ProductListSerializer(top_rated, many=True)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """
+        Typeahead suggestions: the most popular products and categories
+        with a word or SKU starting with ``q``.
+        """
+        query = AutocompleteQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        return Response({
+            'query': query.validated_data['q'],
+            'results': autocomplete_index.search(query.validated_data['q'], query.validated_data['limit']),
+        })
+    
+    @action(detail=False, methods=['get'])
+    def bestsellers(self, request):
+        """
+        Most units sold over the last week, overall or per ``category``.
+        """
+        return self.leaderboard_response(request, 'bestsellers')
+    
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        """
+        Products selling the most right now, with older sales decaying.
+        """
+        return self.leaderboard_response(request, 'trending')
+    
+    def leaderboard_response(self, request, board):
+        query = LeaderboardQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        category = query.validated_data.get('category', ALL)
+        
+        entry = top(board, category, query.validated_data['limit'])
+        scores = dict(entry['results'])
+        rows = {
+            row['id']: row
+            for row in ProductListValuesSerializer.get_values_queryset(
+                Product.objects.filter(pk__in=scores, is_active=True)
+            )
+        }
+        ranked = [rows[product_id] for product_id in scores if product_id in rows]
+        results = ProductListValuesSerializer(ranked, many=True).data
+        for result in results:
+            result['score'] = scores[result['id']]
+        return Response({
+            'board': board,
+            'category': category,
+            'updated_at': entry['updated_at'],
+            'results': results,
+        })
+    
+    @action(detail=True, methods=['get'])
+    def frequently_bought_together(self, request, pk=None):
+        """
+        Products most often bought with this one, precomputed by
+        ``apps.products.recommendations``.
+        """
+        if not pk.isdigit():
+            raise NotFound()
+        row = neighbors_of(int(pk))
+        if row is None:
+            return Response({'product': int(pk), 'neighbors': [], 'updated_at': None})
+        return Response({
+            'product': int(pk),
+            'neighbors': [
+                {'id': neighbor_id, 'orders_together': together, 'score': score}
+                for neighbor_id, together, score in row['neighbors']
+            ],
+            'updated_at': row['updated_at'],
+        })
+    
     @action(detail=True, methods=['post'])
     def update_stock(self, request, pk=None):
         """
@@ -191,7 +306,7 @@ class ProductViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class ProductReviewViewSet(viewsets.ModelViewSet):
+class ProductReviewViewSet(BulkModelMixin, viewsets.ModelViewSet):
     """
     ViewSet for ProductReview model.
     """
@@ -207,6 +322,9 @@ class ProductReviewViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return super().get_queryset().select_related('user', 'product')
     
+    def get_bulk_save_kwargs(self):
+        return {'user': self.request.user}
+    
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
@@ -10,7 +10,11 @@ class CustomUserAdmin(UserAdmin):
     """
     Custom admin for User model.
     """
-    list_display = ['username', 'email', 'first_name', 'last_name', 'is_customer', 'is_vendor', 'is_active']
+    list_display = [
+        'username', 'email', 'first_name', 'last_name', 'is_customer', 'is_vendor', 'is_active',
+        'orders_count', 'lifetime_value'
+    ]
+    readonly_fields = ['orders_count', 'lifetime_value']
     list_filter = ['is_customer', 'is_vendor', 'is_active', 'is_staff', 'date_joined']
     search_fields = ['username', 'email', 'first_name', 'last_name']
     ordering = ['-date_joined']
@@ -0,0 +1,14 @@
+"""
+Async versions of the hot user read endpoints.
+"""
+from django.contrib.auth import get_user_model
+
+from apps.core.async_views import async_api_view, retrieve
+from .serializers import UserSerializer
+
+User = get_user_model()
+
+
+@async_api_view
+async def user_detail(request, pk):
+    return await retrieve(request, User.objects.all(), UserSerializer, pk)
@@ -0,0 +1,190 @@
+"""
+Cached token and session authentication.
+
+Token -> user id and user id -> user lookups go through a short-lived
+in-process LRU, optionally backed by a shared cache
+(``AUTH_CACHE_SHARED_ALIAS``), so a warm request runs no auth queries.
+A user entry only holds what authentication needs (id, ``is_active`` and
+the session auth hash); the request gets a ``CachedUser`` that loads the
+full row the first time anything else is read.
+
+Entries are invalidated when a user is saved or deleted (password change,
+``toggle_status``), on logout and when a token is deleted or replaced.
+Invalidating also replaces the user's generation in the shared cache,
+which every process compares with the generation its local entries were
+made under, so no process keeps serving them. Without a shared cache,
+other processes see the change once their local TTL runs out.
+"""
+import uuid
+
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import get_user_model
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from apps.core.cache import TieredCache
+
+User = get_user_model()
+
+auth_cache = TieredCache(
+    'auth',
+    max_entries=getattr(settings, 'AUTH_CACHE_LOCAL_MAX_ENTRIES', 10000),
+    local_ttl=getattr(settings, 'AUTH_CACHE_LOCAL_TTL', 30),
+    shared_alias=getattr(settings, 'AUTH_CACHE_SHARED_ALIAS', None),
+    shared_ttl=getattr(settings, 'AUTH_CACHE_SHARED_TTL', 300),
+)
+
+
+class CachedUser(SimpleLazyObject):
+    """
+    The user of a cache entry. ``pk``, ``is_active`` and the session auth
+    hash come from the entry; anything else loads the user on first use.
+    """
+    is_authenticated = True
+    is_anonymous = False
+    
+    def __init__(self, entry):
+        super().__init__(lambda: User._default_manager.get(pk=entry['pk']))
+        self.__dict__['_entry'] = entry
+    
+    def __bool__(self):
+        # DRF's permissions test ``request.user`` before is_authenticated.
+        return True
+    
+    @property
+    def pk(self):
+        return self._entry['pk']
+    
+    id = pk
+    
+    @property
+    def is_active(self):
+        return self._entry['is_active']
+    
+    def get_session_auth_hash(self):
+        return self._entry['auth_hash']
+
+
+def user_generation(user_id):
+    """
+    The user's current generation in the shared cache, or None without
+    one. Read it before loading the user, so an entry is never made under
+    a generation newer than its data.
+    """
+    shared = auth_cache.shared
+    if shared is None:
+        return None
+    return shared.get_or_set(
+        auth_cache.make_key(f'generation:{user_id}'), lambda: uuid.uuid4().hex, auth_cache.shared_ttl
+    )
+
+
+def get_cached_user(user_id, generation=None):
+    """
+    Return a ``CachedUser`` for a current entry, or None.
+    """
+    entry = auth_cache.get(f'user:{user_id}')
+    if entry is None or entry['generation'] != generation:
+        return None
+    return CachedUser(entry)
+
+
+def cache_user(user, generation=None):
+    auth_cache.set(f'user:{user.pk}', {
+        'pk': user.pk,
+        'is_active': user.is_active,
+        'auth_hash': user.get_session_auth_hash(),
+        'generation': generation,
+    })
+
+
+def invalidate_user(user_id):
+    auth_cache.delete(f'user:{user_id}')
+    if auth_cache.shared is not None:
+        auth_cache.shared.set(
+            auth_cache.make_key(f'generation:{user_id}'), uuid.uuid4().hex, auth_cache.shared_ttl
+        )
+
+
+def invalidate_token(key, user_id=None):
+    auth_cache.delete(f'token:{key}')
+    if user_id is not None:
+        # Other processes may still hold the token locally.
+        invalidate_user(user_id)
+
+
+def get_session_user(request):
+    """
+    Cached equivalent of ``django.contrib.auth.get_user``.
+    
+    A cached user is only trusted if the session's auth hash still matches
+    it; anything unusual falls back to Django's own lookup, which handles
+    secret rotation and flushing invalid sessions.
+    """
+    session = request.session
+    try:
+        user_id = User._meta.pk.to_python(session[auth.SESSION_KEY])
+        backend_path = session[auth.BACKEND_SESSION_KEY]
+        session_hash = session[auth.HASH_SESSION_KEY]
+    except KeyError:
+        return auth.get_user(request)
+    
+    generation = user_generation(user_id)
+    user = get_cached_user(user_id, generation)
+    if (
+        user is not None and user.is_active
+        and backend_path in settings.AUTHENTICATION_BACKENDS
+        and constant_time_compare(session_hash, user.get_session_auth_hash())
+    ):
+        return user
+    
+    user = auth.get_user(request)
+    if user.is_authenticated and user.pk == user_id:
+        cache_user(user, generation)
+    return user
+
+
+def get_request_user(request):
+    """
+    The token or session user of a plain Django request, for views that do
+    not go through DRF's authentication (async and streaming views).
+    """
+    result = CachedTokenAuthentication().authenticate(request)
+    if result is not None:
+        return result[0]
+    return request.user
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that caches the token -> user lookup.
+    """
+    def authenticate_credentials(self, key):
+        entry = auth_cache.get(f'token:{key}')
+        user = None
+        if entry is not None:
+            generation = user_generation(entry['user_id'])
+            if entry['generation'] == generation:
+                user = get_cached_user(entry['user_id'], generation)
+        
+        if user is None:
+            model = self.get_model()
+            try:
+                user_id, created = model.objects.values_list('user_id', 'created').get(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            
+            generation = user_generation(user_id)
+            user = User._default_manager.get(pk=user_id)
+            cache_user(user, generation)
+            entry = {'user_id': user_id, 'created': created, 'generation': generation}
+            auth_cache.set(f'token:{key}', entry)
+        
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        
+        return (user, self.get_model()(key=key, user_id=entry['user_id'], created=entry['created']))
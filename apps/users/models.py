@@ -1,9 +1,13 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models import Value
+from django.db.models.functions import Concat, Trim
 from django.core.validators import RegexValidator
 
+from apps.core.models import CounterColumnsMixin
 
-class User(AbstractUser):
+
+class User(CounterColumnsMixin, AbstractUser):
     """
     Custom User model with extended fields.
     """
@@ -21,9 +25,15 @@ class User(AbstractUser):
     is_customer = models.BooleanField(default=True)
     is_vendor = models.BooleanField(default=False)
     
+    # Maintained by apps.orders.counters.
+    orders_count = models.PositiveIntegerField(default=0, editable=False)
+    lifetime_value = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    counter_fields = ['orders_count', 'lifetime_value']
+    
     class Meta:
         verbose_name = 'User'
         verbose_name_plural = 'Users'
@@ -39,3 +49,12 @@ class User(AbstractUser):
         if not self.username:
             self.username = self.email
         super().save(*args, **kwargs)
+
+
+def full_name_expression(prefix=''):
+    """
+    Database-side equivalent of ``User.get_full_name()``.
+    
+    ``prefix`` is the lookup path to the user, e.g. ``'vendor__'``.
+    """
+    return Trim(Concat(f'{prefix}first_name', Value(' '), f'{prefix}last_name'))
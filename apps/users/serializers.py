@@ -2,6 +2,9 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 
+from apps.core.serializers import ImageVariantsField, ValuesSerializer
+from .models import full_name_expression
+
 User = get_user_model()
 
 
@@ -11,16 +14,17 @@ class UserSerializer(serializers.ModelSerializer):
     """
     password = serializers.CharField(write_only=True, required=False)
     password_confirm = serializers.CharField(write_only=True, required=False)
+    profile_picture_variants = ImageVariantsField(source='profile_picture')
     
     class Meta:
         model = User
         fields = [
             'id', 'username', 'email', 'first_name', 'last_name',
-            'phone_number', 'address', 'date_of_birth', 'profile_picture',
-            'is_customer', 'is_vendor', 'is_active', 'created_at', 'updated_at',
-            'password', 'password_confirm'
+            'phone_number', 'address', 'date_of_birth', 'profile_picture', 'profile_picture_variants',
+            'is_customer', 'is_vendor', 'is_active', 'orders_count', 'lifetime_value',
+            'created_at', 'updated_at', 'password', 'password_confirm'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'orders_count', 'lifetime_value', 'created_at', 'updated_at']
         extra_kwargs = {
             'password': {'write_only': True},
             'email': {'required': True}
@@ -77,6 +81,26 @@ class UserListSerializer(serializers.ModelSerializer):
         return f"{obj.first_name} {obj.last_name}".strip()
 
 
+class UserListValuesSerializer(ValuesSerializer):
+    """
+    Values-based equivalent of UserListSerializer for read-only listing.
+    """
+    id = serializers.IntegerField(read_only=True)
+    username = serializers.CharField(read_only=True)
+    email = serializers.EmailField(read_only=True)
+    full_name = serializers.CharField(read_only=True)
+    is_customer = serializers.BooleanField(read_only=True)
+    is_vendor = serializers.BooleanField(read_only=True)
+    is_active = serializers.BooleanField(read_only=True)
+    
+    class Meta:
+        values = ['id', 'username', 'email', 'is_customer', 'is_vendor', 'is_active']
+    
+    @classmethod
+    def get_annotations(cls):
+        return {'full_name': full_name_expression()}
+
+
 class UserCreateSerializer(serializers.ModelSerializer):
     """
     Serializer for user creation.
@@ -0,0 +1,33 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_out
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from apps.core.images import watch_image_field
+from .authentication import invalidate_token, invalidate_user
+
+User = get_user_model()
+
+watch_image_field(User, 'profile_picture')
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    # Covers password changes and toggle_status. After the commit, so no
+    # request caches the old row under the new generation.
+    pk = instance.pk
+    transaction.on_commit(lambda: invalidate_user(pk))
+
+
+@receiver(user_logged_out)
+def invalidate_logged_out_user(sender, request, user, **kwargs):
+    if user is not None:
+        invalidate_user(user.pk)
+
+
+@receiver([post_save, post_delete], sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    key, user_id = instance.key, instance.user_id
+    transaction.on_commit(lambda: invalidate_token(key, user_id))
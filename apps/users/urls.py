@@ -1,10 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views
 from .views import UserViewSet
 
 router = DefaultRouter()
 router.register(r'users', UserViewSet)
 
 urlpatterns = [
+    path('async/users/<int:pk>/', async_views.user_detail, name='async-user-detail'),
     path('', include(router.urls)),
 ]
@@ -5,7 +5,11 @@ from django.contrib.auth import get_user_model
 from django.db.models import Q
 from django_filters import rest_framework as filters
 
-from .serializers import UserSerializer, UserListSerializer, UserCreateSerializer
+from apps.core.mixins import ValuesListMixin
+
+from .serializers import (
+    UserSerializer, UserListSerializer, UserListValuesSerializer, UserCreateSerializer
+)
 
 User = get_user_model()
 
@@ -32,7 +36,7 @@ class UserFilter(filters.FilterSet):
         )
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(ValuesListMixin, viewsets.ModelViewSet):
     """
     ViewSet for User model.
     """
@@ -46,7 +50,7 @@ class UserViewSet(viewsets.ModelViewSet):
     
     def get_serializer_class(self):
         if self.action == 'list':
-            return UserListSerializer
+            return UserListValuesSerializer
         elif self.action == 'create':
             return UserCreateSerializer
         return UserSerializer
@@ -1,66 +1,53 @@
 from celery import Celery
-from django.core.mail import send_mail
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from apps.orders.models import Order, OrderItem
 from apps.products.models import Product
+from apps.core.task_routing import celery_config
 import time
 import logging
-import json
 import requests
 
 User = get_user_model()
 
-app = Celery('summit_market')
+app = Celery('summit_market', task_cls='apps.core.task_metrics:InstrumentedTask')
 app.config_from_object('django.conf:settings', namespace='CELERY')
+app.conf.update(celery_config(app.conf.broker_url))
 app.autodiscover_tasks()
 
 
 @app.task(bind=True)
 def send_order_confirmation_email(self, order_id):
     try:
+        from apps.core.mail import queue_email
+        
         order = Order.objects.get(id=order_id)
         customer = order.customer
         
-        subject = f'Order Confirmation - {order.order_number}'
-        message = f"""
-        Dear {customer.get_full_name()},
-        
-        Thank you for your order! Your order has been confirmed.
-        
-        Order Details:
-        Order Number: {order.order_number}
-        Total Amount: ${order.total_amount}
-        Status: {order.status}
-        
-        We will notify you when your order ships.
-        
-        Best regards,
-        Summit Market Team
-        """
+        queue_email('order_confirmation', customer.email, {
+            'customer_name': customer.get_full_name(),
+            'order_number': order.order_number,
+            'total_amount': str(order.total_amount),
+            'status': order.status,
+        })
         
-        send_mail(
-            subject=subject,
-            message=message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[customer.email],
-            fail_silently=False,
-        )
-        
-        return f"Order confirmation email sent to {customer.email}"
+        return f"Order confirmation email queued for {customer.email}"
     except Exception as e:
         self.retry(countdown=60, max_retries=3)
         return f"Failed to send email: {str(e)}"
 
 
 @app.task(bind=True)
-def update_product_stock(self, product_id, quantity):
+def update_product_stock(self, product_id, quantity, reference=''):
     try:
+        from apps.products.inventory import available_stock, reserve
+        
         product = Product.objects.get(id=product_id)
-        product.stock_quantity -= quantity
-        product.save()
+        if not reserve(product_id, quantity, kind='sale', reference=reference):
+            send_low_stock_notification.delay(product_id)
+            return f"Insufficient stock for product {product.name}"
         
-        if product.stock_quantity <= 0:
+        if available_stock(product_id) <= 0:
             send_low_stock_notification.delay(product_id)
         
         return f"Stock updated for product {product.name}"
@@ -72,31 +59,20 @@ def update_product_stock(self, product_id, quantity):
 @app.task(bind=True)
 def send_low_stock_notification(self, product_id):
     try:
+        from apps.core.mail import queue_email
+        
         product = Product.objects.get(id=product_id)
         vendor = product.vendor
         
-        subject = f'Low Stock Alert - {product.name}'
-        message = f"""
-        Dear {vendor.get_full_name()},
-        
-        Your product "{product.name}" is running low on stock.
-        Current stock: {product.stock_quantity}
-        
-        Please restock soon to avoid out-of-stock situations.
-        
-        Best regards,
-        Summit Market Team
-        """
+        # Sent as one digest per vendor at the end of the digest window.
+        queue_email('low_stock', vendor.email, {
+            'vendor_name': vendor.get_full_name(),
+            'product_id': product.id,
+            'product_name': product.name,
+            'stock_quantity': product.stock_quantity,
+        })
         
-        send_mail(
-            subject=subject,
-            message=message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[vendor.email],
-            fail_silently=False,
-        )
-        
-        return f"Low stock notification sent to {vendor.email}"
+        return f"Low stock notification queued for {vendor.email}"
     except Exception as e:
         self.retry(countdown=120, max_retries=3)
         return f"Failed to send low stock notification: {str(e)}"
@@ -109,7 +85,7 @@ def process_order_items(self, order_id):
         items = order.items.all()
         
         for item in items:
-            update_product_stock.delay(item.product.id, item.quantity)
+            update_product_stock.delay(item.product.id, item.quantity, order.order_number)
             time.sleep(1)
         
         send_order_confirmation_email.delay(order_id)
@@ -123,26 +99,12 @@ def process_order_items(self, order_id):
 @app.task(bind=True)
 def generate_daily_report(self):
     try:
-        from datetime import datetime, timedelta
-        
-        today = datetime.now().date()
-        yesterday = today - timedelta(days=1)
+        from apps.orders.reports import generate
         
-        orders = Order.objects.filter(created_at__date=yesterday)
-        total_orders = orders.count()
-        total_revenue = sum(order.total_amount for order in orders)
+        # Every day up to yesterday whose orders changed since the last run.
+        written = generate()
         
-        report_data = {
-            'date': yesterday.isoformat(),
-            'total_orders': total_orders,
-            'total_revenue': str(total_revenue),
-            'average_order_value': str(total_revenue / total_orders if total_orders > 0 else 0)
-        }
-        
-        with open(f'daily_report_{yesterday}.json', 'w') as f:
-            json.dump(report_data, f)
-        
-        return f"Daily report generated for {yesterday}"
+        return f"Daily reports generated for {written} days"
     except Exception as e:
         self.retry(countdown=300, max_retries=2)
         return f"Failed to generate daily report: {str(e)}"
@@ -159,6 +121,7 @@ def sync_external_inventory(self, vendor_id):
             if response.status_code == 200:
                 data = response.json()
                 product.stock_quantity = data.get('stock', 0)
+                product._stock_movement_kind = 'sync'
                 product.price = data.get('price', product.price)
                 product.save()
                 time.sleep(0.5)
@@ -214,3 +177,195 @@ def backup_database(self):
     except Exception as e:
         self.retry(countdown=7200, max_retries=2)
         return f"Failed to backup database: {str(e)}"
+
+
+@app.task(bind=True)
+def detect_counter_drift(self, fix=False):
+    try:
+        from apps.orders.counters import reconcile
+        
+        drift = reconcile(fix=fix)
+        for model, pk, field, stored, expected in drift:
+            logging.warning(
+                "Counter drift %s(%s).%s: stored %s, expected %s",
+                model.__name__, pk, field, stored, expected
+            )
+        
+        return f"Found {len(drift)} drifted counters"
+    except Exception as e:
+        self.retry(countdown=600, max_retries=2)
+        return f"Failed to detect counter drift: {str(e)}"
+
+
+@app.task(bind=True)
+def release_expired_order_claims(self):
+    try:
+        from apps.orders.fulfilment import release_expired_claims
+        
+        count = release_expired_claims()
+        
+        return f"Released {count} expired order claims"
+    except Exception as e:
+        self.retry(countdown=60, max_retries=3)
+        return f"Failed to release expired order claims: {str(e)}"
+
+
+@app.task(bind=True)
+def bulk_update_order_status(self, order_ids, status, user_id=None, notes=''):
+    try:
+        from apps.orders.transitions import transition_orders
+        
+        user = User.objects.filter(id=user_id).first() if user_id else None
+        report = transition_orders(order_ids, status, user=user, notes=notes)
+        for error in report['errors']:
+            logging.warning("Order %s not moved to %s: %s", error['id'], status, error['error'])
+        
+        return f"Moved {len(report['results'])} orders to {status}, {len(report['errors'])} rejected"
+    except Exception as e:
+        self.retry(countdown=60, max_retries=3)
+        return f"Failed to update order status: {str(e)}"
+
+
+@app.task(bind=True)
+def relay_outbox_events(self):
+    try:
+        from apps.core.outbox import relay_all
+        
+        count = relay_all()
+        
+        return f"Relayed {count} outbox events"
+    except Exception as e:
+        self.retry(countdown=30, max_retries=5)
+        return f"Failed to relay outbox events: {str(e)}"
+
+
+@app.task(bind=True)
+def prune_outbox_events(self, days=None):
+    try:
+        from apps.core.outbox import prune
+        
+        count = prune(days or getattr(settings, 'OUTBOX_RETENTION_DAYS', 7))
+        
+        return f"Pruned {count} outbox events"
+    except Exception as e:
+        self.retry(countdown=3600, max_retries=2)
+        return f"Failed to prune outbox events: {str(e)}"
+
+
+@app.task(bind=True)
+def rebalance_stock_shards(self):
+    try:
+        from apps.products.inventory import rebalance_all
+        
+        count = rebalance_all()
+        
+        return f"Rebalanced stock shards of {count} products"
+    except Exception as e:
+        self.retry(countdown=60, max_retries=3)
+        return f"Failed to rebalance stock shards: {str(e)}"
+
+
+@app.task(bind=True)
+def take_stock_snapshots(self):
+    try:
+        from apps.products.ledger import take_snapshots
+        
+        count = take_snapshots()
+        
+        return f"Took {count} stock snapshots"
+    except Exception as e:
+        self.retry(countdown=300, max_retries=3)
+        return f"Failed to take stock snapshots: {str(e)}"
+
+
+@app.task(bind=True)
+def reconcile_stock_ledger(self, fix=False):
+    try:
+        from apps.products.ledger import reconcile
+        
+        drift = reconcile(fix=fix)
+        
+        return f"Found {len(drift)} products with stock ledger drift"
+    except Exception as e:
+        self.retry(countdown=3600, max_retries=2)
+        return f"Failed to reconcile stock ledger: {str(e)}"
+
+
+@app.task(bind=True)
+def export_order_lines(self):
+    try:
+        from apps.orders.columnar import OrderLineSnapshot
+        
+        snapshot = OrderLineSnapshot()
+        written = snapshot.update()
+        
+        return f"Exported {written} order lines; snapshot has {snapshot.rows} rows"
+    except Exception as e:
+        self.retry(countdown=600, max_retries=3)
+        return f"Failed to export order lines: {str(e)}"
+
+
+@app.task(bind=True)
+def update_recommendations(self):
+    try:
+        from apps.products.recommendations import update
+        
+        refreshed = update()
+        
+        return f"Refreshed recommendations for {refreshed} products"
+    except Exception as e:
+        self.retry(countdown=600, max_retries=3)
+        return f"Failed to update recommendations: {str(e)}"
+
+
+@app.task(bind=True)
+def update_leaderboards(self):
+    try:
+        from apps.products.leaderboards import update
+        
+        counted = update()
+        
+        return f"Counted {counted} order lines into the leaderboards"
+    except Exception as e:
+        self.retry(countdown=60, max_retries=3)
+        return f"Failed to update leaderboards: {str(e)}"
+
+
+@app.task(bind=True)
+def build_autocomplete_index(self):
+    try:
+        from apps.products.autocomplete import build
+        
+        terms = build()
+        
+        return f"Indexed {terms} autocomplete terms"
+    except Exception as e:
+        self.retry(countdown=600, max_retries=3)
+        return f"Failed to build autocomplete index: {str(e)}"
+
+
+@app.task(bind=True)
+def process_images(self, sources):
+    try:
+        from apps.core.images import process
+        
+        # Prefork workers cannot start a process pool of their own.
+        processed = process(sources, workers=1)
+        
+        return f"Processed {processed} images"
+    except Exception as e:
+        self.retry(countdown=60, max_retries=3)
+        return f"Failed to process images: {str(e)}"
+
+
+@app.task(bind=True)
+def flush_email_queue(self):
+    try:
+        from apps.core.mail import flush_all
+        
+        sent = flush_all()
+        
+        return f"Sent {sent} queued emails"
+    except Exception as e:
+        self.retry(countdown=60, max_retries=3)
+        return f"Failed to flush email queue: {str(e)}"
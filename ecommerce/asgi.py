@@ -1,5 +1,7 @@
 """
 ASGI config for ecommerce project.
+
+Besides Django it serves the WebSocket streams, see apps.orders.streams.
 """
 
 import os
@@ -8,4 +10,11 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from apps.core.streams import websocket_router  # noqa: E402
+from apps.orders.streams import order_stream_websocket  # noqa: E402
+
+application = websocket_router({
+    '/ws/orders/stream/': order_stream_websocket,
+}, django_application)
@@ -31,11 +31,13 @@ DJANGO_APPS = [
 
 THIRD_PARTY_APPS = [
     'rest_framework',
+    'rest_framework.authtoken',
     'corsheaders',
     'django_filters',
 ]
 
 LOCAL_APPS = [
+    'apps.core',
     'apps.users',
     'apps.products',
     'apps.orders',
@@ -49,7 +51,7 @@ MIDDLEWARE = [
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'apps.users.middleware.CachedAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
@@ -82,6 +84,159 @@ DATABASES = {
     }
 }
 
+# Caches
+REDIS_URL = config('REDIS_URL', default='')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Sessions are read from the cache and only fall back to the database on a miss.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Token/session -> user lookups are cached per process for a few seconds and,
+# when AUTH_CACHE_SHARED_ALIAS names a cache, shared between processes, which
+# then also see invalidations (deactivation, password changes) right away.
+AUTH_CACHE_LOCAL_TTL = 30
+AUTH_CACHE_LOCAL_MAX_ENTRIES = 10000
+AUTH_CACHE_SHARED_ALIAS = 'default' if REDIS_URL else None
+AUTH_CACHE_SHARED_TTL = 300
+
+# Live order/stock streams (ASGI only). Without Redis, pushes only reach
+# clients connected to the process that made the change.
+if REDIS_URL:
+    PUSH_BACKEND = 'apps.core.pubsub.RedisBackend'
+    PUSH_BACKEND_OPTIONS = {'url': REDIS_URL}
+else:
+    PUSH_BACKEND = 'apps.core.pubsub.LocalBackend'
+    PUSH_BACKEND_OPTIONS = {}
+PUSH_MAX_PENDING = 100
+PUSH_HEARTBEAT_SECONDS = 15
+PUSH_MAX_STREAM_SECONDS = 300
+
+# Transactional outbox (apps.core.outbox): pending events are relayed to
+# these sinks by the relay_outbox_events task. Dispatched events are pruned
+# after OUTBOX_RETENTION_DAYS, which bounds how far behind a change feed
+# consumer may fall.
+OUTBOX_SINKS = [
+    {'BACKEND': 'apps.core.outbox.CelerySink', 'OPTIONS': {'task': 'outbox.events'}},
+]
+OUTBOX_BATCH_SIZE = 500
+OUTBOX_RETENTION_DAYS = 7
+OUTBOX_FEED_SETTLE_SECONDS = 2
+
+# Sharded stock counters (apps.products.inventory) for hot products: new
+# sharded products get STOCK_SHARDS sub-counters, and their shard sums are
+# cached per process for STOCK_AGGREGATE_TTL seconds. The
+# rebalance_stock_shards task evens the shards out and refreshes
+# Product.stock_quantity.
+STOCK_SHARDS = 8
+STOCK_AGGREGATE_TTL = 2
+
+# Stock movement ledger (apps.products.ledger): the take_stock_snapshots task
+# snapshots balances up to STOCK_SNAPSHOT_SETTLE_SECONDS ago, and
+# reconcile_stock_ledger compares them with the actual stock.
+STOCK_LEDGER_BATCH_SIZE = 1000
+STOCK_SNAPSHOT_SETTLE_SECONDS = 60
+
+# Columnar order line snapshot (apps.orders.columnar), appended nightly by
+# the export_order_lines task and queried with query_order_lines.
+ORDER_LINES_SNAPSHOT_DIR = os.path.join(BASE_DIR, 'var', 'order_lines')
+ORDER_LINES_SCAN_WORKERS = os.cpu_count() or 1
+
+# Daily sales reports (apps.orders.reports), written by the
+# generate_daily_report task as gzipped JSON partitioned by month; days
+# are computed REPORT_CHUNK_DAYS at a time on REPORT_WORKERS threads.
+REPORTS_DIR = os.path.join(BASE_DIR, 'var', 'reports')
+REPORT_WORKERS = 4
+REPORT_CHUNK_DAYS = 7
+
+# "Frequently bought together" (apps.products.recommendations): the
+# update_recommendations task folds orders older than
+# CO_OCCURRENCE_SETTLE_MINUTES into the co-occurrence matrix and keeps the
+# top CO_OCCURRENCE_TOP_K neighbours per product.
+CO_OCCURRENCE_PATH = os.path.join(BASE_DIR, 'var', 'co_occurrence.npz')
+CO_OCCURRENCE_TOP_K = 20
+CO_OCCURRENCE_SETTLE_MINUTES = 60
+
+# Bestseller and trending leaderboards (apps.products.leaderboards), kept
+# up to date from order events by the update_leaderboards task and
+# published to LEADERBOARD_CACHE_ALIAS.
+LEADERBOARD_SNAPSHOT_PATH = os.path.join(BASE_DIR, 'var', 'leaderboards.json')
+LEADERBOARD_WINDOW_HOURS = 7 * 24
+LEADERBOARD_HALF_LIFE_HOURS = 6
+LEADERBOARD_SIZE = 100
+LEADERBOARD_CACHE_ALIAS = 'default'
+LEADERBOARD_CACHE_TTL = 600
+
+# Product listing facet counts (?facets=true): price bucket edges, and how
+# long cached counts live at most; product and category writes retire
+# them sooner.
+PRODUCT_FACET_PRICE_BUCKETS = [0, 25, 50, 100, 250, 500, 1000]
+PRODUCT_FACETS_CACHE_ALIAS = 'default'
+PRODUCT_FACETS_CACHE_TTL = 60
+
+# Typeahead index (apps.products.autocomplete), rebuilt by the
+# build_autocomplete_index task; changes in between reach every process
+# through AUTOCOMPLETE_CACHE_ALIAS within AUTOCOMPLETE_REFRESH_SECONDS.
+AUTOCOMPLETE_INDEX_PATH = os.path.join(BASE_DIR, 'var', 'autocomplete.npz')
+AUTOCOMPLETE_POPULARITY_DAYS = 90
+AUTOCOMPLETE_REFRESH_SECONDS = 5
+AUTOCOMPLETE_CACHE_ALIAS = 'default'
+
+# Image variants (apps.core.images): longest side in pixels per size, the
+# formats each size is stored in, and the Celery task new uploads go to.
+IMAGE_SIZES = {'thumbnail': 200, 'medium': 600, 'large': 1200}
+IMAGE_FORMATS = ['webp', 'jpeg']
+IMAGE_QUALITY = 80
+IMAGE_PROCESSING_TASK = 'celery_tasks.process_images'
+
+# Outgoing email (apps.core.mail) is queued and sent in batches of
+# EMAIL_BATCH_SIZE by the flush_email_queue task, EMAIL_FLUSH_DELAY_SECONDS
+# after it is queued; kinds in EMAIL_DIGEST_WINDOWS are collected into one
+# digest per recipient over that many seconds. A failed message is retried
+# after EMAIL_RETRY_DELAY_SECONDS, doubled per attempt, and parked after
+# EMAIL_MAX_ATTEMPTS. Point EMAIL_HOST/EMAIL_PORT at `manage.py smtp_stub`
+# to develop without a mail server.
+EMAIL_HOST = config('EMAIL_HOST', default='localhost')
+EMAIL_PORT = config('EMAIL_PORT', default=25, cast=int)
+EMAIL_BATCH_SIZE = 100
+EMAIL_FLUSH_DELAY_SECONDS = 5
+EMAIL_DIGEST_WINDOWS = {'low_stock': 15 * 60}
+EMAIL_FLUSH_TASK = 'celery_tasks.flush_email_queue'
+EMAIL_MAX_ATTEMPTS = 5
+EMAIL_RETRY_DELAY_SECONDS = 60
+
+# Celery task telemetry (apps.core.task_metrics): each worker process
+# writes its queue wait and runtime histograms to TASK_METRICS_DIR, served
+# added up at /api/v1/task-metrics/. Retry countdowns double per attempt,
+# with jitter, up to TASK_RETRY_BACKOFF_MAX seconds.
+TASK_METRICS_DIR = os.path.join(BASE_DIR, 'var', 'task_metrics')
+TASK_METRICS_FLUSH_SECONDS = 10
+TASK_RETRY_BACKOFF_MAX = 3600
+
+# Celery queues (apps.core.task_routing): tasks are routed to critical,
+# default, bulk or maintenance, each consumed by workers started with
+# `manage.py run_worker <queue>` and that queue's profile below.
+CELERY_BROKER_URL = config('CELERY_BROKER_URL', default=REDIS_URL) or None
+TASK_DEFAULT_QUEUE = 'default'
+TASK_QUEUE_PROFILES = {
+    'critical': {'concurrency': 4, 'prefetch_multiplier': 1, 'soft_time_limit': 30, 'time_limit': 60},
+    'default': {'concurrency': 4, 'prefetch_multiplier': 4, 'soft_time_limit': 300, 'time_limit': 360},
+    'bulk': {'concurrency': 2, 'prefetch_multiplier': 1, 'soft_time_limit': 3600, 'time_limit': 3900},
+    'maintenance': {'concurrency': 1, 'prefetch_multiplier': 1, 'soft_time_limit': 7200, 'time_limit': 7500},
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -125,7 +280,7 @@ AUTH_USER_MODEL = 'users.User'
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
+        'apps.users.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
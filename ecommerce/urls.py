@@ -15,6 +15,7 @@ urlpatterns = [
     path('api/v1/', include('apps.users.urls')),
     path('api/v1/', include('apps.products.urls')),
     path('api/v1/', include('apps.orders.urls')),
+    path('api/v1/', include('apps.core.urls')),
 
      
 ]